@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 from app.api.endpoints import documents, chat
+from app.core.embeddings import get_query_embedding_cache_stats
+from app.models.schemas import HealthCheckResponse
 
 api_router = APIRouter()
 
@@ -8,6 +10,6 @@ api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
 
 
 # Health check endpoint
-@api_router.get("/health", tags=["health"])
+@api_router.get("/health", tags=["health"], response_model=HealthCheckResponse, response_model_exclude_none=True)
 async def health_check():
-    return {"status": "OK"}
+    return HealthCheckResponse(query_embedding_cache=get_query_embedding_cache_stats())
@@ -1,27 +1,47 @@
+import asyncio
 import logging
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
+import shutil
+import tempfile
+import zipfile
+from typing import List, Optional
+
+from fastapi import APIRouter, File, Form, UploadFile, HTTPException, Depends
 from app.services.document_service import (
     DocumentProcessingService,
     get_document_processing_service,
 )
-from app.models.schemas import DocumentUploadResponse
+from app.services.ingestion_jobs import (
+    IngestionJobQueue,
+    IngestionQueueFullError,
+    get_ingestion_job_queue,
+)
+from app.config import settings
+from app.models.schemas import BatchUploadResponse, DocumentUploadResponse
+from app.models.pydantic_models import DocumentStatusResponse
+from app.utils.uploads import SUPPORTED_EXTENSIONS, UploadTooLargeError, extract_archive, find_documents, remove_spooled_file, spool_upload
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-@router.post("/upload", response_model=DocumentUploadResponse)
+@router.post("/upload", response_model=DocumentUploadResponse, status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
+    group_id: Optional[str] = Form(None),
     doc_service: DocumentProcessingService = Depends(get_document_processing_service),
+    job_queue: IngestionJobQueue = Depends(get_ingestion_job_queue),
 ):
     """
-    Endpoint to upload a document (PDF, DOCX, PPTX) for processing and indexing.
+    Endpoint to upload a document (PDF, DOCX, PPTX, or a PNG/JPEG image of handwritten notes) for processing and indexing.
+    The document is queued for background processing; poll
+    /documents/{document_id}/status with the returned document_id for progress.
+    Uploading a file with the same name to the same group_id again replaces the
+    indexed version; only changed chunks are re-embedded.
     """
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file name provided.")
 
-    allowed_extensions = {".pdf", ".docx", ".pptx"}
+    allowed_extensions = SUPPORTED_EXTENSIONS
     file_extension = "None"
     if "." in file.filename:
         file_extension = file.filename.rsplit(".", 1)[1].lower()
@@ -29,36 +49,37 @@ async def upload_document(
             logger.warning(f"Upload attempt with unsupported file type: {file.filename}")
             raise HTTPException(
                 status_code=400,
-                detail=f"Unsupported file type: '{file_extension}'. Supported types are PDF, DOCX, PPTX.",
+                detail=f"Unsupported file type: '{file_extension}'. Supported types are PDF, DOCX, PPTX, PNG, JPG.",
             )
     else:
         logger.warning(f"Upload attempt with no file extension: {file.filename}")
         raise HTTPException(
             status_code=400,
-            detail="File has no extension. Supported types are PDF, DOCX, PPTX.",
+            detail="File has no extension. Supported types are PDF, DOCX, PPTX, PNG, JPG.",
         )
 
+    file_path = None
     try:
         logger.info(f"Received file for upload: {file.filename}")
-        contents = await file.read()
+        # Stream to disk instead of reading the whole upload into memory
+        file_path = await spool_upload(file)
 
-        docs_indexed, error_message = await doc_service.process_and_index_document(contents, file.filename)
+        job = job_queue.submit(file_path, file.filename, doc_service, group_id=group_id)
+        file_path = None  # Owned by the job from here on
 
-        if error_message:
-            logger.error(f"Error processing {file.filename}: {error_message}")
-            return DocumentUploadResponse(
-                filename=file.filename,
-                message="Failed to process document.",
-                error=error_message,
-            )
-
-        logger.info(f"Successfully processed and initiated indexing for {file.filename}. Documents created: {docs_indexed}")
         return DocumentUploadResponse(
             filename=file.filename,
-            message="Document processed and sent for indexing successfully.",
-            document_count=docs_indexed,
+            message="Document accepted for processing.",
+            document_id=job.job_id,
+            status=job.status.value,
         )
 
+    except UploadTooLargeError as e:
+        logger.warning(f"Rejected upload of {file.filename}: {e}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except IngestionQueueFullError as e:
+        logger.warning(f"Rejected upload of {file.filename}: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
@@ -72,4 +93,71 @@ async def upload_document(
             error=str(e),
         )
     finally:
+        remove_spooled_file(file_path)
         await file.close()
+
+
+@router.post("/upload/batch", response_model=BatchUploadResponse)
+async def upload_documents_batch(
+    files: List[UploadFile] = File(...),
+    group_id: Optional[str] = Form(None),
+    doc_service: DocumentProcessingService = Depends(get_document_processing_service),
+):
+    """
+    Endpoint to upload several documents (PDF, DOCX, PPTX, PNG, JPG) at once, or a single
+    ZIP archive containing them. The files are extracted in parallel and their
+    chunks indexed together; the response lists the result and timings of each file.
+    """
+    if len(files) > settings.BATCH_UPLOAD_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files. At most {settings.BATCH_UPLOAD_MAX_FILES} files can be uploaded at once.")
+
+    spooled_paths: List[str] = []
+    scratch_dir = None
+    try:
+        if len(files) == 1 and (files[0].filename or "").lower().endswith(".zip"):
+            logger.info(f"Received archive for batch upload: {files[0].filename}")
+            archive_path = await spool_upload(files[0])
+            spooled_paths.append(archive_path)
+            scratch_dir = tempfile.mkdtemp(prefix="batch_upload_", dir=settings.UPLOAD_SPOOL_DIR)
+            await asyncio.to_thread(extract_archive, archive_path, scratch_dir, settings.MAX_UPLOAD_SIZE_BYTES)
+            documents = find_documents(scratch_dir)
+            if not documents:
+                raise HTTPException(status_code=400, detail="The archive contains no PDF, DOCX, PPTX, PNG or JPG files.")
+            if len(documents) > settings.BATCH_UPLOAD_MAX_FILES:
+                raise HTTPException(status_code=400, detail=f"Too many files. At most {settings.BATCH_UPLOAD_MAX_FILES} files can be uploaded at once.")
+        else:
+            logger.info(f"Received {len(files)} files for batch upload.")
+            documents = []
+            for file in files:
+                # Unsupported types are reported per file by the service
+                documents.append((await spool_upload(file), file.filename or ""))
+                spooled_paths.append(documents[-1][0])
+
+        return await doc_service.process_and_index_batch(documents, group_id=group_id, max_concurrency=settings.BATCH_UPLOAD_CONCURRENCY)
+
+    except UploadTooLargeError as e:
+        logger.warning(f"Rejected batch upload: {e}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="The uploaded archive is not a valid ZIP file.")
+    finally:
+        for path in spooled_paths:
+            remove_spooled_file(path)
+        if scratch_dir:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+        for file in files:
+            await file.close()
+
+
+@router.get("/{document_id}/status", response_model=DocumentStatusResponse)
+async def get_document_status(
+    document_id: str,
+    job_queue: IngestionJobQueue = Depends(get_ingestion_job_queue),
+):
+    """
+    Endpoint to check the processing status of an uploaded document.
+    """
+    job = job_queue.get_job(document_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No document found with id '{document_id}'.")
+    return job.to_status_response()
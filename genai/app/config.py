@@ -1,5 +1,6 @@
 # app/config.py
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,6 +12,7 @@ class Settings(BaseSettings):
     APP_NAME: str = "StudySync AI Service"
     OPENAI_API_KEY: str = "YOUR_DEFAULT_API_KEY_IF_NOT_SET"
     OPENAI_EMBEDDING_MODEL_NAME: str = "text-embedding-3-small"
+    OPENAI_EMBEDDING_DIMENSIONS: Optional[int] = None  # None = the model's native size
     OPENAI_MODEL_NAME: str = "gpt-4o-mini"
     OPENAI_LLM_TEMPERATURE: float = 0.1
 
@@ -20,6 +22,60 @@ class Settings(BaseSettings):
     ENVIRONMENT: str = "development"
     # WEAVIATE_URL: str = "http://localhost:8080"
 
+    # Uploads are streamed to temporary files (None = system temp dir)
+    MAX_UPLOAD_SIZE_BYTES: int = 256 * 1024 * 1024
+    UPLOAD_SPOOL_DIR: Optional[str] = None
+
+    # Background ingestion of uploaded documents
+    INGESTION_QUEUE_MAX_SIZE: int = 32
+    INGESTION_WORKER_COUNT: int = 2
+    INGESTION_JOB_RETENTION: int = 1000
+    BATCH_UPLOAD_MAX_FILES: int = 100
+    BATCH_UPLOAD_CONCURRENCY: int = 4  # Files extracted at the same time per batch upload
+
+    # Text extraction worker processes (0 = all cores but one)
+    EXTRACTION_POOL_WORKERS: int = 0
+    EXTRACTION_MAX_TASKS_PER_CHILD: int = 25
+    PDF_PAGES_PER_SHARD: int = 32  # Longer PDFs are extracted page-parallel; 0 disables
+    PDF_PAGE_TIMEOUT_SECONDS: float = 30.0  # A slower page falls back to PyPDF2; a page stuck twice as long ends its worker
+    EXTRACTION_WORKER_MEMORY_MB: int = 4096  # Address space limit per worker process (0 = unlimited)
+
+    # Content-addressed cache of extracted text (0 = disabled)
+    EXTRACTION_CACHE_DIR: str = "data/processed/extraction_cache"
+    EXTRACTION_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Handwritten text recognition of image uploads and scanned PDF pages (needs torch and transformers)
+    OCR_MODEL_NAME: str = "fhswf/TrOCR_Math_handwritten"
+    OCR_MAX_BATCH_SIZE: int = 8  # Images decoded together in one model call
+    OCR_MAX_BATCH_WAIT_MS: int = 50  # How long a batch waits for more images
+    OCR_QUANTIZE_INT8: bool = False  # int8 dynamic quantization of the model's linear layers
+    OCR_NUM_THREADS: int = 0  # torch threads (0 = half of the cores)
+    PDF_OCR_DPI: int = 150  # Scanned PDF pages are rendered at this resolution for OCR; 0 disables
+
+    # Chunk sizes in characters, or in tokens of the chat model (CHUNK_SIZE_IN_TOKENS).
+    # Every chunk stores its token count, which bounds the context per question.
+    CHUNK_SIZE: int = 1000
+    CHUNK_OVERLAP: int = 200
+    CHUNK_SIZE_IN_TOKENS: bool = False
+    RAG_CONTEXT_MAX_TOKENS: int = 4000
+
+    # Persistent cache of chunk and query embeddings (0 = disabled)
+    EMBEDDING_CACHE_PATH: str = "data/processed/embedding_cache.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 500_000
+    # In-memory LRU of query vectors in front of it (0 = disabled)
+    QUERY_EMBEDDING_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: float = 24 * 3600
+
+    # Chunks are embedded by the service and inserted with their vectors
+    # (False = let Weaviate's text2vec-openai module vectorize them)
+    CLIENT_SIDE_VECTORIZATION: bool = True
+    EMBEDDING_BATCH_SIZE: int = 256  # Chunks per embedding request
+    EMBEDDING_BATCH_MAX_TOKENS: int = 100_000  # Tokens of the embedding model per request (API limit: 300k)
+    EMBEDDING_CONCURRENCY: int = 4  # Embedding requests in flight per document
+
+    # Progress files of `python -m app.ingest`, used to resume interrupted runs
+    INGEST_STATE_DIR: str = "data/processed/ingest_state"
+
     def __init__(self, **values):
         super().__init__(**values)
         if self.OPENAI_API_KEY == "YOUR_DEFAULT_API_KEY_IF_NOT_SET" or not self.OPENAI_API_KEY:
@@ -0,0 +1,321 @@
+"""Persistent cache of text embeddings.
+
+Chunks of re-uploaded slides and repeated questions would otherwise be sent
+to the embedding API again.  ``CachedEmbeddings`` wraps any LangChain
+``Embeddings`` and looks vectors up in an SQLite file first, keyed by
+(model name, dimensions, SHA-256 of the text).  Vectors are stored as packed
+float32 blobs, and the least recently used entries are evicted once the
+cache holds more than ``max_entries`` vectors.
+
+Questions repeat far more than chunks (the same "what is a semaphore" from a
+whole study group before an exam), so ``QueryEmbeddingCache`` additionally
+keeps query vectors in memory: an LRU keyed by model and normalized query
+text, bounded in bytes, whose entries expire after a TTL.  A hit costs a dict
+lookup instead of an SQLite query or an API round trip, and concurrent async
+misses of the same question share one API call.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of host parameters per statement; look keys up in chunks.
+_LOOKUP_CHUNK_SIZE = 500
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def normalize_query(text: str) -> str:
+    """Query text as cache key: NFKC, case-folded, whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def unpack_vector(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingCacheStore:
+    """SQLite-backed vector store for CachedEmbeddings. Safe to share between threads."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                text_hash BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, dimensions, text_hash)
+            ) WITHOUT ROWID
+            """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._entry_count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"EmbeddingCacheStore opened at {path} with {self._entry_count} vectors (max_entries={max_entries}).")
+
+    def get_many(self, model: str, dimensions: int, hashes: Sequence[bytes]) -> Dict[bytes, List[float]]:
+        """Returns the cached vectors for the given text hashes and marks them as recently used."""
+        found: Dict[bytes, List[float]] = {}
+        unique_hashes = list(dict.fromkeys(hashes))
+        with self._lock:
+            for start in range(0, len(unique_hashes), _LOOKUP_CHUNK_SIZE):
+                chunk = unique_hashes[start : start + _LOOKUP_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})",
+                    (model, dimensions, *chunk),
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = unpack_vector(blob)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                    [(now, model, dimensions, key) for key in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, model: str, dimensions: int, vectors: Dict[bytes, Sequence[float]]):
+        """Stores vectors by text hash, then evicts the least recently used entries beyond max_entries."""
+        if not vectors:
+            return
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, dimensions, text_hash, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                [(model, dimensions, key, pack_vector(vector), now) for key, vector in vectors.items()],
+            )
+            self._entry_count += self._conn.total_changes - before
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        excess = self._entry_count - self.max_entries
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE (model, dimensions, text_hash) IN (SELECT model, dimensions, text_hash FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._entry_count -= excess
+        logger.debug(f"Evicted {excess} vectors from the embedding cache.")
+
+    def __len__(self) -> int:
+        return self._entry_count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves repeated texts from an EmbeddingCacheStore."""
+
+    def __init__(self, underlying: Embeddings, store: EmbeddingCacheStore, model_name: str, dimensions: Optional[int] = None):
+        self.underlying = underlying
+        self.store = store
+        self.model_name = model_name
+        self.dimensions = dimensions or 0  # 0 = the model's native size
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(text) for text in texts]
+        vectors = self.store.get_many(self.model_name, self.dimensions, hashes)
+        self.hits += sum(1 for key in hashes if key in vectors)
+
+        # Embed each missing text once, even if it occurs several times in this call
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(hashes, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            self.misses += len(missing)
+            embedded = self.underlying.embed_documents(list(missing.values()))
+            # Round to float32 like the stored copy, so a hit returns exactly what the miss did
+            new_vectors = {key: unpack_vector(pack_vector(vector)) for key, vector in zip(missing.keys(), embedded)}
+            self.store.put_many(self.model_name, self.dimensions, new_vectors)
+            vectors.update(new_vectors)
+        return [vectors[key] for key in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = text_hash(text)
+        cached = self.store.get_many(self.model_name, self.dimensions, [key])
+        if key in cached:
+            self.hits += 1
+            return cached[key]
+        self.misses += 1
+        vector = unpack_vector(pack_vector(self.underlying.embed_query(text)))
+        self.store.put_many(self.model_name, self.dimensions, {key: vector})
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """embed_query for the event loop: the store is read and written in a worker thread, the API call is awaited."""
+        key = text_hash(text)
+        cached = await asyncio.to_thread(self.store.get_many, self.model_name, self.dimensions, [key])
+        if key in cached:
+            self.hits += 1
+            return cached[key]
+        self.misses += 1
+        vector = unpack_vector(pack_vector(await self.underlying.aembed_query(text)))
+        await asyncio.to_thread(self.store.put_many, self.model_name, self.dimensions, {key: vector})
+        return vector
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.store), "max_entries": self.store.max_entries}
+
+
+class QueryEmbeddingCache(Embeddings):
+    """
+    Embeddings wrapper that keeps query vectors in an in-memory LRU with TTL.
+    Document embeddings pass through. Safe to share between threads and
+    coroutines: the lock is never held across an API call.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, dimensions: Optional[int] = None, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 24 * 3600):
+        """
+        Args:
+            underlying: The embedding model (or CachedEmbeddings) asked on a miss.
+            model_name, dimensions: Part of the key, like in the persistent cache.
+            max_bytes: Bound on the packed float32 vectors plus key texts held.
+            ttl_seconds: Age after which an entry is no longer served (0 = never expires).
+        """
+        self.underlying = underlying
+        self.model_name = model_name
+        self.dimensions = dimensions or 0
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0  # Async misses that waited for the same question's API call
+        self._entries: "OrderedDict[Tuple[str, int, str], Tuple[bytes, float]]" = OrderedDict()  # key -> (vector, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[int, Tuple[str, int, str]], asyncio.Future] = {}  # (loop id, key) -> vector of the running miss
+
+    def _key(self, text: str) -> Tuple[str, int, str]:
+        return self.model_name, self.dimensions, normalize_query(text)
+
+    @staticmethod
+    def _entry_bytes(key: Tuple[str, int, str], blob: bytes) -> int:
+        return len(blob) + len(key[2].encode("utf-8"))
+
+    def _get(self, key: Tuple[str, int, str]) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[key]
+                self._bytes -= self._entry_bytes(key, entry[0])
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return unpack_vector(entry[0])
+
+    def _put(self, key: Tuple[str, int, str], vector: Sequence[float]) -> List[float]:
+        """Stores *vector* and returns it rounded to float32, as later hits will return it."""
+        blob = pack_vector(vector)
+        size = self._entry_bytes(key, blob)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else float("inf")
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= self._entry_bytes(key, previous[0])
+            if size <= self.max_bytes:
+                self._entries[key] = (blob, expires_at)
+                self._bytes += size
+            while self._bytes > self.max_bytes:
+                evicted_key, (evicted_blob, _) = self._entries.popitem(last=False)
+                self._bytes -= self._entry_bytes(evicted_key, evicted_blob)
+                self.evictions += 1
+        return unpack_vector(blob)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.underlying.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.underlying.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self._get(key)
+        if vector is None:
+            vector = self._put(key, self.underlying.embed_query(text))
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self._get(key)
+        if vector is not None:
+            return vector
+
+        loop = asyncio.get_running_loop()
+        pending_key = (id(loop), key)
+        pending = self._pending.get(pending_key)
+        if pending is not None:
+            self.coalesced += 1
+            blob = await asyncio.shield(pending)
+            if blob is not None:
+                return unpack_vector(blob)
+            # The call we waited for failed; make our own
+
+        future = self._pending[pending_key] = loop.create_future()
+        try:
+            vector = self._put(key, await self.underlying.aembed_query(text))
+            future.set_result(pack_vector(vector))
+            return vector
+        finally:
+            if not future.done():
+                future.set_result(None)
+            if self._pending.get(pending_key) is future:
+                del self._pending[pending_key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "coalesced": self.coalesced,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
@@ -1,5 +1,6 @@
 import logging
 import os
+from typing import Optional
 
 from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
@@ -7,6 +8,7 @@ from langchain_openai import OpenAIEmbeddings
 # from langchain_community.embeddings import HuggingFaceInstructEmbeddings
 
 from app.config import settings
+from app.core.embedding_cache import CachedEmbeddings, EmbeddingCacheStore, QueryEmbeddingCache
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +16,9 @@ logger = logging.getLogger(__name__)
 class EmbeddingProvider:
     """
     Provides an instance of an embedding model.
-    Currently supports OpenAI embeddings.
+    Currently supports OpenAI embeddings, wrapped in a persistent embedding
+    cache unless EMBEDDING_CACHE_MAX_ENTRIES is 0, and in an in-memory cache
+    of query vectors unless QUERY_EMBEDDING_CACHE_MAX_BYTES is 0.
     """
 
     def __init__(self):
@@ -25,9 +29,28 @@ class EmbeddingProvider:
         self.embedding_model: Embeddings = OpenAIEmbeddings(
             openai_api_key=settings.OPENAI_API_KEY,
             model=settings.OPENAI_EMBEDDING_MODEL_NAME,
+            dimensions=settings.OPENAI_EMBEDDING_DIMENSIONS,
         )
         logger.info(f"Initialized OpenAIEmbeddings provider with model: {settings.OPENAI_EMBEDDING_MODEL_NAME}")
 
+        if settings.EMBEDDING_CACHE_MAX_ENTRIES > 0:
+            self.embedding_model = CachedEmbeddings(
+                self.embedding_model,
+                EmbeddingCacheStore(settings.EMBEDDING_CACHE_PATH, max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES),
+                model_name=settings.OPENAI_EMBEDDING_MODEL_NAME,
+                dimensions=settings.OPENAI_EMBEDDING_DIMENSIONS,
+            )
+
+        self.query_cache: Optional[QueryEmbeddingCache] = None
+        if settings.QUERY_EMBEDDING_CACHE_MAX_BYTES > 0:
+            self.query_cache = self.embedding_model = QueryEmbeddingCache(
+                self.embedding_model,
+                model_name=settings.OPENAI_EMBEDDING_MODEL_NAME,
+                dimensions=settings.OPENAI_EMBEDDING_DIMENSIONS,
+                max_bytes=settings.QUERY_EMBEDDING_CACHE_MAX_BYTES,
+                ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+            )
+
     def get_model(self) -> Embeddings:
         """Returns the configured embedding model instance."""
         return self.embedding_model
@@ -54,6 +77,13 @@ def get_embedding_model_instance() -> Embeddings:
     return embedding_provider.get_model()
 
 
+def get_query_embedding_cache_stats() -> Optional[dict]:
+    """Counters of the in-memory query vector cache, or None if it is disabled or embeddings are unavailable."""
+    if embedding_provider is None or embedding_provider.query_cache is None:
+        return None
+    return embedding_provider.query_cache.stats()
+
+
 # Example usage:
 if __name__ == "__main__":
     logging.basicConfig(
@@ -1,27 +1,56 @@
 import asyncio
 import logging
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 
+from app.config import settings
 from app.core.llm import get_llm_instance
+from app.core.tokenizer import TokenCounter, get_token_counter
 from app.vector_store.weaviate_connector import get_retriever
+from langchain_core.documents import Document
 from langchain_core.language_models import BaseChatModel
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.retrievers import BaseRetriever
-from langchain_core.runnables import RunnablePassthrough, RunnableParallel
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough, RunnableParallel
 
 logger = logging.getLogger(__name__)
 
 
+def fit_context(documents: List[Document], max_tokens: int, token_counter: TokenCounter) -> List[Document]:
+    """
+    The retrieved documents, in order, whose tokens fit into *max_tokens*, using
+    the token_count stored with each chunk at ingest. A chunk that does not fit
+    is left out, and the budget left is filled with the smaller ones after it, so
+    an oversized top chunk does not leave the context empty. Only chunks indexed
+    without a count are tokenized here.
+    """
+    selected: List[Document] = []
+    used_tokens = 0
+    for doc in documents:
+        token_count = doc.metadata.get("token_count")
+        if token_count is None:
+            token_count = token_counter(doc.page_content)
+        if used_tokens + token_count > max_tokens:
+            continue
+        selected.append(doc)
+        used_tokens += token_count
+    if len(selected) < len(documents):
+        logger.debug(f"Context budget of {max_tokens} tokens fits {len(selected)} of {len(documents)} retrieved chunks.")
+    return selected
+
+
 class RAGSystem:
     """
     Implements a Retrieval Augmented Generation (RAG) system.
     Combines a retriever, a prompt template, and an LLM to answer questions.
     """
 
-    def __init__(self, llm: BaseChatModel = None, retriever: BaseRetriever = None):
+    def __init__(self, llm: BaseChatModel = None, retriever: BaseRetriever = None, context_max_tokens: Optional[int] = None):
         self.llm = llm or get_llm_instance()
         self.retriever = retriever or get_retriever()
+        # Retrieved chunks beyond this many tokens are left out of the prompt
+        self.context_max_tokens = context_max_tokens or settings.RAG_CONTEXT_MAX_TOKENS
+        self.token_counter = get_token_counter(settings.OPENAI_MODEL_NAME)
 
         # Define a prompt template
         template = """
@@ -39,25 +68,49 @@ class RAGSystem:
         Answer:
         """
         self.prompt = ChatPromptTemplate.from_template(template)
+        # Prompt -> answer, for context that was already retrieved (see answer_with_sources)
+        self.answer_chain = self.prompt | self.llm | StrOutputParser()
 
         # Define the RAG chain using LangChain Expression Language (LCEL)
-        # The context is formatted by the retriever's format_docs function (default simple join).
+        # The retrieved chunks are cut to the token budget and joined by format_context.
         # RunnableParallel allows "context" and "question" to be processed
         # (retrieved/passed) in parallel.
         self.rag_chain = (
             RunnableParallel(
-                context=(lambda x: x["question"]) | self.retriever,
+                context=(lambda x: x["question"]) | self.retriever | RunnableLambda(self.format_context),
                 # Pass question to retriever for context
                 question=RunnablePassthrough(),  # Pass original question through
             )  # Alternative if retriever needs the full input dict:
             # {"context": self.retriever, "question": RunnablePassthrough()}
-            | self.prompt
-            | self.llm
-            | StrOutputParser()
-            # Parses the LLM's ChatMessage output into a string
+            | self.answer_chain
         )
         logger.info("RAG System initialized.")
 
+    def format_context(self, documents: List[Document]) -> str:
+        """Joins the retrieved chunks that fit into the context budget, most relevant first."""
+        return "\n\n".join(doc.page_content for doc in fit_context(documents, self.context_max_tokens, self.token_counter))
+
+    async def answer_with_sources(self, question: str, metadata: Optional[Dict[str, Any]] = None) -> Tuple[str, List[Document]]:
+        """
+        Retrieves once and answers *question* from the retrieved chunks that fit
+        into the context budget. Returns the answer and exactly those chunks, so
+        the cited sources are the context the answer was generated from.
+        Args:
+            question: The user's question.
+            metadata: Optional run metadata passed to the retriever (e.g. a group_id).
+        """
+        try:
+            logger.debug(f"Answering with sources: {question}")
+            retrieved = await self.retriever.ainvoke(question, config={"metadata": metadata} if metadata else None)
+            context_documents = fit_context(retrieved, self.context_max_tokens, self.token_counter)
+            context = "\n\n".join(doc.page_content for doc in context_documents)
+            answer = await self.answer_chain.ainvoke({"context": context, "question": question})
+            logger.debug(f"Answer from {len(context_documents)} of {len(retrieved)} retrieved chunks: {answer}")
+            return answer, context_documents
+        except Exception as e:
+            logger.error(f"Error answering with sources: {e}", exc_info=True)
+            raise
+
     async def invoke_chain(self, question: str) -> str:
         """
         Invokes the RAG chain asynchronously with a given question.
@@ -0,0 +1,58 @@
+"""Token counting for chunk sizes and prompt budgets.
+
+Counts use tiktoken's encoding for a model (or encoding) name, loaded on
+first use.  tiktoken downloads encodings the first time they are used; if it
+is not installed or the download fails, counts fall back to
+``token_upper_bound``, which overcounts but never undercounts, so budgets
+computed from them still hold.
+"""
+
+import logging
+from functools import lru_cache
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+TokenCounter = Callable[[str], int]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~3 characters per token, as in English prose). Not a
+    bound: CJK, emoji and math symbols take a token per character or more.
+    """
+    return len(text) // 3 + 1
+
+
+def token_upper_bound(text: str) -> int:
+    """Tokens *text* can take at most in a byte-level BPE encoding such as tiktoken's: one per UTF-8 byte."""
+    return len(text.encode("utf-8"))
+
+
+@lru_cache(maxsize=None)
+def _load_encoding(model_name: str):
+    try:
+        import tiktoken
+    except ImportError:
+        logger.warning("tiktoken is not installed. Token counts are estimated from text length.")
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:  # Not a model tiktoken knows; maybe an encoding name such as "cl100k_base"
+            return tiktoken.get_encoding(model_name)
+    except Exception as e:
+        logger.warning(f"Could not load the tiktoken encoding for {model_name} ({e}). Token counts are estimated from text length.")
+        return None
+
+
+def get_token_counter(model_name: str) -> TokenCounter:
+    """Returns a function counting the tokens of a text for *model_name*; the encoding is loaded on first use."""
+
+    def count_tokens(text: str) -> int:
+        encoding = _load_encoding(model_name)
+        if encoding is None:
+            return token_upper_bound(text)
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return count_tokens
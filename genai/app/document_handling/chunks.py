@@ -0,0 +1,101 @@
+"""Compact storage of the chunks split from a text.
+
+A ChunkTable holds the chunks of one text as offsets into the text itself plus
+parallel integer arrays (page numbers, token counts), instead of one LangChain
+Document per chunk with its own copy of the chunk text (overlaps included)
+and of the metadata.  Chunk is a view of one row with the ``page_content`` and
+``metadata`` attributes of a Document, which is all the indexer reads, so
+Documents are only built where chunks are handed out (``Chunk.to_document``).
+"""
+
+from array import array
+from collections.abc import Sequence
+from typing import Iterator, List, Optional, Tuple, Union
+
+from langchain_core.documents import Document
+
+
+class Chunk:
+    """View of one chunk of a ChunkTable; page_content and metadata are built on access."""
+
+    __slots__ = ("table", "index")
+
+    def __init__(self, table: "ChunkTable", index: int):
+        self.table = table
+        self.index = index
+
+    @property
+    def page_content(self) -> str:
+        return self.table.chunk_text(self.index)
+
+    @property
+    def metadata(self) -> dict:
+        return self.table.chunk_metadata(self.index)
+
+    def to_document(self) -> Document:
+        return Document(page_content=self.page_content, metadata=self.metadata)
+
+    def __repr__(self) -> str:
+        return f"Chunk(index={self.index}, page_content={self.page_content[:40]!r}, metadata={self.metadata!r})"
+
+
+class ChunkTable(Sequence):
+    """
+    The chunks of one text, column by column. Every chunk shares the base
+    metadata; its chunk_index is first_chunk_index plus its row. Page numbers
+    and token counts are either stored for every chunk or for none.
+    """
+
+    __slots__ = ("text", "metadata", "first_chunk_index", "starts", "ends", "page_numbers", "last_page_numbers", "token_counts")
+
+    def __init__(self, text: str, metadata: Optional[dict] = None, first_chunk_index: int = 0):
+        self.text = text
+        self.metadata = metadata or {}
+        self.first_chunk_index = first_chunk_index
+        self.starts = array("q")
+        self.ends = array("q")
+        self.page_numbers = array("l")
+        self.last_page_numbers = array("l")
+        self.token_counts = array("l")
+
+    def append(self, start: int, end: int, pages: Optional[Tuple[int, int]] = None, token_count: Optional[int] = None):
+        """Adds the chunk text[start:end], with the (first, last) pages it spans and its token count if known."""
+        self.starts.append(start)
+        self.ends.append(end)
+        if pages is not None:
+            self.page_numbers.append(pages[0])
+            self.last_page_numbers.append(pages[1])
+        if token_count is not None:
+            self.token_counts.append(token_count)
+
+    def chunk_text(self, row: int) -> str:
+        return self.text[self.starts[row] : self.ends[row]]
+
+    def chunk_metadata(self, row: int) -> dict:
+        metadata = self.metadata.copy()
+        metadata["chunk_index"] = self.first_chunk_index + row
+        if self.page_numbers:
+            metadata["page_number"] = self.page_numbers[row]
+            metadata["last_page_number"] = self.last_page_numbers[row]
+        if self.token_counts:
+            metadata["token_count"] = self.token_counts[row]
+        return metadata
+
+    def to_documents(self) -> List[Document]:
+        return [chunk.to_document() for chunk in self]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Chunk, List[Chunk]]:
+        if isinstance(index, slice):
+            return [Chunk(self, row) for row in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("chunk index out of range")
+        return Chunk(self, index)
+
+    def __iter__(self) -> Iterator[Chunk]:
+        for row in range(len(self)):
+            yield Chunk(self, row)
@@ -0,0 +1,215 @@
+"""Content-addressed on-disk cache of extracted text.
+
+The same lecture slides are often uploaded into several groups.  Entries are
+keyed by the SHA-256 of the file bytes plus ``EXTRACTOR_VERSION`` and hold the
+final (post-processed) output of ``TextExtractor.extract_text``, so a repeated
+upload skips extraction entirely.  The cache is bounded by total size and
+evicts the least recently used entries first.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import IO, Callable, Iterable, Iterator, Optional
+
+from app.config import settings
+from app.document_handling.extraction_pool import FileSource
+from app.document_handling.extractors import EXTRACTOR_VERSION
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+_ENTRY_SUFFIX = ".txt"
+
+
+def hash_file_source(file_source: FileSource) -> str:
+    """SHA-256 hex digest of the raw bytes or of the file at the given path (read in chunks)."""
+    if isinstance(file_source, bytes):
+        return hashlib.sha256(file_source).hexdigest()
+    digest = hashlib.sha256()
+    with open(file_source, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """Size-bounded LRU cache of extracted text, stored as one file per entry."""
+
+    def __init__(self, cache_dir: str, max_bytes: int, extractor_version: str = EXTRACTOR_VERSION):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.extractor_version = extractor_version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> size in bytes, least recently used first
+        self._size_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+        logger.info(f"ExtractionCache initialized at {cache_dir} with {len(self._entries)} entries ({self._size_bytes} of {max_bytes} bytes).")
+
+    def _load_index(self):
+        """Rebuilds the LRU order from the entry files' modification times."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(_ENTRY_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name[: -len(_ENTRY_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._size_bytes += size
+        self._evict()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + _ENTRY_SUFFIX)
+
+    def compute_key(self, file_source: FileSource) -> str:
+        """Cache key for a document: its SHA-256 plus the extractor version."""
+        return self.key_for_hash(hash_file_source(file_source))
+
+    def key_for_hash(self, sha256: str) -> str:
+        return f"{sha256}-v{self.extractor_version}"
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached text for *key*, or None on a miss."""
+        entry = self.open_entry(key)
+        if entry is None:
+            return None
+        with entry:
+            return entry.read()
+
+    def open_entry(self, key: str) -> Optional[IO[str]]:
+        """Opens the cached text for *key* for reading in pieces, or returns None on a miss."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                # An open entry stays readable even if it is evicted meanwhile.
+                entry = open(path, encoding="utf-8")
+                os.utime(path)  # Persist the LRU position across restarts
+            except OSError as e:
+                logger.warning(f"Dropping unreadable extraction cache entry {key}: {e}")
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, text: str):
+        """Stores *text* under *key* and evicts least recently used entries beyond max_bytes."""
+        for _ in self.write_through(key, (text,)):
+            pass
+
+    def write_through(self, key: str, pieces: Iterable[str], should_store: Optional[Callable[[], bool]] = None) -> Iterator[str]:
+        """
+        Passes *pieces* through while writing them to a new entry for *key*,
+        which is stored once they are exhausted. Nothing is stored if the text
+        is empty or exceeds max_bytes, if iteration stops early, or if
+        *should_store* returns False once the pieces are exhausted.
+        """
+        # Write to a temporary file first so readers never see a partial entry.
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        entry_file = os.fdopen(fd, "wb")
+        size = 0
+        cacheable = True
+        complete = False
+        try:
+            for piece in pieces:
+                if cacheable:
+                    data = piece.encode("utf-8")
+                    size += len(data)
+                    if size > self.max_bytes:
+                        logger.debug(f"Not caching extraction {key}: the text exceeds the cache size.")
+                        cacheable = False
+                    else:
+                        try:
+                            entry_file.write(data)
+                        except OSError as e:
+                            logger.warning(f"Could not write extraction cache entry {key}: {e}")
+                            cacheable = False
+                yield piece
+            complete = should_store is None or should_store()
+        finally:
+            try:
+                entry_file.close()
+            except OSError as e:
+                logger.warning(f"Could not write extraction cache entry {key}: {e}")
+                cacheable = False
+            if complete and cacheable and size:
+                self._commit(key, tmp_path, size)
+            else:
+                self._discard(tmp_path)
+
+    def _commit(self, key: str, tmp_path: str, size: int):
+        with self._lock:
+            try:
+                os.replace(tmp_path, self._path(key))
+            except OSError as e:
+                logger.warning(f"Could not write extraction cache entry {key}: {e}")
+                self._discard(tmp_path)
+                return
+            self._size_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict()
+
+    @staticmethod
+    def _discard(tmp_path: str):
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    def _remove(self, key: str):
+        self._size_bytes -= self._entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove extraction cache entry {key}: {e}")
+
+    def _evict(self):
+        while self._size_bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+            logger.debug(f"Evicted extraction cache entry {key}.")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size_bytes": self._size_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_extraction_cache_instance: Optional[ExtractionCache] = None
+
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """Returns the global ExtractionCache, or None if caching is disabled (EXTRACTION_CACHE_MAX_BYTES = 0)."""
+    global _extraction_cache_instance
+    if _extraction_cache_instance is None and settings.EXTRACTION_CACHE_MAX_BYTES > 0:
+        _extraction_cache_instance = ExtractionCache(
+            cache_dir=settings.EXTRACTION_CACHE_DIR,
+            max_bytes=settings.EXTRACTION_CACHE_MAX_BYTES,
+        )
+    return _extraction_cache_instance
@@ -0,0 +1,348 @@
+"""Process-pool offload for text extraction.
+
+PDF parsing, rendering and text post-processing are CPU-bound and hold the
+GIL, so running them on the uvicorn event loop (or a thread) stalls every
+other request on that worker.  ``ExtractionExecutor`` runs
+``TextExtractor.extract_paged_text`` in a pool of separate processes instead, and
+spreads long PDFs over several workers as page-range shards.  ``iter_text``
+streams the text of long PDFs range by range instead, so indexing can start
+while later pages are still being parsed.  Text recognition is the
+exception: images, and the text lines workers cut out of scanned PDF pages,
+are read by the OCR model in this process (see
+``handrwitten_text_recognition``), so concurrent uploads share one model and
+its micro-batches instead of loading it in every worker.
+
+Workers are sandboxed: their address space is capped, so a page that would
+exhaust memory fails on its own, and a page stuck past its time budget ends
+the worker (see extractors._page_time_budget). The page ranges of a
+streamed PDF that were lost with a worker are retried one page at a time in
+a single-process sandbox pool, which skips the page that ends it again.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import itertools
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Deque, Iterator, List, Optional, Tuple, Union
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from app.config import settings
+from app.document_handling.extractors import IMAGE_EXTENSIONS, PdfBlock, ScannedLine, TextExtractor, _blocks_by_page, _extract_pdf_shard, _open_pdf, iter_paged_text
+
+logger = logging.getLogger(__name__)
+
+# Page range size for iter_text when PDF sharding is disabled.
+STREAM_PAGES_PER_TASK = 16
+
+# One extractor per worker process, created on first use.
+_worker_text_extractor: Optional[TextExtractor] = None
+
+
+# What callers hand to the executor: raw file bytes, or (preferred, since only
+# the path is sent to the worker) the path of the file on disk.
+FileSource = Union[bytes, str, os.PathLike]
+
+
+def _as_document_source(file_source: FileSource):
+    return io.BytesIO(file_source) if isinstance(file_source, bytes) else file_source
+
+
+def _init_worker(memory_limit_mb: int):
+    """Pool initializer: caps the address space of the worker process at *memory_limit_mb* (0 = no cap)."""
+    if memory_limit_mb <= 0 or resource is None:
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    _, hard_limit = resource.getrlimit(resource.RLIMIT_AS)
+    if hard_limit != resource.RLIM_INFINITY:
+        limit = min(limit, hard_limit)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard_limit))
+
+
+def _extract_text_in_worker(file_source: FileSource, filename: str) -> str:
+    """Entry point executed inside a pool process."""
+    global _worker_text_extractor
+    if _worker_text_extractor is None:
+        _worker_text_extractor = TextExtractor(exit_on_page_hang=True)
+    return _worker_text_extractor.extract_paged_text(_as_document_source(file_source), filename)
+
+
+def _is_image(filename: str) -> bool:
+    return filename.lower().rsplit(".", 1)[-1] in IMAGE_EXTENSIONS
+
+
+def _pdf_page_count(file_source: FileSource) -> int:
+    try:
+        with _open_pdf(file_source) as doc:
+            return doc.page_count
+    except Exception:
+        return 0  # Let the regular extraction path deal with (and report) broken files
+
+
+class ExtractionExecutor:
+    """Runs text extraction in a ProcessPoolExecutor so it never blocks the event loop."""
+
+    def __init__(self, max_workers: int = 0, max_tasks_per_child: int = 0, pdf_pages_per_shard: int = 0, image_threads: int = 8, worker_memory_mb: int = 0):
+        """
+        Args:
+            max_workers: Number of worker processes. 0 uses all cores but one,
+                         leaving a core for the event loop.
+            max_tasks_per_child: Recycle a worker after this many documents to bound
+                                 memory growth from large files (Python 3.11+). 0 disables recycling.
+            pdf_pages_per_shard: PDFs with more pages than this are extracted as page-range
+                                 shards spread over the pool. 0 extracts every PDF in a single worker.
+            image_threads: Images handled at the same time in this process; they wait on the
+                           shared OCR model, so this bounds the size of its micro-batches
+                           (the lines of scanned PDF pages are queued all at once).
+            worker_memory_mb: Address space limit of every worker process. 0 disables the limit.
+        """
+        self.max_workers = max_workers if max_workers > 0 else max(1, (os.cpu_count() or 2) - 1)
+        self.max_tasks_per_child = max_tasks_per_child
+        self.pdf_pages_per_shard = pdf_pages_per_shard
+        self.image_threads = max(1, image_threads)
+        self.worker_memory_mb = worker_memory_mb
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()  # Guards replacing self._pool
+        self._sandbox_pool: Optional[ProcessPoolExecutor] = None
+        self._sandbox_lock = threading.Lock()
+        self._image_pool: Optional[ThreadPoolExecutor] = None
+        self._ocr_text_extractor = TextExtractor()  # Reads images and the scanned PDF pages of workers
+        logger.info(
+            f"ExtractionExecutor initialized with max_workers={self.max_workers}, " f"max_tasks_per_child={max_tasks_per_child or 'unlimited'}, pdf_pages_per_shard={pdf_pages_per_shard or 'disabled'}"
+        )
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # "spawn" avoids forking a process that already runs the event loop,
+                # gRPC and HTTP client threads.
+                pool_kwargs = {"max_workers": self.max_workers, "mp_context": multiprocessing.get_context("spawn"), "initializer": _init_worker, "initargs": (self.worker_memory_mb,)}
+                if self.max_tasks_per_child > 0:
+                    if sys.version_info >= (3, 11):
+                        pool_kwargs["max_tasks_per_child"] = self.max_tasks_per_child
+                    else:
+                        logger.warning("max_tasks_per_child requires Python 3.11+. Extraction workers will not be recycled.")
+                self._pool = ProcessPoolExecutor(**pool_kwargs)
+            return self._pool
+
+    def _submit_to_pool(self, fn, *args) -> Tuple[ProcessPoolExecutor, Future]:
+        """
+        Submits to the worker pool and returns (pool, future). If a worker died
+        since the last submission (a hung page, the memory cap), the broken pool
+        is replaced first, so one bad document does not fail the ones after it.
+        """
+        pool = self._get_pool()
+        try:
+            return pool, pool.submit(fn, *args)
+        except BrokenProcessPool:
+            logger.warning("The extraction pool lost a worker. Starting a fresh pool.")
+            self._discard_broken_pool(pool)
+        pool = self._get_pool()
+        try:
+            return pool, pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self._discard_broken_pool(pool)
+            raise
+
+    def _get_sandbox_pool(self) -> ProcessPoolExecutor:
+        if self._sandbox_pool is None:
+            self._sandbox_pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker, initargs=(self.worker_memory_mb,))
+        return self._sandbox_pool
+
+    def _discard_broken_pool(self, pool: ProcessPoolExecutor):
+        """
+        Forgets *pool* after one of its workers died, unless another caller already
+        replaced it. Only that pool is shut down: documents extracted on its
+        replacement, in the sandbox or in this process carry on.
+        """
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def _get_image_pool(self) -> ThreadPoolExecutor:
+        if self._image_pool is None:
+            self._image_pool = ThreadPoolExecutor(max_workers=self.image_threads, thread_name_prefix="image-extraction")
+        return self._image_pool
+
+    def submit(self, file_source: FileSource, filename: str) -> Future:
+        """Schedules extraction of *file_source* and returns a concurrent.futures.Future."""
+        return self._submit_document(file_source, filename)[1]
+
+    def _submit_document(self, file_source: FileSource, filename: str) -> Tuple[Optional[ProcessPoolExecutor], Future]:
+        """(pool, future) of the extraction of a whole document; the pool is None for images, which are read in this process."""
+        if _is_image(filename):
+            return None, self._get_image_pool().submit(self._ocr_text_extractor.extract_paged_text, _as_document_source(file_source), filename)
+        return self._submit_to_pool(_extract_text_in_worker, file_source, filename)
+
+    def _document_result(self, pool: Optional[ProcessPoolExecutor], future: Future, filename: str) -> str:
+        """The text of a document submitted with _submit_document; discards the pool if the worker died on it."""
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            logger.error(f"Extraction worker crashed while processing {filename}. Starting a fresh pool for the next document.")
+            self._discard_broken_pool(pool)
+            raise
+
+    async def _should_shard(self, file_source: FileSource, filename: str) -> bool:
+        if self.pdf_pages_per_shard <= 0 or not filename.lower().endswith(".pdf"):
+            return False
+        return await asyncio.to_thread(_pdf_page_count, file_source) > self.pdf_pages_per_shard
+
+    async def extract_text(self, file_source: FileSource, filename: str) -> str:
+        """
+        Extracts and post-processes text in worker processes without blocking the event loop.
+        Returns paged text: PDF pages start with PAGE_BREAK (see TextExtractor.extract_paged_text).
+        """
+        pool = None
+        try:
+            if await self._should_shard(file_source, filename):
+                # The page shards run on the pool; this thread only merges them
+                # and applies header/footer filtering and post-processing.
+                pool = self._get_pool()
+                sharded_extractor = TextExtractor(page_executor=pool, pages_per_shard=self.pdf_pages_per_shard)
+                return await asyncio.to_thread(sharded_extractor.extract_paged_text, _as_document_source(file_source), filename)
+            pool, future = self._submit_document(file_source, filename)
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); the next document gets a fresh pool.
+            logger.error(f"Extraction worker crashed while processing {filename}. Starting a fresh pool for the next document.")
+            if pool is not None:
+                self._discard_broken_pool(pool)
+            raise
+
+    def iter_text(self, file_source: FileSource, filename: str, failed_pages: Optional[List[int]] = None) -> Iterator[str]:
+        """
+        Yields the extracted, post-processed paged text in pieces; joined, they
+        equal the result of extract_text. PDFs are
+        extracted range by range, with at most max_workers ranges in flight,
+        and each page is yielded once the header/footer window around it has
+        been read, so memory stays bounded and the first pages of long PDFs
+        arrive while later ones are still being parsed. Other documents are
+        yielded in one piece.
+        The indices of PDF pages that fell back to PyPDF2 or were skipped are
+        appended to *failed_pages*. Blocking: run it in a worker thread.
+        """
+        pages_per_task = self.pdf_pages_per_shard or STREAM_PAGES_PER_TASK
+        failed_pages = failed_pages if failed_pages is not None else []
+        num_pages = _pdf_page_count(file_source) if filename.lower().endswith(".pdf") else 0
+        if not num_pages:
+            yield self._document_result(*self._submit_document(file_source, filename), filename)
+            return
+        page_ranges = [(start, min(start + pages_per_task, num_pages)) for start in range(0, num_pages, pages_per_task)]
+        logger.debug(f"Streaming {num_pages} PDF pages of {filename} in {len(page_ranges)} page ranges.")
+        pages = self._iter_pdf_pages(file_source, page_ranges, failed_pages)
+        try:
+            first_pages = next(pages)
+        except BrokenProcessPool:
+            raise
+        except Exception as e:
+            # The regular extraction path falls back to PyPDF2 for PDFs PyMuPDF cannot parse
+            logger.warning(f"Page extraction of {filename} failed ({e}). Extracting it in one piece.")
+            yield self._document_result(*self._submit_document(file_source, filename), filename)
+            return
+        page_texts = self._ocr_text_extractor.iter_pdf_page_texts(itertools.chain(first_pages, itertools.chain.from_iterable(pages)), num_pages)
+        yield from iter_paged_text(page_texts, num_pages)
+
+    def _iter_pdf_pages(self, file_source: FileSource, page_ranges: list, failed_pages: List[int]) -> Iterator[list]:
+        """
+        Yields the blocks of each page range, grouped per page, extracting up to max_workers ranges ahead.
+        Ranges lost with a dead worker are extracted again page by page in the sandbox pool.
+        The text lines of scanned pages are recognized here, by the shared OCR model.
+        """
+        collect_scanned_lines = self._ocr_text_extractor.ocr_available()
+        pending: Deque[Tuple[int, int, ProcessPoolExecutor, Future]] = deque()
+        next_range = 0
+        try:
+            while pending or next_range < len(page_ranges):
+                while next_range < len(page_ranges) and len(pending) < self.max_workers:
+                    start, stop = page_ranges[next_range]
+                    pool, future = self._submit_to_pool(_extract_pdf_shard, file_source, start, stop, collect_scanned_lines)
+                    pending.append((start, stop, pool, future))
+                    next_range += 1
+                start, stop, pool, future = pending.popleft()
+                try:
+                    blocks, range_failed_pages, scanned_lines = future.result()
+                except BrokenProcessPool:
+                    logger.error(f"An extraction worker died on pages {start}-{stop - 1}. Extracting them one by one in the sandbox.")
+                    self._discard_broken_pool(pool)
+                    blocks, range_failed_pages, scanned_lines = self._extract_pages_in_sandbox(file_source, start, stop, collect_scanned_lines)
+                failed_pages.extend(range_failed_pages)
+                scanned_pages = self._ocr_text_extractor.submit_scanned_lines(scanned_lines)
+                yield _blocks_by_page(blocks + self._ocr_text_extractor.scanned_page_blocks(scanned_pages, failed_pages), start, stop)
+        finally:
+            for _, _, _, future in pending:
+                future.cancel()
+
+    def _extract_pages_in_sandbox(self, file_source: FileSource, start: int, stop: int, collect_scanned_lines: bool) -> Tuple[List[PdfBlock], List[int], List[ScannedLine]]:
+        """
+        Extracts pages [start, stop) one at a time in the single-process sandbox pool, one caller at a
+        time, so a worker death is pinned on its page. Such pages are skipped and reported as failed.
+        """
+        blocks: List[PdfBlock] = []
+        failed_pages: List[int] = []
+        scanned_lines: List[ScannedLine] = []
+        with self._sandbox_lock:
+            for page_idx in range(start, stop):
+                sandbox_pool = self._get_sandbox_pool()
+                try:
+                    page_blocks, page_failed, page_lines = sandbox_pool.submit(_extract_pdf_shard, file_source, page_idx, page_idx + 1, collect_scanned_lines).result()
+                except BrokenProcessPool:
+                    logger.error(f"Page {page_idx} ended the sandbox worker too. Skipping it.")
+                    if self._sandbox_pool is sandbox_pool:  # Not already dropped by shutdown
+                        self._sandbox_pool = None
+                    sandbox_pool.shutdown(wait=False)
+                    failed_pages.append(page_idx)
+                    continue
+                blocks.extend(page_blocks)
+                failed_pages.extend(page_failed)
+                scanned_lines.extend(page_lines)
+        return blocks, failed_pages, scanned_lines
+
+    def shutdown(self, wait: bool = True):
+        """Stops all pools, cancelling the extractions still queued on them; only for shutting the application down."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+            logger.info("Extraction pool shut down.")
+        image_pool, self._image_pool = self._image_pool, None
+        if image_pool is not None:
+            image_pool.shutdown(wait=wait, cancel_futures=True)
+        sandbox_pool, self._sandbox_pool = self._sandbox_pool, None
+        if sandbox_pool is not None:
+            sandbox_pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_extraction_executor_instance: Optional[ExtractionExecutor] = None
+
+
+def get_extraction_executor() -> ExtractionExecutor:
+    global _extraction_executor_instance
+    if _extraction_executor_instance is None:
+        _extraction_executor_instance = ExtractionExecutor(
+            max_workers=settings.EXTRACTION_POOL_WORKERS,
+            max_tasks_per_child=settings.EXTRACTION_MAX_TASKS_PER_CHILD,
+            pdf_pages_per_shard=settings.PDF_PAGES_PER_SHARD,
+            image_threads=settings.OCR_MAX_BATCH_SIZE,
+            worker_memory_mb=settings.EXTRACTION_WORKER_MEMORY_MB,
+        )
+    return _extraction_executor_instance
+
+
+def shutdown_extraction_executor():
+    """Stops the worker processes of the global ExtractionExecutor, if one was created."""
+    if _extraction_executor_instance is not None:
+        _extraction_executor_instance.shutdown()
@@ -1,28 +1,288 @@
 """Enhanced text extraction utility (rawdict edition).
 
 Uses PyMuPDF's *rawdict* mode to recover glyphs that regular
-unicode extraction skips (e.g. mathematical symbols).  The rest of
-the API and CLI interface are unchanged.
+unicode extraction skips (e.g. mathematical symbols).  rawdict is
+extracted once per page, and only for pages where the plain block
+text shows unmapped glyphs.  The rest of the API and CLI interface
+are unchanged.
+
+Scanned pages (no text layer, covered by an image) are rendered and their
+lines recognized by the OCR model; pages with text never pay for that.
+
+Every PDF page is extracted on its own time budget: a page that raises or
+runs too long falls back to PyPDF2 (or is skipped), and the other pages keep
+their PyMuPDF text.
 """
 
 from __future__ import annotations
 
+import faulthandler
+import io
 import logging
 import os
-from collections import Counter
-from typing import IO
+import re
+import signal
+import threading
+from collections import Counter, deque
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from typing import IO, Iterable, Iterator, Optional, Sequence, Union
 
 import fitz
+from PIL import Image
 from PyPDF2 import PdfReader
 from docx import Document
 from pptx import Presentation
 
+from app.document_handling import ooxml
+from app.config import settings
+from app.document_handling.handrwitten_text_recognition import HandwrittenTextRecognizer, find_text_lines, get_handwriting_recognizer
+from app.document_handling.text_normalization import normalize_text
+
 logger = logging.getLogger(__name__)
 
 
+# A document to extract from: an open binary stream or the path of a file on
+# disk.  With a path, PyMuPDF and the DOCX/PPTX readers read the file
+# themselves instead of working on a full in-memory copy.
+DocumentSource = Union[IO[bytes], str, os.PathLike]
+
+# What PyMuPDF opens: the raw PDF bytes or a file path.
+PdfSource = Union[bytes, str, os.PathLike]
+
+# (page_idx, block_text, block_y0, block_y1, page_height) — plain values so
+# blocks can be returned from worker processes.
+PdfBlock = tuple[int, str, float, float, float]
+
+# (page_idx, line_png, line_y0, line_y1, page_height) — a text line of a scanned
+# page, rendered in a worker process for the caller to recognize.
+ScannedLine = tuple[int, bytes, float, float, float]
+
+# What the plain text extraction emits for glyphs it cannot map to Unicode:
+# the replacement character, control characters and private-use code points.
+_MISSING_GLYPH_RE = re.compile("[\ufffd\x00-\x08\x0e-\x1f\ue000-\uf8ff]")
+
+# Part of the extraction cache key.  Bump whenever a change to the extractors
+# or to _post_process_text changes the text produced for the same file.
+EXTRACTOR_VERSION = "8"
+
+# Marks the start of every PDF page (and PPTX slide) in paged text (see extract_paged_text), so
+# page boundaries travel with the text through the extraction pool, the cache
+# and the splitter.  Post-processed text never contains it.
+PAGE_BREAK = "\f"
+
+# Image uploads, whose text is recognized by HandwrittenTextRecognizer
+IMAGE_EXTENSIONS = ("png", "jpg", "jpeg")
+
+# A PDF page is scanned, and OCR'd, when its text layer has fewer characters
+# than this and images cover at least _SCAN_MIN_IMAGE_COVERAGE of its area.
+_SCAN_MAX_TEXT_CHARS = 20
+_SCAN_MIN_IMAGE_COVERAGE = 0.5
+
+
+class PageTimeoutError(BaseException):
+    """
+    Raised inside the extraction of a PDF page that exceeded its time budget.
+    A BaseException, so ``except Exception`` handlers in the page code cannot swallow it.
+    """
+
+
+@contextmanager
+def _page_time_budget(seconds: float, exit_on_hang: bool = False) -> Iterator[None]:
+    """
+    Raise PageTimeoutError in the block once it has run for *seconds* (0 = no limit).
+    The SIGALRM handler only runs between Python bytecodes, so a page stuck in
+    a single MuPDF call is not interrupted; with *exit_on_hang* (worker processes
+    only), faulthandler's watchdog thread, which needs no GIL, ends the process
+    after twice the budget instead. Only enforced in the main thread.
+    """
+    if seconds <= 0 or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def on_alarm(signum, frame):
+        raise PageTimeoutError(f"Page extraction exceeded its {seconds:g}s budget.")
+
+    previous_handler = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    if exit_on_hang:
+        faulthandler.dump_traceback_later(2 * seconds, exit=True)
+    try:
+        yield
+    finally:
+        if exit_on_hang:
+            faulthandler.cancel_dump_traceback_later()
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
+def _is_path(source: object) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+
+def _rewind(source: DocumentSource) -> Union[IO[bytes], str]:
+    """*source* ready to be read from the start: the path as a string, or the stream rewound."""
+    if _is_path(source):
+        return os.fspath(source)
+    source.seek(0)
+    return source
+
+
+def _open_pdf(source: PdfSource) -> fitz.Document:
+    if _is_path(source):
+        return fitz.open(os.fspath(source), filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+
+class _BlockGrid:
+    """Row-bucketed spatial index over block bboxes for point-in-block lookups."""
+
+    def __init__(self, bboxes: list[tuple[float, float, float, float]], row_height: float = 12.0):
+        self.bboxes = bboxes
+        self.row_height = row_height
+        self.rows: dict[int, list[int]] = {}
+        for block_idx, (_, y0, _, y1) in enumerate(bboxes):
+            for row in range(int(y0 // row_height), int(y1 // row_height) + 1):
+                self.rows.setdefault(row, []).append(block_idx)
+
+    def find(self, x: float, y: float) -> list[int]:
+        """Return the indices of all blocks containing the point (x, y)."""
+        hits = []
+        for block_idx in self.rows.get(int(y // self.row_height), ()):
+            x0, y0, x1, y1 = self.bboxes[block_idx]
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                hits.append(block_idx)
+        return hits
+
+
+# Longer block texts are never treated as headers/footers.
+_MAX_HEADER_FOOTER_LENGTH = 100
+
+# Documents of up to this many pages are searched for headers/footers as a
+# whole. In longer ones they are detected among this many pages around each
+# page, so pages can be emitted before the rest has been read; the blocks of a
+# page take a few KB. Whole-document extraction does the same, so every path
+# produces the same text for the extraction cache.
+HEADER_FOOTER_WINDOW_PAGES = 200
+
+
+def _in_header_footer_zone(block_y0: float, block_y1: float, page_height: float) -> bool:
+    return block_y1 < page_height * 0.15 or block_y0 > page_height * 0.85  # Top or bottom 15%
+
+
+class _HeaderFooterIndex:
+    """
+    Occurrence counts of PDF block texts, maintained page by page as pages enter
+    and leave the detection window. A text is a common header/footer when it
+    repeats on enough pages and most of its occurrences lie in the header/footer zones.
+    """
+
+    def __init__(self, blocks: Sequence[PdfBlock] = ()):
+        self.occurrences: Counter = Counter()
+        self.in_zone: Counter = Counter()
+        self.add_blocks(blocks)
+
+    def add_blocks(self, blocks: Sequence[PdfBlock]):
+        candidates = [block for block in blocks if len(block[1]) < _MAX_HEADER_FOOTER_LENGTH]
+        self.occurrences.update(block[1] for block in candidates)
+        self.in_zone.update(text for _, text, block_y0, block_y1, page_height in candidates if _in_header_footer_zone(block_y0, block_y1, page_height))
+
+    def remove_blocks(self, blocks: Sequence[PdfBlock]):
+        for _, text, block_y0, block_y1, page_height in blocks:
+            if len(text) >= _MAX_HEADER_FOOTER_LENGTH:
+                continue
+            _decrement(self.occurrences, text)
+            if _in_header_footer_zone(block_y0, block_y1, page_height):
+                _decrement(self.in_zone, text)
+
+    def common_texts(self, num_pages: int) -> set[str]:
+        """Return the header/footer texts among *num_pages* indexed pages."""
+        common_hf_texts: set[str] = set()
+        if num_pages <= 1:
+            return common_hf_texts
+        min_occurrences_for_hf = max(2, int(num_pages * 0.3))
+        for text, count in self.occurrences.items():
+            # If >70% of its occurrences are in H/F zones, mark as H/F
+            if count >= min_occurrences_for_hf and self.in_zone[text] / count > 0.7:
+                common_hf_texts.add(text)
+        return common_hf_texts
+
+
+def _decrement(counter: Counter, key: str):
+    if counter[key] > 1:
+        counter[key] -= 1
+    else:
+        del counter[key]
+
+
+def iter_paged_text(page_texts: Iterable[tuple[int, str]], num_pages: int) -> Iterator[str]:
+    """
+    Post-process the text of each (page_idx, text) page and join the pages with
+    blank lines, starting every page with PAGE_BREAK (pages without text too,
+    up to num_pages or the last page given).
+    Pages are separated by paragraph breaks, so post-processing them one by one
+    gives the same text as post-processing them joined.
+    """
+    pages_started = 0
+    for page_idx, page_text in page_texts:
+        num_pages = max(num_pages, page_idx + 1)
+        text = normalize_text(page_text)
+        if not text:
+            continue
+        separator = "\n\n" if pages_started else ""
+        yield separator + PAGE_BREAK * (page_idx + 1 - pages_started) + text
+        pages_started = page_idx + 1
+    if pages_started < num_pages:
+        yield PAGE_BREAK * (num_pages - pages_started)
+
+
+def _blocks_by_page(blocks: Sequence[PdfBlock], start: int, stop: int) -> list[list[PdfBlock]]:
+    """Group the page-ordered *blocks* of pages [start, stop) into one list per page."""
+    pages: list[list[PdfBlock]] = [[] for _ in range(start, stop)]
+    for block in blocks:
+        pages[block[0] - start].append(block)
+    return pages
+
+
 class TextExtractor:
     """Extracts plain text from common document formats."""
 
+    def __init__(
+        self,
+        page_executor: Optional[Executor] = None,
+        pages_per_shard: int = 0,
+        text_recognizer: Optional[HandwrittenTextRecognizer] = None,
+        pdf_ocr_dpi: Optional[int] = None,
+        page_timeout: Optional[float] = None,
+        exit_on_page_hang: bool = False,
+        scanned_lines: Optional[list[ScannedLine]] = None,
+    ):
+        """
+        Args:
+            page_executor: Optional executor (typically a ProcessPoolExecutor) used to
+                           extract page-range shards of long PDFs in parallel.
+            pages_per_shard: Number of pages per shard. PDFs with more pages than this
+                             are split; 0 disables page-parallel extraction.
+            text_recognizer: Recognizes the text of images and scanned PDF pages; defaults to the
+                             process-wide recognizer, whose model is only loaded for the first image.
+            pdf_ocr_dpi: Resolution scanned PDF pages are rendered at for OCR; 0 disables
+                         OCR of PDF pages. Defaults to settings.PDF_OCR_DPI.
+            page_timeout: Seconds a PDF page may take before it falls back to PyPDF2; 0 disables
+                          the budget. Defaults to settings.PDF_PAGE_TIMEOUT_SECONDS.
+            exit_on_page_hang: End the process when a page is stuck for twice page_timeout.
+                               Only for worker processes, whose pool recovers from the exit.
+            scanned_lines: Collects the text lines of scanned PDF pages instead of recognizing
+                           them here, for the caller to recognize (see submit_scanned_lines).
+                           Worker processes do this, so they all share the caller's OCR model.
+        """
+        self.page_executor = page_executor
+        self.pages_per_shard = pages_per_shard
+        self.text_recognizer = text_recognizer
+        self.pdf_ocr_dpi = settings.PDF_OCR_DPI if pdf_ocr_dpi is None else pdf_ocr_dpi
+        self.page_timeout = settings.PDF_PAGE_TIMEOUT_SECONDS if page_timeout is None else page_timeout
+        self.exit_on_page_hang = exit_on_page_hang
+        self.scanned_lines = scanned_lines
+
     # ────────────────────────────── PDF ─────────────────────────────── #
 
     def _get_chars_from_rawdict_span(self, span: dict, font_name: str) -> list[str]:
@@ -41,240 +301,408 @@ class TextExtractor:
                     chars_list.append("")
         return chars_list
 
-    def _extract_pdf_pymupdf(self, buffer: bytes) -> str:  # noqa: D401
+    def _recover_block_texts(self, page: fitz.Page, bboxes: list[tuple[float, float, float, float]]) -> list[str]:
+        """
+        Rebuild the text of the given layout blocks from a single rawdict pass over *page*.
+        Each character is assigned to the block(s) containing its centre via a row index
+        over the block bboxes, so the page is extracted once however many blocks need it.
+        """
+        block_grid = _BlockGrid(bboxes)
+        block_lines: list[list[str]] = [[] for _ in bboxes]
+
+        for raw_block in page.get_text("rawdict").get("blocks", []):
+            for line in raw_block.get("lines", []):
+                line_chars: dict[int, list[str]] = {}
+                for span in line.get("spans", []):
+                    span_chars = self._get_chars_from_rawdict_span(span, span["font"])
+                    for ch, char_text in zip(span.get("chars", []), span_chars):
+                        cx0, cy0, cx1, cy1 = ch["bbox"]
+                        for block_idx in block_grid.find((cx0 + cx1) / 2, (cy0 + cy1) / 2):
+                            line_chars.setdefault(block_idx, []).append(char_text)
+                for block_idx, chars in line_chars.items():
+                    block_lines[block_idx].append("".join(chars))
+
+        return ["\n".join(lines).strip() for lines in block_lines]
+
+    def _extract_pdf_page_blocks(self, page: fitz.Page, page_idx: int) -> list[PdfBlock]:
+        """
+        Return the text blocks of a single *page* as (page_idx, text, y0, y1, page_height).
+        Uses the layout analysis ("blocks") text, and falls back to rawdict character
+        recovery only for blocks whose text shows signs of unmapped glyphs.
+        """
+        page_blocks: list[PdfBlock] = []
+        page_height = page.rect.height
+        text_blocks = [block for block in page.get_text("blocks", sort=True) if block[6] == 0]
+
+        recovered_texts: dict[int, str] = {}
+        damaged_block_ids = [i for i, block in enumerate(text_blocks) if _MISSING_GLYPH_RE.search(block[4])]
+        if damaged_block_ids:
+            recovered = self._recover_block_texts(page, [tuple(text_blocks[i][:4]) for i in damaged_block_ids])
+            recovered_texts = dict(zip(damaged_block_ids, recovered))
+
+        for i, (lb_x0, lb_y0, lb_x1, lb_y1, block_text_simple, block_no, block_type) in enumerate(text_blocks):
+            current_block_text = block_text_simple.strip()
+
+            raw_block_text = recovered_texts.get(i)
+            if raw_block_text and len(raw_block_text) >= len(current_block_text) / 2:
+                current_block_text = raw_block_text
+
+            if current_block_text:
+                page_blocks.append((page_idx, current_block_text, lb_y0, lb_y1, page_height))
+
+        return page_blocks
+
+    def _pdf_page_needs_ocr(self, page: fitz.Page, page_blocks: list[PdfBlock]) -> bool:
         """
-        Return plain text from *buffer* using PyMuPDF.
-        Combines layout analysis ("blocks") with rawdict for character recovery within blocks,
-        and attempts to filter common headers/footers.
+        True for scanned pages: (almost) no text layer, and images covering most of the page.
+        The images of a page are only looked at when its text layer is nearly empty.
         """
-        all_blocks_info = []
+        if self.pdf_ocr_dpi <= 0 or sum(len(block[1]) for block in page_blocks) >= _SCAN_MAX_TEXT_CHARS:
+            return False
+        page_rect = page.rect
+        image_area = sum(abs(fitz.Rect(image["bbox"]) & page_rect) for image in page.get_image_info())
+        return image_area >= _SCAN_MIN_IMAGE_COVERAGE * abs(page_rect)
 
-        with fitz.open(stream=buffer, filetype="pdf") as doc:
+    def ocr_available(self) -> bool:
+        """Whether scanned PDF pages can be recognized; lines collected in scanned_lines are recognized by the caller."""
+        return self.scanned_lines is not None or (self.text_recognizer or get_handwriting_recognizer()).is_available()
+
+    def _submit_pdf_page_ocr(self, page: fitz.Page, page_idx: int) -> Optional[list[tuple[Future, float, float]]]:
+        """
+        Render *page* in grayscale at pdf_ocr_dpi and queue each of its text lines for
+        recognition. Returns (future text, y0, y1) per line, top to bottom, in page coordinates,
+        or None if the page could not be rendered or no OCR model is available.
+        With scanned_lines, the lines are appended there instead and none are returned.
+        """
+        if not self.ocr_available():
+            logger.warning(f"Page {page_idx} is scanned, but OCR needs torch and transformers. Skipping the page.")
+            return None
+        try:
+            pixmap = page.get_pixmap(dpi=self.pdf_ocr_dpi, colorspace=fitz.csGRAY)
+            page_image = Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+            line_bboxes = find_text_lines(page_image, self.pdf_ocr_dpi)
+        except Exception as exc:
+            logger.warning(f"Rendering scanned page {page_idx} for OCR failed: {exc}")
+            return None
+        logger.debug(f"Page {page_idx} is scanned: recognizing {len(line_bboxes)} lines.")
+        scale = 72 / self.pdf_ocr_dpi
+        y_offset = page.rect.y0
+        lines = [(page_image.crop(bbox), y_offset + bbox[1] * scale, y_offset + bbox[3] * scale) for bbox in line_bboxes]
+        if self.scanned_lines is not None:
+            self.scanned_lines.extend((page_idx, _png_bytes(line_image), y0, y1, page.rect.height) for line_image, y0, y1 in lines)
+            return []
+        recognizer = self.text_recognizer or get_handwriting_recognizer()
+        return [(recognizer.submit(line_image.convert("RGB")), y0, y1) for line_image, y0, y1 in lines]
+
+    def submit_scanned_lines(self, scanned_lines: Sequence[ScannedLine]) -> list[tuple[int, float, list[tuple[Future, float, float]]]]:
+        """
+        Queue the lines collected by a worker extractor (see scanned_lines) for recognition.
+        Returns (page_idx, page_height, [(future text, y0, y1), ...]) per scanned page, for scanned_page_blocks.
+        """
+        recognizer = self.text_recognizer or get_handwriting_recognizer()
+        pages: dict[tuple[int, float], list[tuple[Future, float, float]]] = {}
+        for page_idx, line_png, y0, y1, page_height in scanned_lines:
+            with Image.open(io.BytesIO(line_png)) as line_image:
+                rgb_image = line_image.convert("RGB")
+            pages.setdefault((page_idx, page_height), []).append((recognizer.submit(rgb_image), y0, y1))
+        return [(page_idx, page_height, ocr_lines) for (page_idx, page_height), ocr_lines in pages.items()]
+
+    def scanned_page_blocks(self, scanned_pages: list[tuple[int, float, list[tuple[Future, float, float]]]], failed_pages: Optional[list[int]] = None) -> list[PdfBlock]:
+        """The recognized lines of pages queued with submit_scanned_lines; pages whose OCR failed are appended to *failed_pages*."""
+        return [block for page_idx, page_height, ocr_lines in scanned_pages for block in self._ocr_page_blocks(page_idx, page_height, ocr_lines, failed_pages)]
+
+    def _ocr_page_blocks(self, page_idx: int, page_height: float, ocr_lines: list[tuple[Future, float, float]], failed_pages: Optional[list[int]]) -> list[PdfBlock]:
+        """One block per recognized line of a scanned page; none if OCR failed, in which case the page is appended to *failed_pages*."""
+        try:
+            texts = [future.result().strip() for future, _, _ in ocr_lines]
+        except Exception as exc:
+            logger.warning(f"OCR of scanned page {page_idx} failed: {exc}")
+            if failed_pages is not None:
+                failed_pages.append(page_idx)
+            return []
+        return [(page_idx, text, y0, y1, page_height) for text, (_, y0, y1) in zip(texts, ocr_lines) if text]
+
+    def _extract_pdf_page_pypdf2(self, source: PdfSource, page_idx: int) -> list[PdfBlock]:
+        """The text of one page read with PyPDF2, as a single body block; [] if PyPDF2 fails too."""
+        try:
+            with _page_time_budget(self.page_timeout):
+                reader = PdfReader(os.fspath(source) if _is_path(source) else io.BytesIO(source))
+                page = reader.pages[page_idx]
+                text = (page.extract_text() or "").strip()
+                page_height = float(page.mediabox.height)
+        except (Exception, PageTimeoutError) as exc:
+            logger.warning(f"PyPDF2 failed on page {page_idx} as well ({exc!r}). Skipping the page.")
+            return []
+        return [(page_idx, text, page_height / 2, page_height / 2, page_height)] if text else []
+
+    def _iter_pdf_page_blocks(self, doc: fitz.Document, source: PdfSource, start: int, stop: int, failed_pages: Optional[list[int]] = None) -> Iterator[list[PdfBlock]]:
+        """
+        Yield the blocks of every page in [start, stop) of *doc* (opened from *source*), in page order.
+        Scanned pages are queued for OCR as soon as they are found, and the
+        following pages are extracted meanwhile, held back until the OCR is done.
+        A page that raises or exceeds page_timeout is read with PyPDF2 instead,
+        and its index is appended to *failed_pages*, like scanned pages whose
+        OCR failed or could not run, so such extractions are not cached.
+        """
+        pending: deque[tuple[int, float, list[PdfBlock], list[tuple[Future, float, float]]]] = deque()
+        for page_idx in range(start, min(stop, doc.page_count)):
+            try:
+                with _page_time_budget(self.page_timeout, self.exit_on_page_hang):
+                    page = doc[page_idx]
+                    page_height = page.rect.height
+                    page_blocks = self._extract_pdf_page_blocks(page, page_idx)
+                    ocr_lines = self._submit_pdf_page_ocr(page, page_idx) if self._pdf_page_needs_ocr(page, page_blocks) else []
+                if ocr_lines is None:
+                    if failed_pages is not None:
+                        failed_pages.append(page_idx)
+                    ocr_lines = []
+            except (Exception, PageTimeoutError) as exc:
+                logger.warning(f"PyMuPDF failed on page {page_idx} ({exc!r}). Reading that page with PyPDF2.")
+                if failed_pages is not None:
+                    failed_pages.append(page_idx)
+                page_height, page_blocks, ocr_lines = 0.0, self._extract_pdf_page_pypdf2(source, page_idx), []
+            if not ocr_lines and not pending:
+                yield page_blocks
+                continue
+            pending.append((page_idx, page_height, page_blocks, ocr_lines))
+            while pending and all(future.done() for future, _, _ in pending[0][3]):
+                p_idx, p_height, p_blocks, p_lines = pending.popleft()
+                yield p_blocks + self._ocr_page_blocks(p_idx, p_height, p_lines, failed_pages)
+        for p_idx, p_height, p_blocks, p_lines in pending:
+            yield p_blocks + self._ocr_page_blocks(p_idx, p_height, p_lines, failed_pages)
+
+    def extract_pdf_page_range(self, source: PdfSource, start: int, stop: int, failed_pages: Optional[list[int]] = None) -> list[PdfBlock]:
+        """
+        Return the text blocks of pages [start, stop) of the PDF *source*, in page order.
+        Pages PyMuPDF failed on are appended to *failed_pages* (see _iter_pdf_page_blocks).
+        """
+        with _open_pdf(source) as doc:
+            return [block for page_blocks in self._iter_pdf_page_blocks(doc, source, start, stop, failed_pages) for block in page_blocks]
+
+    def _keep_pdf_block(self, block: PdfBlock, common_hf_texts: set[str]) -> bool:
+        """False for common headers/footers in their zone and for isolated page numbers."""
+        p_idx, text, b_y0, b_y1, p_height = block
+        # Check 1: Is it a common H/F text and in an H/F zone on this
+        # page?
+        if text in common_hf_texts and _in_header_footer_zone(b_y0, b_y1, p_height):
+            logger.debug(f"Skipping H/F block: '{text}' on page {p_idx}")
+            return False
+
+        if text.strip().isdigit() and len(text.strip()) <= 4:  # Max 4 digits for page num
+            is_extreme_top = b_y1 < p_height * 0.08  # More stringent for page numbers
+            is_extreme_bottom = b_y0 > p_height * 0.92
+            if is_extreme_top or is_extreme_bottom:
+                logger.debug(f"Skipping potential page number: '{text}' on page {p_idx}")
+                return False
+        return True
+
+    def iter_pdf_page_texts(self, pages: Iterable[list[PdfBlock]], num_pages: int, window_pages: int = HEADER_FOOTER_WINDOW_PAGES) -> Iterator[tuple[int, str]]:
+        """
+        Yield (page_idx, text) for each page that has any text, given the blocks of
+        every page in order, dropping common headers/footers and isolated page numbers.
+        Headers/footers are detected among the *window_pages* pages around each page
+        (all pages of shorter documents), so a page is yielded as soon as the pages
+        up to half a window after it have been read. With window_pages=num_pages,
+        they are detected over the whole document.
+        """
+        window = min(num_pages, window_pages)
+        hf_index = _HeaderFooterIndex()
+        buffered: deque[list[PdfBlock]] = deque()  # Pages [window_start, window_start + len(buffered))
+        window_start = 0
+        next_page = 0
+        common_hf_texts: Optional[set[str]] = None
+
+        def page_window_start(p_idx: int) -> int:
+            return min(max(0, p_idx - window // 2), num_pages - window)
+
+        def emit_ready_pages(read_pages: int) -> Iterator[tuple[int, str]]:
+            nonlocal window_start, next_page, common_hf_texts
+            while next_page < read_pages and (read_pages == num_pages or page_window_start(next_page) + window <= read_pages):
+                start = page_window_start(next_page)
+                while window_start < start:  # Slide the window forward
+                    hf_index.remove_blocks(buffered.popleft())
+                    window_start += 1
+                    common_hf_texts = None
+                if common_hf_texts is None:
+                    common_hf_texts = hf_index.common_texts(window)
+                    logger.debug(f"Common H/F around page {next_page}: {sorted(common_hf_texts)}")
+                kept = [block[1] for block in buffered[next_page - window_start] if self._keep_pdf_block(block, common_hf_texts)]
+                next_page += 1
+                if kept:
+                    yield next_page - 1, "\n".join(kept)
+
+        read_pages = 0
+        for page_blocks in pages:
+            buffered.append(page_blocks)
+            hf_index.add_blocks(page_blocks)
+            read_pages += 1
+            yield from emit_ready_pages(read_pages)
+        num_pages = read_pages  # In case fewer pages were read than announced
+        yield from emit_ready_pages(read_pages)
+
+    def _assemble_pdf_text(self, all_blocks_info: list[PdfBlock], num_pages: int) -> str:
+        """Join the blocks of all pages, dropping common headers/footers and isolated page numbers."""
+        return "\n\n".join(text for _, text in self.iter_pdf_page_texts(_blocks_by_page(all_blocks_info, 0, num_pages), num_pages)).strip()
+
+    def _extract_pdf_pymupdf(self, source: PdfSource) -> str:  # noqa: D401
+        """
+        Return the post-processed paged text of *source* (PDF bytes or a file path) using PyMuPDF.
+        Pages are extracted serially, or — when a page_executor is configured and the
+        document is longer than pages_per_shard — as page-range shards in parallel.
+        Both paths filter headers/footers over the same page-ordered blocks, like
+        streamed extraction (see iter_pdf_page_texts), so they produce identical output.
+        """
+        with _open_pdf(source) as doc:
             num_pages = doc.page_count
-            for page_idx, page in enumerate(doc):
-                page_rect = page.rect
-                layout_blocks = page.get_text("blocks", sort=True)
-
-                for (
-                    lb_x0,
-                    lb_y0,
-                    lb_x1,
-                    lb_y1,
-                    block_text_simple,
-                    block_no,
-                    block_type,
-                ) in layout_blocks:
-                    if block_type != 0:
-                        continue
-
-                    block_bbox = fitz.Rect(lb_x0, lb_y0, lb_x1, lb_y1)
-
-                    raw_block_dict = page.get_text("rawdict", clip=block_bbox)
-
-                    block_chars_detailed: list[str] = []
-                    for line in raw_block_dict.get("lines", []):
-                        for span in line.get("spans", []):
-                            font_name = span["font"]
-                            block_chars_detailed.extend(self._get_chars_from_rawdict_span(span, font_name))
-
-                    current_block_text = "".join(block_chars_detailed).strip()
-
-                    if not current_block_text or len(current_block_text) < len(block_text_simple.strip()) / 2:
-                        current_block_text = block_text_simple.strip()
-
-                    if current_block_text:
-                        all_blocks_info.append((page_idx, current_block_text, block_bbox, page_rect))
-
-            common_hf_texts = set()
-            if num_pages > 1:
-                block_text_counts = Counter(b_info[1] for b_info in all_blocks_info)
-
-                min_occurrences_for_hf = max(2, int(num_pages * 0.3))
-
-                for text, count in block_text_counts.items():
-                    if count >= min_occurrences_for_hf and len(text) < 100:
-                        in_hf_zone_count = 0
-                        for p_idx, b_text, b_bbox, p_rect in all_blocks_info:
-                            if b_text == text:
-                                is_header_zone = b_bbox.y1 < p_rect.height * 0.15  # Top 15%
-                                is_footer_zone = b_bbox.y0 > p_rect.height * 0.85  # Bottom 15%
-                                if is_header_zone or is_footer_zone:
-                                    in_hf_zone_count += 1
-
-                        # If >70% of its occurrences are in H/F zones, mark as
-                        # H/F
-                        if in_hf_zone_count / count > 0.7:
-                            common_hf_texts.add(text)
-                            logger.debug(f"Identified common H/F: '{text}'")
-
-            # --- Reconstruct final text, skipping H/F and isolated page numbers ---
-            output_by_page: list[list[str]] = [[] for _ in range(num_pages)]
-            for p_idx, text, bbox, p_rect in all_blocks_info:
-                # Check 1: Is it a common H/F text and in an H/F zone on this
-                # page?
-                is_common_hf_in_zone = False
-                if text in common_hf_texts:
-                    is_header_zone = bbox.y1 < p_rect.height * 0.15
-                    is_footer_zone = bbox.y0 > p_rect.height * 0.85
-                    if is_header_zone or is_footer_zone:
-                        is_common_hf_in_zone = True
-
-                if is_common_hf_in_zone:
-                    logger.debug(f"Skipping H/F block: '{text}' on page {p_idx}")
-                    continue
-
-                if text.strip().isdigit() and len(text.strip()) <= 4:  # Max 4 digits for page num
-                    is_extreme_top = bbox.y1 < p_rect.height * 0.08  # More stringent for page numbers
-                    is_extreme_bottom = bbox.y0 > p_rect.height * 0.92
-                    if is_extreme_top or is_extreme_bottom:
-                        logger.debug(f"Skipping potential page number: '{text}' on page {p_idx}")
-                        continue
-
-                output_by_page[p_idx].append(text)
-
-            page_strings = []
-            for page_content_blocks in output_by_page:
-                if page_content_blocks:
-                    page_strings.append("\n".join(page_content_blocks))
-
-            return "\n\n".join(page_strings).strip()
-
-    def _extract_pdf_pypdf2(self, file_io: IO[bytes]) -> str:
+            if self.page_executor is None or self.pages_per_shard <= 0 or num_pages <= self.pages_per_shard:
+                pages = self._iter_pdf_page_blocks(doc, source, 0, num_pages)
+                return "".join(iter_paged_text(self.iter_pdf_page_texts(pages, num_pages), num_pages))
+
+        shard_bounds = [(start, min(start + self.pages_per_shard, num_pages)) for start in range(0, num_pages, self.pages_per_shard)]
+        logger.debug(f"Extracting {num_pages} PDF pages in {len(shard_bounds)} parallel shards.")
+        # With a file path each worker opens the file itself; only bytes are shipped to workers.
+        collect_scanned_lines = self.ocr_available()
+        futures = [self.page_executor.submit(_extract_pdf_shard, source, start, stop, collect_scanned_lines) for start, stop in shard_bounds]
+        # Shards are merged in page order, with the scanned pages recognized here
+        pages = (page_blocks for future, (start, stop) in zip(futures, shard_bounds) for page_blocks in _blocks_by_page(self._with_scanned_page_blocks(future.result()), start, stop))
+        return "".join(iter_paged_text(self.iter_pdf_page_texts(pages, num_pages), num_pages))
+
+    def _with_scanned_page_blocks(self, shard: tuple[list[PdfBlock], list[int], list[ScannedLine]]) -> list[PdfBlock]:
+        blocks, _, scanned_lines = shard
+        return blocks + self.scanned_page_blocks(self.submit_scanned_lines(scanned_lines))
+
+    def _extract_pdf_pypdf2(self, source: DocumentSource) -> str:
         """Return plain text using PyPDF2 (fallback)."""
         # This method might also benefit from the generic post-processor
-        reader = PdfReader(file_io)
+        reader = PdfReader(os.fspath(source) if _is_path(source) else source)
         text = "\n".join(filter(None, (page.extract_text() for page in reader.pages))).strip()
         return text  # Post-processing will be applied later by the dispatcher
 
-    def extract_from_pdf(self, file_io: IO[bytes]) -> str:
-        """Extract text from a PDF *file_io* stream."""
-        file_io.seek(0)
-        data = file_io.read()
+    def extract_from_pdf(self, source: DocumentSource) -> str:
+        """
+        Extract post-processed paged text from a PDF file path or *source* stream.
+        The PyPDF2 fallback cannot separate pages reliably and carries no page breaks.
+        """
+        if _is_path(source):
+            pdf_source = source  # PyMuPDF loads pages from the file on demand
+        else:
+            source.seek(0)
+            pdf_source = source.read()
         try:
-            extracted_text = self._extract_pdf_pymupdf(data)
+            extracted_text = self._extract_pdf_pymupdf(pdf_source)
         except Exception as exc:
             logger.warning(
                 "PyMuPDF rawdict extraction failed (%s). Falling back to PyPDF2.",
                 exc,
                 exc_info=True,
             )
-            file_io.seek(0)  # Reset for PyPDF2
-            extracted_text = self._extract_pdf_pypdf2(file_io)  # Pass the original file_io
+            if not _is_path(source):
+                source.seek(0)  # Reset for PyPDF2
+            extracted_text = self._post_process_text(self._extract_pdf_pypdf2(source))  # Pass the original source
 
-        return extracted_text  # Post-processing will be applied by the main dispatcher
+        return extracted_text
 
     def _post_process_text(self, text: str) -> str:
-        """Generic post-processing for extracted text."""
-        if not text:
-            return ""
-
-        import re
-
-        # 1. Normalize whitespace and basic line structure
-        lines = text.splitlines()
-
-        processed_lines = []
-        for line in lines:
-            line = line.strip()
-            if line:
-                processed_lines.append(line)
-
-        paragraphs = re.split(r"\n\s*\n", text)
-
-        reconstructed_paragraphs = []
-        for para_text in paragraphs:
-            if not para_text.strip():
-                continue
-
-            current_para_lines = para_text.splitlines()
-            if not current_para_lines:
-                continue
-
-            for i in range(len(current_para_lines) - 1):
-                if current_para_lines[i].endswith("-"):
-                    merged_line_start = current_para_lines[i][:-1]
-                    # Check if next line starts with a character that could
-                    # continue a word
-                    if current_para_lines[i + 1] and current_para_lines[i + 1][0].islower():
-                        current_para_lines[i] = merged_line_start + current_para_lines[i + 1]
-                        current_para_lines[i + 1] = ""  # Mark for removal
-
-            current_para_lines = [line for line in current_para_lines if line]  # Remove emptied lines
-
-            if not current_para_lines:
-                reconstructed_paragraphs.append("")  # Preserve paragraph break if original was just newlines
-                continue
-
-            new_paragraph_content = [current_para_lines[0]]
-            for i in range(1, len(current_para_lines)):
-                prev_line = new_paragraph_content[-1].strip()
-                curr_line = current_para_lines[i].strip()
-
-                if not curr_line:  # Skip empty lines within a paragraph block
-                    continue
-
-                prev_ends_punct = prev_line.endswith((".", "!", "?", ":", ";", ")", "]"))
-                curr_starts_lower = curr_line and curr_line[0].islower()
-                # More conservative joining:
-                prev_ends_punct = prev_line.endswith((".", "!", "?", ":", ";", ")", "]"))
-                curr_starts_lower = curr_line and curr_line[0].islower()
-                # Avoid joining list items or short headings to subsequent
-                # lines
-                prev_is_list_item = prev_line.startswith(("-", "*", "•")) or re.match(r"^\s*\d+\.\s+", prev_line)
-                # prev_is_short_heading = len(prev_line.split()) < 5 and prev_line.endswith(tuple("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"))
-
-                if prev_line and not prev_ends_punct and curr_starts_lower and not prev_is_list_item:
-                    new_paragraph_content[-1] = prev_line + " " + curr_line
-                else:
-                    new_paragraph_content.append(curr_line)
-
-            reconstructed_paragraphs.append("\n".join(new_paragraph_content))
-
-        # Join paragraphs with double newlines
-        final_text = "\n\n".join(filter(None, reconstructed_paragraphs))
-
-        # Final cleanup: replace multiple spaces with single space
-        final_text = re.sub(r" +", " ", final_text)
-        final_text = final_text.strip()  # Remove leading/trailing whitespace/newlines from the whole text
-        return final_text
+        """Generic post-processing for extracted text (see text_normalization)."""
+        return normalize_text(text)
 
     # ───────────────────────────── PPTX ─────────────────────────────── #
 
-    def extract_from_pptx(self, file_io: IO[bytes]) -> str:
-        """Extract concatenated text from all shapes in a PPTX file."""
-        file_io.seek(0)
-        prs = Presentation(file_io)
-        texts: list[str] = []
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                if getattr(shape, "text", None):
-                    texts.append(shape.text)
-        return "\n".join(texts).strip()
+    def iter_pptx_slide_texts(self, source: DocumentSource) -> Iterator[tuple[int, str]]:
+        """
+        Yield (slide_idx, text) for every slide, read straight from the slide XML
+        (shapes, grouped shapes, tables and speaker notes; see ooxml). If that
+        fails, the remaining slides are read with python-pptx (top-level shapes only).
+        """
+        slides_done = 0
+        try:
+            for slide_idx, text in ooxml.iter_pptx_slide_texts(_rewind(source)):
+                yield slide_idx, text
+                slides_done = slide_idx + 1
+        except Exception as exc:
+            logger.warning(
+                "PPTX XML extraction failed (%s). Falling back to python-pptx.",
+                exc,
+                exc_info=True,
+            )
+            prs = Presentation(_rewind(source))
+            for slide_idx, slide in enumerate(prs.slides):
+                if slide_idx >= slides_done:
+                    yield slide_idx, "\n".join(shape.text for shape in slide.shapes if getattr(shape, "text", None))
+
+    def extract_from_pptx(self, source: DocumentSource) -> str:
+        """Extract post-processed paged text from a PPTX file, one page per slide."""
+        return "".join(iter_paged_text(self.iter_pptx_slide_texts(source), 0))
 
     # ───────────────────────────── DOCX ─────────────────────────────── #
 
-    def extract_from_docx(self, file_io: IO[bytes]) -> str:
-        """Extract text from a modern Word (.docx) document."""
-        file_io.seek(0)
-        doc = Document(file_io)
+    def extract_from_docx(self, source: DocumentSource) -> str:
+        """Extract text from a modern Word (.docx) document: paragraphs, tables and text boxes."""
+        try:
+            return "\n".join(ooxml.iter_docx_lines(_rewind(source))).strip()
+        except Exception as exc:
+            logger.warning(
+                "DOCX XML extraction failed (%s). Falling back to python-docx.",
+                exc,
+                exc_info=True,
+            )
+        doc = Document(_rewind(source))
         return "\n".join(p.text for p in doc.paragraphs if p.text).strip()
 
+    # ───────────────────────────── Images ───────────────────────────── #
+
+    def extract_from_image(self, source: DocumentSource) -> str:
+        """Recognize the (handwritten) text of a PNG/JPEG image."""
+        with Image.open(_rewind(source)) as image:
+            rgb_image = image.convert("RGB")
+        recognizer = self.text_recognizer or get_handwriting_recognizer()
+        return recognizer.recognize(rgb_image).strip()
+
     # ────────────────────────── Dispatcher ──────────────────────────── #
 
-    def extract_text(self, file_io: IO[bytes], filename: str) -> str:
-        """Dispatch to the correct extractor based on *filename* extension."""
+    def extract_paged_text(self, source: DocumentSource, filename: str) -> str:
+        """
+        Dispatch to the correct extractor based on *filename* extension.
+        *source* is a binary stream or the path of the file on disk.
+        PDF and PPTX text carries a PAGE_BREAK at the start of every page (slide).
+        """
         ext = filename.lower().rsplit(".", 1)[-1]
         raw_text = ""
         if ext == "pdf":
-            raw_text = self.extract_from_pdf(file_io)
+            return self.extract_from_pdf(source)  # Post-processed page by page
         elif ext == "pptx":
-            raw_text = self.extract_from_pptx(file_io)
+            return self.extract_from_pptx(source)  # Post-processed slide by slide
         elif ext == "docx":
-            raw_text = self.extract_from_docx(file_io)
+            raw_text = self.extract_from_docx(source)
+        elif ext in IMAGE_EXTENSIONS:
+            raw_text = self.extract_from_image(source)
         else:
             raise ValueError(f"Unsupported file type: {ext}")
         return self._post_process_text(raw_text)
 
+    def extract_text(self, source: DocumentSource, filename: str) -> str:
+        """Extract the post-processed text of *source*, without page breaks."""
+        return self.extract_paged_text(source, filename).replace(PAGE_BREAK, "")
+
+
+def _png_bytes(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _extract_pdf_shard(source: PdfSource, start: int, stop: int, collect_scanned_lines: bool = False) -> tuple[list[PdfBlock], list[int], list[ScannedLine]]:
+    """
+    Worker entry point for page-parallel extraction: (blocks of pages [start, stop), indices of the pages
+    PyMuPDF failed on, text lines of the scanned pages). The lines are only rendered with
+    *collect_scanned_lines*, which the caller sets when it can recognize them (see TextExtractor.ocr_available);
+    otherwise scanned pages are reported as failed.
+    """
+    failed_pages: list[int] = []
+    scanned_lines: Optional[list[ScannedLine]] = [] if collect_scanned_lines else None
+    blocks = TextExtractor(exit_on_page_hang=True, scanned_lines=scanned_lines).extract_pdf_page_range(source, start, stop, failed_pages)
+    return blocks, failed_pages, scanned_lines or []
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
@@ -1,11 +1,215 @@
-from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+"""Handwritten text recognition for image uploads (TrOCR on CPU).
+
+The model is loaded on first use, once per process, and shared by all
+callers.  ``HandwrittenTextRecognizer.recognize`` is blocking and safe to call
+from many threads: requests are queued and a batching thread groups whatever
+arrives within a short wait into one ``model.generate`` call, which is much
+cheaper per image on CPU than one call per image.  Optionally the model's
+linear layers are quantized to int8 (dynamic quantization), and the number
+of torch threads is capped so OCR does not starve extraction and the event loop.
+
+The model reads single lines of text, so whole pages (scanned PDF pages)
+are first cut into lines with ``find_text_lines``.
+
+torch and transformers are optional dependencies: without them, image
+uploads fail with an error saying so, scanned PDF pages are skipped and
+reported as failed pages, and other documents are unaffected.
+"""
+
+import importlib.util
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
+
 from PIL import Image
 
-url = "/Users/i_gore/PycharmProjects/study_sync/data/docs/tg_image_1864149188.png"
-image = Image.open(url).convert("RGB")
-processor = TrOCRProcessor.from_pretrained("fhswf/TrOCR_Math_handwritten")
-model = VisionEncoderDecoderModel.from_pretrained("fhswf/TrOCR_Math_handwritten")
-pixel_values = processor(images=image, return_tensors="pt").pixel_values
-generated_ids = model.generate(pixel_values)
-generated_text = processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
-print(generated_text)
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Gray values darker than this count as ink when looking for lines
+_INK_THRESHOLD = 160
+
+
+def _default_num_threads() -> int:
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+@lru_cache(maxsize=None)
+def _backend_installed() -> bool:
+    return importlib.util.find_spec("torch") is not None and importlib.util.find_spec("transformers") is not None
+
+
+@lru_cache(maxsize=None)
+def _load_model(model_name: str, quantize: bool, num_threads: int) -> Tuple[Any, Any]:
+    """(processor, model) for *model_name*, in eval mode and optionally int8-quantized."""
+    try:
+        import torch
+        from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+    except ImportError as e:
+        raise RuntimeError("Handwritten text recognition requires torch and transformers to be installed.") from e
+
+    torch.set_num_threads(num_threads)
+    started = time.perf_counter()
+    processor = TrOCRProcessor.from_pretrained(model_name)
+    model = VisionEncoderDecoderModel.from_pretrained(model_name)
+    model.eval()
+    if quantize:
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    logger.info(f"Loaded OCR model {model_name} in {time.perf_counter() - started:.1f}s (int8={quantize}, threads={num_threads}).")
+    return processor, model
+
+
+def find_text_lines(page_image: Any, dpi: int) -> List[Tuple[int, int, int, int]]:
+    """
+    Bounding boxes (left, top, right, bottom) of the text lines of a grayscale
+    page image rendered at *dpi*, top to bottom. Lines are runs of rows with
+    ink (the row profile is computed by PIL in C); runs separated by less
+    than 1/50 inch are merged and runs lower than 1/30 inch are dropped as specks.
+    """
+    ink = page_image.point(lambda value: 255 if value < _INK_THRESHOLD else 0)
+    width, height = ink.size
+    row_ink = ink.resize((1, height), resample=Image.Resampling.BOX).tobytes()  # Mean ink per row
+    min_gap, min_height, padding = max(1, dpi // 50), max(2, dpi // 30), max(1, dpi // 75)
+
+    runs: List[List[int]] = []
+    for y, value in enumerate(row_ink):
+        if value < 2:  # Less than ~1% of the row
+            continue
+        if runs and y - runs[-1][1] <= min_gap:
+            runs[-1][1] = y + 1
+        else:
+            runs.append([y, y + 1])
+
+    lines = []
+    for top, bottom in runs:
+        if bottom - top < min_height:
+            continue
+        bbox = ink.crop((0, top, width, bottom)).getbbox()
+        if bbox is None:
+            continue
+        left, _, right, _ = bbox
+        lines.append((max(0, left - padding), max(0, top - padding), min(width, right + padding), min(height, bottom + padding)))
+    return lines
+
+
+class HandwrittenTextRecognizer:
+    """Recognizes the text of images with a TrOCR model, in dynamic micro-batches."""
+
+    def __init__(
+        self,
+        model_name: str = "fhswf/TrOCR_Math_handwritten",
+        max_batch_size: int = 8,
+        max_wait_seconds: float = 0.05,
+        quantize: bool = False,
+        num_threads: int = 0,
+    ):
+        """
+        Args:
+            model_name: Hugging Face name or local path of a TrOCR model.
+            max_batch_size: Most images decoded in one model.generate call.
+            max_wait_seconds: How long a batch waits for more images after the first one arrived.
+            quantize: Apply int8 dynamic quantization to the model's linear layers.
+            num_threads: torch threads for inference. 0 uses half of the cores.
+        """
+        self.model_name = model_name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max_wait_seconds
+        self.quantize = quantize
+        self.num_threads = num_threads if num_threads > 0 else _default_num_threads()
+        self.batches = 0
+        self.images = 0
+        self._requests: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+        self._batcher: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        logger.info(
+            f"HandwrittenTextRecognizer initialized with model={model_name}, max_batch_size={self.max_batch_size}, "
+            f"max_wait_seconds={max_wait_seconds}, quantize={quantize}, num_threads={self.num_threads}"
+        )
+
+    def is_available(self) -> bool:
+        """Whether the model can run here: torch and transformers are installed."""
+        return _backend_installed()
+
+    def recognize_batch(self, images: List[Any]) -> List[str]:
+        """Recognizes the text of RGB PIL images in a single model.generate call."""
+        processor, model = _load_model(self.model_name, self.quantize, self.num_threads)
+        import torch
+
+        pixel_values = processor(images=images, return_tensors="pt").pixel_values
+        with torch.inference_mode():
+            generated_ids = model.generate(pixel_values)
+        return processor.batch_decode(generated_ids, skip_special_tokens=True)
+
+    def recognize(self, image: Any) -> str:
+        """Recognizes the text of one image, batched with concurrent requests. Blocks until done."""
+        return self.submit(image).result()
+
+    def submit(self, image: Any) -> Future:
+        """Queues *image* for the next batch and returns a Future of its text."""
+        future: Future = Future()
+        self._ensure_batcher()
+        self._requests.put((image, future))
+        return future
+
+    def _ensure_batcher(self):
+        with self._lock:
+            if self._batcher is None or not self._batcher.is_alive():
+                self._batcher = threading.Thread(target=self._run_batches, name="ocr-batcher", daemon=True)
+                self._batcher.start()
+
+    def _next_batch(self) -> List[Tuple[Any, Future]]:
+        """Waits for a request, then collects more until the batch is full or max_wait_seconds have passed."""
+        batch = [self._requests.get()]
+        deadline = time.monotonic() + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(self._requests.get(timeout=timeout) if timeout > 0 else self._requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_batches(self):
+        while True:
+            batch = [(image, future) for image, future in self._next_batch() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                texts = self.recognize_batch([image for image, _ in batch])
+                if len(texts) != len(batch):
+                    raise RuntimeError(f"OCR returned {len(texts)} texts for {len(batch)} images.")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.images += len(batch)
+            logger.debug(f"Recognized a batch of {len(batch)} images.")
+            for (_, future), text in zip(batch, texts):
+                future.set_result(text)
+
+
+_recognizer_instance: Optional[HandwrittenTextRecognizer] = None
+_recognizer_lock = threading.Lock()
+
+
+def get_handwriting_recognizer() -> HandwrittenTextRecognizer:
+    """Returns the process-wide recognizer; the model itself is loaded on first use."""
+    global _recognizer_instance
+    with _recognizer_lock:
+        if _recognizer_instance is None:
+            _recognizer_instance = HandwrittenTextRecognizer(
+                model_name=settings.OCR_MODEL_NAME,
+                max_batch_size=settings.OCR_MAX_BATCH_SIZE,
+                max_wait_seconds=settings.OCR_MAX_BATCH_WAIT_MS / 1000,
+                quantize=settings.OCR_QUANTIZE_INT8,
+                num_threads=settings.OCR_NUM_THREADS,
+            )
+    return _recognizer_instance
@@ -0,0 +1,186 @@
+"""Text extraction straight from the XML parts of DOCX and PPTX files.
+
+python-docx and python-pptx build the whole object model of a document just
+to read ``p.text`` and ``shape.text``, and they skip text in tables, grouped
+shapes and speaker notes.  Here the parts are read from the zip archive with
+``iterparse``, one paragraph at a time: ``word/document.xml`` for DOCX, and
+every slide in presentation order (plus its notes slide) for PPTX.
+
+Paragraphs become lines, and table rows become one line with the cells
+separated by " | ".  Alternate content keeps only the preferred variant, and
+slide number, date, header and footer placeholders are skipped.
+"""
+
+from __future__ import annotations
+
+import posixpath
+import zipfile
+from typing import IO, Iterator, Optional, Union
+
+from lxml.etree import iterparse
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_P = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+_MC = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_NOTES_SLIDE_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/notesSlide"
+
+# Placeholders whose text is generated boilerplate rather than content
+_SKIPPED_PLACEHOLDERS = {"sldNum", "sldImg", "dt", "hdr", "ftr"}
+
+ZipSource = Union[IO[bytes], str]
+
+
+class _Vocabulary:
+    """The tags a markup language uses for paragraphs, text, breaks and tables."""
+
+    def __init__(self, ns: str, breaks: tuple[str, ...], tabs: tuple[str, ...], skipped: tuple[str, ...] = ()):
+        self.paragraph = ns + "p"
+        self.text = ns + "t"
+        self.breaks = {ns + tag for tag in breaks}
+        self.tabs = {ns + tag for tag in tabs}
+        self.row = ns + "tr"
+        self.cell = ns + "tc"
+        # Subtrees without content: fallbacks for alternate content, and properties (tab stops are w:tab too)
+        self.skipped = {_MC + "Fallback"} | {ns + tag for tag in skipped}
+        # The only tags the parser reports; the others are skipped without a Python call
+        self.tags = sorted({self.paragraph, self.text, self.row, self.cell, _P + "sp", _P + "ph"} | self.breaks | self.tabs | self.skipped)
+
+
+_WORD = _Vocabulary(_W, breaks=("br", "cr"), tabs=("tab",), skipped=("pPr",))
+_DRAWING = _Vocabulary(_A, breaks=("br",), tabs=())
+
+
+def _iter_lines(xml_file: IO[bytes], vocabulary: _Vocabulary) -> Iterator[str]:
+    """
+    Yields the non-empty lines of an XML part in document order: one per
+    paragraph outside tables, one per table row. Paragraphs nested in other
+    paragraphs (text boxes) come before the paragraph containing them.
+    """
+    paragraphs: list[list[str]] = []  # Text of the paragraphs being read, innermost last
+    rows: list[list[str]] = []  # Cells of the table rows being read
+    cells: list[list[str]] = []  # Lines of the table cells being read
+    skip_depth = 0  # > 0 inside subtrees whose text is ignored
+    shape_skipped: list[bool] = []  # Per enclosing PresentationML shape: is it a skipped placeholder?
+
+    def add_line(line: str) -> Optional[str]:
+        if cells:
+            cells[-1].append(line)
+            return None
+        return line
+
+    for event, elem in iterparse(xml_file, events=("start", "end"), tag=vocabulary.tags):
+        tag = elem.tag
+        if event == "start":
+            if tag in vocabulary.skipped:
+                skip_depth += 1
+            elif tag == _P + "sp":
+                shape_skipped.append(False)
+            elif tag == _P + "ph" and shape_skipped and elem.get("type") in _SKIPPED_PLACEHOLDERS:
+                shape_skipped[-1] = True
+            elif skip_depth or (shape_skipped and shape_skipped[-1]):
+                continue
+            elif tag == vocabulary.paragraph:
+                paragraphs.append([])
+            elif tag == vocabulary.row:
+                rows.append([])
+            elif tag == vocabulary.cell:
+                cells.append([])
+            continue
+
+        if tag in vocabulary.skipped:
+            skip_depth -= 1
+            elem.clear()
+            continue
+        if tag == _P + "sp":
+            shape_skipped.pop()
+            elem.clear()
+            continue
+        if skip_depth or (shape_skipped and shape_skipped[-1]):
+            continue
+        if tag == vocabulary.text:
+            if paragraphs and elem.text:
+                paragraphs[-1].append(elem.text)
+        elif tag in vocabulary.tabs:
+            if paragraphs:
+                paragraphs[-1].append("\t")
+        elif tag in vocabulary.breaks:
+            if paragraphs:
+                paragraphs[-1].append("\n")
+        elif tag == vocabulary.paragraph:
+            text = "".join(paragraphs.pop())
+            if text.strip():
+                line = add_line(text)
+                if line is not None:
+                    yield line
+            elem.clear()
+        elif tag == vocabulary.cell:
+            cell_text = " ".join(cells.pop())
+            if rows:
+                rows[-1].append(cell_text)
+        elif tag == vocabulary.row:
+            cell_texts = rows.pop()
+            if any(cell_texts):
+                line = add_line(" | ".join(cell_texts))
+                if line is not None:
+                    yield line
+            elem.clear()
+
+
+def iter_docx_lines(source: ZipSource) -> Iterator[str]:
+    """Lines of the body of a DOCX file (paragraphs, table rows, text boxes)."""
+    with zipfile.ZipFile(source) as archive, archive.open("word/document.xml") as xml_file:
+        yield from _iter_lines(xml_file, _WORD)
+
+
+def _relationships(archive: zipfile.ZipFile, part: str) -> dict[str, tuple[str, str]]:
+    """Relationship id -> (type, target part) of *part*."""
+    directory, name = posixpath.split(part)
+    rels_part = posixpath.join(directory, "_rels", name + ".rels")
+    try:
+        archive.getinfo(rels_part)
+    except KeyError:
+        return {}
+    relationships = {}
+    with archive.open(rels_part) as rels_file:
+        for _, elem in iterparse(rels_file):
+            if elem.tag == _PKG_REL + "Relationship" and elem.get("TargetMode") != "External":
+                target = posixpath.normpath(posixpath.join(directory, elem.get("Target", "")))
+                relationships[elem.get("Id")] = (elem.get("Type", ""), target)
+    return relationships
+
+
+def pptx_slide_parts(archive: zipfile.ZipFile) -> list[tuple[str, Optional[str]]]:
+    """(slide part, notes slide part or None) of every slide, in presentation order."""
+    presentation_rels = _relationships(archive, "ppt/presentation.xml")
+    slide_ids = []
+    with archive.open("ppt/presentation.xml") as xml_file:
+        for _, elem in iterparse(xml_file):
+            if elem.tag == _P + "sldId":
+                slide_ids.append(elem.get(_R + "id"))
+    parts = []
+    for slide_id in slide_ids:
+        _, slide_part = presentation_rels[slide_id]
+        notes_parts = [target for rel_type, target in _relationships(archive, slide_part).values() if rel_type == _NOTES_SLIDE_REL_TYPE]
+        parts.append((slide_part, notes_parts[0] if notes_parts else None))
+    return parts
+
+
+def iter_pptx_slide_texts(source: ZipSource) -> Iterator[tuple[int, str]]:
+    """
+    (slide_idx, text) of every slide of a PPTX file in presentation order,
+    empty slides included. The text of the slide's shapes (grouped ones and
+    tables too) is followed by its speaker notes after a blank line.
+    """
+    with zipfile.ZipFile(source) as archive:
+        for slide_idx, (slide_part, notes_part) in enumerate(pptx_slide_parts(archive)):
+            with archive.open(slide_part) as xml_file:
+                text = "\n".join(_iter_lines(xml_file, _DRAWING))
+            if notes_part is not None:
+                with archive.open(notes_part) as xml_file:
+                    notes = "\n".join(_iter_lines(xml_file, _DRAWING))
+                if notes:
+                    text = f"{text}\n\n{notes}" if text else notes
+            yield slide_idx, text
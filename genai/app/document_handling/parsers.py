@@ -1,64 +1,388 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+import bisect
 import logging
-from typing import List
+import re
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import settings
+from app.core.tokenizer import TokenCounter, get_token_counter
+from app.document_handling.chunks import Chunk, ChunkTable
+from app.document_handling.extractors import PAGE_BREAK
 
 logger = logging.getLogger(__name__)
 
+# Lower bound of characters per token, used to size split windows in characters
+_MIN_CHARS_PER_TOKEN = 3
+
+# RecursiveCharacterTextSplitter's default separators, tried in this order
+DEFAULT_SEPARATORS = ("\n\n", "\n", " ", "")
+
+# (start, end) offsets of a chunk in the text it was split from
+Span = Tuple[int, int]
+
+
+class FastTextSplitter:
+    """
+    Splits text into the same chunks as RecursiveCharacterTextSplitter with its
+    default settings (separators kept at the start of the following piece,
+    chunks stripped), in linear time, returning them as offsets into the text.
+
+    The recursive splitter cuts the text into pieces at every separator and
+    joins them back into chunks. Here pieces are never materialized. With
+    lengths in characters, a chunk's length is the distance between its
+    offsets, so a chunk ends at the last separator within chunk_size of its
+    start and the next one starts at the first separator that keeps the
+    overlap within chunk_overlap; both are found with str.rfind/str.find.
+    Other length functions (e.g. token counts) are applied to each piece once
+    and merged over the piece offsets.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        length_function: Callable[[str], int] = len,
+        separators: Sequence[str] = DEFAULT_SEPARATORS,
+    ):
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be > 0, got {chunk_size}")
+        if not 0 <= chunk_overlap <= chunk_size:
+            raise ValueError(f"chunk_overlap must be between 0 and chunk_size ({chunk_size}), got {chunk_overlap}")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length_function = length_function
+        self.separators = list(separators)
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_spans(self, text: str, start: int = 0, end: Optional[int] = None) -> List[Span]:
+        """(start, end) offsets of the chunks of text[start:end]."""
+        spans: List[Span] = []
+        self._split(text, start, len(text) if end is None else end, 0, spans)
+        return spans
+
+    def split_window(self, text: str, start: int, end: int, final: bool = False) -> Tuple[List[Span], int]:
+        """
+        Splits text[start:end], part of a text that contains separators[0], into the
+        same chunks as splitting the whole text, provided start and end are offsets the
+        whole text is cut at (see last_boundary). Returns the offsets of the chunks that
+        do not depend on the text after end, and the offset to split the rest of the
+        text from: the start of the last chunk, which is only returned if *final*.
+        """
+        separator = self.separators[0]
+        spans: List[Span] = []
+        rest = self._merge(text, start, end, separator, 1 if separator and len(self.separators) > 1 else None, spans)
+        if final:
+            self._add_stripped(text, rest, end, spans)
+            rest = end
+        return spans, rest
+
+    def last_boundary(self, text: str, start: int, end: int) -> int:
+        """The last offset in text[start:end] a text containing separators[0] is cut at, or start if there is none; start must be one."""
+        separator = self.separators[0]
+        if not separator:
+            return end
+        if len(separator) == 1:
+            found = text.rfind(separator, start + 1, end)
+            return start if found == -1 else found
+        boundaries = self._boundaries(text, start, end, separator)
+        return boundaries[-2] if len(boundaries) > 2 else start
+
+    def _split(self, text: str, start: int, end: int, level: int, spans: List[Span]):
+        """Splits text[start:end] at the first of separators[level:] it contains, recursing into pieces that are too long."""
+        separator, next_level = self.separators[-1], None
+        for i in range(level, len(self.separators)):
+            if not self.separators[i]:
+                separator = ""
+                break
+            if text.find(self.separators[i], start, end) != -1:
+                separator = self.separators[i]
+                next_level = i + 1 if i + 1 < len(self.separators) else None
+                break
+        rest = self._merge(text, start, end, separator, next_level, spans)
+        self._add_stripped(text, rest, end, spans)
+
+    def _merge(self, text: str, start: int, end: int, separator: str, next_level: Optional[int], spans: List[Span]) -> int:
+        """Merges the pieces of text[start:end] into chunks, adding all but the last to spans; returns the offset the last one starts at."""
+        if self.length_function is len:
+            return self._merge_by_offsets(text, start, end, separator, next_level, spans)
+        return self._merge_by_lengths(text, start, end, separator, next_level, spans)
+
+    def _split_long_piece(self, text: str, start: int, end: int, next_level: Optional[int], spans: List[Span]):
+        if next_level is None:
+            spans.append((start, end))  # Kept as is, like the recursive splitter does
+        else:
+            self._split(text, start, end, next_level, spans)
+
+    def _merge_by_offsets(self, text: str, start: int, end: int, separator: str, next_level: Optional[int], spans: List[Span]) -> int:
+        next_boundary, last_boundary, first_boundary = self._boundary_finders(text, start, end, separator)
+        chunk_size = self.chunk_size
+
+        chunk_start = start
+        while chunk_start < end:
+            piece_end = next_boundary(chunk_start)
+            if piece_end - chunk_start >= chunk_size:
+                # A piece too long on its own ends the current run of pieces
+                self._split_long_piece(text, chunk_start, piece_end, next_level, spans)
+                chunk_start = piece_end
+                continue
+            if chunk_start + chunk_size >= end:
+                return chunk_start
+            chunk_end = last_boundary(chunk_start, chunk_start + chunk_size)
+            self._add_stripped(text, chunk_start, chunk_end, spans)
+            next_piece_end = next_boundary(chunk_end)
+            if next_piece_end - chunk_end >= chunk_size:
+                chunk_start = chunk_end  # No overlap across a piece that is split on its own
+            else:
+                # Drop pieces from the front until the overlap fits chunk_overlap and the next piece fits the chunk
+                chunk_start = first_boundary(max(chunk_end - self.chunk_overlap, next_piece_end - chunk_size))
+        return end
+
+    def _merge_by_lengths(self, text: str, start: int, end: int, separator: str, next_level: Optional[int], spans: List[Span]) -> int:
+        boundaries = self._boundaries(text, start, end, separator)
+        lengths = [self.length_function(text[piece_start:piece_end]) for piece_start, piece_end in zip(boundaries, boundaries[1:])]
+        chunk_size, chunk_overlap = self.chunk_size, self.chunk_overlap
+        # Pieces are joined without a separator, but the recursive splitter still counts its length between them
+        separator_length = self.length_function("")
+
+        first = 0  # The current chunk is made of pieces first..i-1
+        total = 0
+        for i, length in enumerate(lengths):
+            if length >= chunk_size:
+                if first < i:
+                    self._add_stripped(text, boundaries[first], boundaries[i], spans)
+                self._split_long_piece(text, boundaries[i], boundaries[i + 1], next_level, spans)
+                first, total = i + 1, 0
+                continue
+            if total + length + (separator_length if first < i else 0) > chunk_size and first < i:
+                self._add_stripped(text, boundaries[first], boundaries[i], spans)
+                # Drop pieces from the front until the overlap fits chunk_overlap and the next piece fits the chunk
+                while total > chunk_overlap or (total + length + (separator_length if first < i else 0) > chunk_size and total > 0):
+                    total -= lengths[first] + (separator_length if i - first > 1 else 0)
+                    first += 1
+            total += length + (separator_length if first < i else 0)
+        return boundaries[first] if first < len(lengths) else end
+
+    @staticmethod
+    def _boundaries(text: str, start: int, end: int, separator: str) -> List[int]:
+        """Piece boundaries of text[start:end] split at *separator*: start, each separator occurrence, end."""
+        if not separator:  # Every character is a piece
+            return list(range(start, end + 1))
+        # Non-overlapping occurrences, as the recursive splitter's regex split finds them
+        return [start] + [match.start() for match in re.compile(re.escape(separator)).finditer(text, start, end) if match.start() > start] + [end]
+
+    @classmethod
+    def _boundary_finders(cls, text: str, start: int, end: int, separator: str) -> Tuple[Callable[[int], int], Callable[[int, int], int], Callable[[int], int]]:
+        """
+        Functions over the piece boundaries of text[start:end] split at *separator*:
+        the first boundary after a position, the last one in [low, high], and the
+        first one at or after a position.
+        """
+        if not separator:
+            return (lambda pos: pos + 1), (lambda low, high: high), (lambda pos: pos)
+
+        if len(separator) == 1:
+
+            def next_boundary(pos: int) -> int:
+                found = text.find(separator, pos + 1, end)
+                return end if found == -1 else found
+
+            def last_boundary(low: int, high: int) -> int:
+                found = text.rfind(separator, low + 1, high + 1)
+                return low if found == -1 else found
+
+            def first_boundary(pos: int) -> int:
+                found = text.find(separator, pos, end)
+                return end if found == -1 else found
+
+            return next_boundary, last_boundary, first_boundary
+
+        # Occurrences of longer separators may overlap (e.g. three newlines), so list the ones the split uses
+        boundaries = cls._boundaries(text, start, end, separator)
+        return (
+            lambda pos: boundaries[bisect.bisect_right(boundaries, pos)],
+            lambda low, high: boundaries[bisect.bisect_right(boundaries, high) - 1],
+            lambda pos: boundaries[bisect.bisect_left(boundaries, pos)],
+        )
+
+    @staticmethod
+    def _add_stripped(text: str, start: int, end: int, spans: List[Span]):
+        chunk = text[start:end]
+        stripped = chunk.strip()
+        if stripped:
+            offset = start + len(chunk) - len(chunk.lstrip())
+            spans.append((offset, offset + len(stripped)))
+
 
 class DocumentParser:
     """Parses extracted text into manageable chunks (Documents for LangChain)."""
 
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, token_counter: Optional[TokenCounter] = None, size_in_tokens: bool = False):
         """
         Initializes the text splitter.
         Args:
-            chunk_size: The maximum number of characters in each chunk.
-            chunk_overlap: The number of characters to overlap between chunks.
+            chunk_size: The maximum number of characters (or tokens) in each chunk.
+            chunk_overlap: The number of characters (or tokens) to overlap between chunks.
+            token_counter: Counts the tokens of a text. If given, each chunk's token count
+                           is stored as token_count in its metadata, so prompts can be
+                           budgeted without tokenizing retrieved chunks again.
+            size_in_tokens: Measure chunk_size and chunk_overlap in tokens of token_counter.
         """
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        if size_in_tokens and token_counter is None:
+            raise ValueError("Sizing chunks in tokens requires a token_counter.")
+        self.token_counter = token_counter
+        # Text is split in windows of at least this many characters (see iter_chunk_tables)
+        self.window_size = 4 * chunk_size * (_MIN_CHARS_PER_TOKEN if size_in_tokens else 1)
+        # Same chunks as LangChain's RecursiveCharacterTextSplitter, as offsets into the text
+        self.text_splitter = FastTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
-            length_function=len,
-            # add_start_index=True, # Useful for some RAG strategies
+            length_function=token_counter if size_in_tokens else len,
         )
-        logger.info(f"DocumentParser initialized with chunk_size={chunk_size}, chunk_overlap={chunk_overlap}")
+        logger.info(f"DocumentParser initialized with chunk_size={chunk_size}, chunk_overlap={chunk_overlap} ({'tokens' if size_in_tokens else 'characters'})")
 
     def split_text_to_documents(self, text: str, metadata: dict = None) -> List[Document]:
         """
         Splits a long text into smaller Document objects.
         Args:
-            text: The text content to split.
+            text: The text content to split; paged text (see TextExtractor.extract_paged_text)
+                  adds page_number and last_page_number to each chunk's metadata.
             metadata: Optional metadata to associate with each created Document.
                       This metadata can include source filename, page numbers, etc.
         Returns:
             A list of LangChain Document objects.
         """
-        if not text:
+        return self.split_text_to_chunks(text, metadata=metadata).to_documents()
+
+    def split_text_to_chunks(self, text: str, metadata: dict = None) -> ChunkTable:
+        """
+        Splits a long text like split_text_to_documents, into a ChunkTable over a
+        single copy of the text (without page breaks) instead of one Document per chunk.
+        """
+        if not text or not text.strip(PAGE_BREAK):
             logger.warning("Attempted to split empty text. Returning empty list.")
-            return []
+            return ChunkTable("", metadata)
 
-        base_metadata = metadata or {}
+        page_starts: List[int] = []
+        table: Optional[ChunkTable] = None
+        # A single piece is split in place, so every window is part of the same buffer
+        for buffer, buffer_offset, spans in self._iter_windows([text], page_starts):
+            if table is None:
+                table = ChunkTable(buffer, metadata)
+            self._add_chunks(table, spans, buffer_offset, page_starts)
+        table = table if table is not None else ChunkTable("", metadata)
+        logger.info(f"Split text into {len(table)} documents.")
+        return table
 
-        split_texts = self.text_splitter.split_text(text)
+    def iter_documents(self, text_pieces: Iterable[str], metadata: dict = None) -> Iterator[Document]:
+        """
+        Splits text arriving in pieces (e.g. one per page) into Document objects lazily.
+        Args:
+            text_pieces: Consecutive pieces of the (paged) text; joined, they form the whole text.
+            metadata: Optional metadata to associate with each created Document.
+        Returns:
+            An iterator of LangChain Document objects.
+        """
+        for chunk in self.iter_chunks(text_pieces, metadata=metadata):
+            yield chunk.to_document()
+
+    def iter_chunks(self, text_pieces: Iterable[str], metadata: dict = None) -> Iterator[Chunk]:
+        """Lazy counterpart of split_text_to_chunks for text arriving in pieces (see iter_chunk_tables)."""
+        for table in self.iter_chunk_tables(text_pieces, metadata=metadata):
+            yield from table
+
+    def iter_chunk_tables(self, text_pieces: Iterable[str], metadata: dict = None) -> Iterator[ChunkTable]:
+        """
+        Splits text arriving in pieces into one ChunkTable per split window. Once
+        a few chunks of text have arrived, it is split up to the last offset the whole
+        text is cut at (an occurrence of the first separator, e.g. a paragraph break):
+        every chunk of the window but the last is emitted, and the text from the last
+        chunk on is split again with what follows, so chunks overlap across window and
+        page boundaries. The chunks are the same as splitting the whole text at once
+        (as RecursiveCharacterTextSplitter does), however it is cut into pieces. Text
+        without the first separator is only split once it has arrived in full.
+        For paged text, the offsets of the page breaks are collected as the pieces
+        arrive, and each chunk's start and end are mapped to the pages they fall on
+        by binary search (page_number and last_page_number, counted from 1).
+        """
+        page_starts: List[int] = []
+        chunk_index = 0
+        for buffer, buffer_offset, spans in self._iter_windows(text_pieces, page_starts):
+            table = ChunkTable(buffer, metadata, first_chunk_index=chunk_index)
+            self._add_chunks(table, spans, buffer_offset, page_starts)
+            chunk_index += len(table)
+            yield table
+
+    def _iter_windows(self, text_pieces: Iterable[str], page_starts: List[int]) -> Iterator[Tuple[str, int, List[Span]]]:
+        """
+        Yields (buffer, buffer_offset, spans) per split window: the offsets of its
+        finished chunks in buffer, whose start is at buffer_offset in the text
+        without page breaks. Appends the offset of every page break to page_starts.
+        Windows are offsets into the buffer, which is only cut down when the next
+        piece is appended, so a single piece is never copied.
+        """
+        splitter = self.text_splitter
+        first_separator = splitter.separators[0]
+        # The whole text is split at the first separator only if it contains it anywhere
+        separator_seen = not first_separator
+        buffer = ""
+        buffer_offset = 0  # Offset of buffer[0] in the text without page breaks
+        window_start = 0  # Start of the next window in buffer, where the whole text is cut
+        window_size = self.window_size
 
-        documents = []
-        for i, chunk_text in enumerate(split_texts):
-            # Create specific metadata for each chunk if needed
-            chunk_metadata = base_metadata.copy()
-            chunk_metadata["chunk_index"] = i  # Example of adding chunk-specific metadata
-            # You might add more sophisticated metadata like original page
-            # numbers if available from extractor
+        for piece in text_pieces:
+            buffer_offset += window_start
+            if PAGE_BREAK in piece:
+                *page_texts, rest = piece.split(PAGE_BREAK)
+                offset = buffer_offset + len(buffer) - window_start
+                for page_text in page_texts:
+                    offset += len(page_text)
+                    page_starts.append(offset)
+                piece = "".join(page_texts) + rest
+            searched = max(0, len(buffer) - window_start - len(first_separator) + 1)
+            buffer = buffer[window_start:] + piece
+            window_start = 0
+            if not separator_seen:
+                separator_seen = buffer.find(first_separator, searched) != -1
+            while separator_seen and len(buffer) - window_start >= window_size:
+                # Windows end where the whole text is cut, so their chunks are the whole text's
+                window_end = splitter.last_boundary(buffer, window_start, len(buffer))
+                spans, carry_from = splitter.split_window(buffer, window_start, window_end)
+                if carry_from == window_start:
+                    # No chunk ends before the window does (e.g. long tokens or pieces); wait for more text
+                    window_size *= 2
+                    continue
+                if spans:
+                    yield buffer, buffer_offset, spans
+                # Carry on from the last chunk of the window
+                window_start = carry_from
+                window_size = self.window_size
 
-            doc = Document(page_content=chunk_text, metadata=chunk_metadata)
-            documents.append(doc)
+        if len(buffer) > window_start:
+            # Without the first separator, nothing was split yet and the buffer holds the whole text
+            spans = splitter.split_window(buffer, window_start, len(buffer), final=True)[0] if separator_seen else splitter.split_spans(buffer, window_start)
+            if spans:
+                yield buffer, buffer_offset, spans
 
-        logger.info(f"Split text into {len(documents)} documents.")
-        return documents
+    def _add_chunks(self, table: ChunkTable, spans: List[Span], buffer_offset: int, page_starts: List[int]):
+        for chunk_start, chunk_end in spans:
+            pages = None
+            if page_starts:
+                start = buffer_offset + chunk_start
+                end = buffer_offset + chunk_end
+                pages = (max(1, bisect.bisect_right(page_starts, start)), max(1, bisect.bisect_right(page_starts, end - 1)))
+            token_count = self.token_counter(table.text[chunk_start:chunk_end]) if self.token_counter is not None else None
+            table.append(chunk_start, chunk_end, pages, token_count)
 
 
 # Global instance (or inject as dependency)
-document_parser = DocumentParser()
+document_parser = DocumentParser(
+    chunk_size=settings.CHUNK_SIZE,
+    chunk_overlap=settings.CHUNK_OVERLAP,
+    token_counter=get_token_counter(settings.OPENAI_MODEL_NAME),
+    size_in_tokens=settings.CHUNK_SIZE_IN_TOKENS,
+)
 
 
 def get_document_parser() -> DocumentParser:
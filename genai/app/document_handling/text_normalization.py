@@ -0,0 +1,128 @@
+"""Single-pass normalization of extracted text.
+
+Re-joins words hyphenated across line breaks and lines soft-wrapped inside a
+sentence, keeps list items and headings on their own lines, and collapses
+runs of spaces.  Paragraphs are separated by blank lines (a newline, any
+whitespace, and another newline) and are processed one at a time, so the
+input can be streamed, e.g. one string per PDF page:
+
+    "".join(iter_normalized_text(pages)) == normalize_text("".join(pages))
+"""
+
+import re
+from typing import Iterable, Iterator, List, Optional
+
+_PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+_SPACE_RUN_RE = re.compile(r" {2,}")
+_NUMBERED_ITEM_RE = re.compile(r"\d+\.\s")
+
+_SENTENCE_END = (".", "!", "?", ":", ";", ")", "]")
+_LIST_BULLETS = ("-", "*", "•")
+
+
+def _accepts_continuation(line: str) -> bool:
+    """Whether a soft-wrapped lowercase line may be appended to *line* (already stripped)."""
+    return bool(line) and not line.endswith(_SENTENCE_END) and not line.startswith(_LIST_BULLETS) and not _NUMBERED_ITEM_RE.match(line)
+
+
+def _normalize_paragraph(paragraph: str) -> str:
+    lines = paragraph.splitlines()
+    last_index = len(lines) - 1
+    output: List[str] = []
+    previous = ""  # output[-1], stripped
+    previous_accepts = False
+    skip_next = False
+
+    for i, line in enumerate(lines):
+        if skip_next:  # Consumed by the hyphen join of the previous line
+            skip_next = False
+            continue
+        # "exam-" + "ple" -> "example"; the joined line is not re-checked for a trailing hyphen
+        if i < last_index and line.endswith("-"):
+            following = lines[i + 1]
+            if following and following[0].islower():
+                line = line[:-1] + following
+                skip_next = True
+        if not line:
+            continue
+
+        if not output:
+            output.append(line)  # The first line keeps its surrounding whitespace until a join
+            previous = line.strip()
+            previous_accepts = _accepts_continuation(previous)
+            continue
+
+        current = line.strip()
+        if not current:
+            continue
+        if previous_accepts and current[0].islower():
+            # Soft wrap inside a sentence; the joined line keeps the bullet status of its start
+            previous = f"{previous} {current}"
+            output[-1] = previous
+            previous_accepts = not current.endswith(_SENTENCE_END)
+        else:
+            output.append(current)
+            previous = current
+            previous_accepts = _accepts_continuation(current)
+
+    return _SPACE_RUN_RE.sub(" ", "\n".join(output))
+
+
+def iter_normalized_text(pieces: Iterable[str]) -> Iterator[str]:
+    """
+    Normalizes the concatenation of *pieces*, yielding output as soon as
+    paragraphs are complete. Only the unfinished paragraph is buffered.
+    """
+    buffer = ""
+    scan_from = 0  # Paragraph breaks before this offset in buffer have been consumed
+    settled = 0  # buffer[:settled] ends in non-whitespace, so no break can extend past it
+    held_back: Optional[str] = None  # Last paragraph, until we know whether it ends the text
+
+    def paragraphs(end_of_text: bool) -> Iterator[str]:
+        nonlocal buffer, scan_from, settled
+        start = 0
+        matches = _PARAGRAPH_BREAK_RE.finditer(buffer, scan_from) if end_of_text else _PARAGRAPH_BREAK_RE.finditer(buffer, scan_from, settled)
+        for match in matches:
+            yield buffer[start : match.start()]
+            start = match.end()
+        if end_of_text:
+            yield buffer[start:]
+            buffer = ""
+        elif start:
+            buffer = buffer[start:]
+            settled -= start
+        scan_from = settled
+
+    def emit(raw_paragraphs: Iterator[str]) -> Iterator[str]:
+        nonlocal held_back
+        for raw in raw_paragraphs:
+            if not raw or raw.isspace():
+                continue
+            paragraph = _normalize_paragraph(raw)
+            if not paragraph:
+                continue
+            if held_back is None:
+                paragraph = paragraph.lstrip()  # Start of the text
+            else:
+                yield held_back + "\n\n"
+            held_back = paragraph
+
+    for piece in pieces:
+        if not piece:
+            continue
+        buffer += piece
+        trailing_whitespace = len(piece) - len(piece.rstrip())
+        if trailing_whitespace < len(piece):
+            settled = len(buffer) - trailing_whitespace
+            yield from emit(paragraphs(end_of_text=False))
+
+    yield from emit(paragraphs(end_of_text=True))
+    if held_back is not None:
+        yield held_back.rstrip()  # End of the text
+
+
+def normalize_text(text: str) -> str:
+    """Normalizes a complete extracted text (see module docstring)."""
+    if not text:
+        return ""
+    return "".join(iter_normalized_text((text,)))
@@ -0,0 +1,328 @@
+"""Bulk ingestion of a directory or ZIP archive of course material.
+
+    python -m app.ingest <dir|zip> [--group-id GROUP] [--extract-workers N] ...
+
+Files flow through four stages connected by bounded queues, each with its
+own worker threads: extract (TextExtractor in the extraction process pool)
+→ split (DocumentParser) → embed (WeaviateIndexer.embed_documents) → index
+(WeaviateIndexer.index_documents).  Every fully indexed file is appended to
+a state file, so re-running the command after a crash skips those files;
+chunk UUIDs are deterministic, so a partially indexed file is completed
+rather than duplicated.  A throughput report is printed at the end.
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+import zipfile
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from app.config import settings
+from app.document_handling import ooxml
+from app.document_handling.chunks import Chunk
+from app.document_handling.extraction_cache import ExtractionCache, get_extraction_cache, hash_file_source
+from app.document_handling.extraction_pool import ExtractionExecutor, _pdf_page_count, get_extraction_executor
+from app.document_handling.extractors import PAGE_BREAK
+from app.document_handling.parsers import DocumentParser, get_document_parser
+from app.utils.uploads import extract_archive, find_documents, is_zip_archive
+from app.vector_store.weaviate_connector import WeaviateIndexer
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("extract", "split", "embed", "index")
+_DONE = object()  # End-of-input marker passed down the queues
+
+
+@dataclass
+class IngestItem:
+    path: str
+    source: str  # Path relative to the input directory/archive, stored as the chunk "source"
+    sha256: str = ""
+    pages: int = 0
+    text: str = ""
+    documents: Sequence[Chunk] = field(default_factory=list)
+    vectors: Optional[List[List[float]]] = None
+
+
+@dataclass
+class StageStats:
+    items: int = 0
+    busy_seconds: float = 0.0
+
+
+@dataclass
+class IngestReport:
+    files_total: int = 0
+    files_indexed: int = 0
+    files_skipped: int = 0  # Already indexed according to the state file
+    files_failed: int = 0
+    pages: int = 0
+    chunks: int = 0
+    elapsed_seconds: float = 0.0
+    stages: Dict[str, StageStats] = field(default_factory=lambda: {name: StageStats() for name in STAGES})
+    failures: Dict[str, str] = field(default_factory=dict)
+
+    def _rate(self, count: int) -> float:
+        return count / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    def format(self) -> str:
+        lines = [
+            f"Files:   {self.files_indexed} indexed, {self.files_skipped} skipped (already indexed), {self.files_failed} failed, {self.files_total} total",
+            f"Elapsed: {self.elapsed_seconds:.1f}s",
+            f"Throughput: {self._rate(self.files_indexed):.2f} files/s, {self._rate(self.pages):.1f} pages/s, {self._rate(self.chunks):.1f} chunks/s ({self.pages} pages, {self.chunks} chunks)",
+            "Stage      items   busy (s)   avg/item (s)",
+        ]
+        for name, stats in self.stages.items():
+            average = stats.busy_seconds / stats.items if stats.items else 0.0
+            lines.append(f"{name:<9}{stats.items:>7}{stats.busy_seconds:>11.2f}{average:>15.3f}")
+        for source, error in self.failures.items():
+            lines.append(f"FAILED {source}: {error}")
+        return "\n".join(lines)
+
+
+class IngestState:
+    """Append-only record of fully indexed files (source + content hash), used to resume."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.completed: Set[Tuple[str, str]] = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # A line cut short by a crash
+                    self.completed.add((record["source"], record["sha256"]))
+
+    def is_completed(self, item: IngestItem) -> bool:
+        return (item.source, item.sha256) in self.completed
+
+    def mark_completed(self, item: IngestItem):
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"source": item.source, "sha256": item.sha256, "chunks": len(item.documents)}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.completed.add((item.source, item.sha256))
+
+
+def _count_pages(path: str) -> int:
+    """Pages of a PDF or slides of a PPTX; 1 for an image; 0 for DOCX, which has no fixed pages."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        return _pdf_page_count(path)
+    if extension in (".png", ".jpg", ".jpeg"):
+        return 1
+    if extension == ".pptx":
+        # Listed from the presentation part, without parsing the slides
+        with zipfile.ZipFile(path) as archive:
+            return len(ooxml.pptx_slide_parts(archive))
+    return 0
+
+
+class BulkIngestor:
+    """Runs the extract → split → embed → index pipeline over many files."""
+
+    def __init__(
+        self,
+        indexer: WeaviateIndexer,
+        state_path: str,
+        extraction_executor: Optional[ExtractionExecutor] = None,
+        document_parser: Optional[DocumentParser] = None,
+        extraction_cache: Optional[ExtractionCache] = None,
+        group_id: Optional[str] = None,
+        workers: Optional[Dict[str, int]] = None,
+        queue_size: int = 8,
+    ):
+        self.indexer = indexer
+        self.state = IngestState(state_path)
+        self.extraction_executor = extraction_executor or get_extraction_executor()
+        self.document_parser = document_parser or get_document_parser()
+        self.extraction_cache = extraction_cache
+        self.group_id = group_id
+        self.workers = {"extract": self.extraction_executor.max_workers, "split": 1, "embed": 2, "index": 1}
+        self.workers.update(workers or {})
+        self.queue_size = queue_size
+        self._report_lock = threading.Lock()
+
+    # Stage functions: each takes an item and returns it, or None to drop it
+
+    def _extract(self, item: IngestItem) -> Optional[IngestItem]:
+        item.sha256 = hash_file_source(item.path)
+        if self.state.is_completed(item):
+            with self._report_lock:
+                self.report.files_skipped += 1
+            logger.info(f"Skipping {item.source}: already indexed.")
+            return None
+        item.pages = _count_pages(item.path)
+        cache_key = self.extraction_cache.key_for_hash(item.sha256) if self.extraction_cache else None
+        cached_text = self.extraction_cache.get(cache_key) if cache_key else None
+        if cached_text is not None:
+            item.text = cached_text
+        else:
+            # Streamed page range by page range, so pages that end a worker are retried alone in the sandbox
+            failed_pages: List[int] = []
+            item.text = "".join(self.extraction_executor.iter_text(item.path, item.source, failed_pages))
+            if failed_pages:
+                logger.warning(f"Pages {[p + 1 for p in sorted(failed_pages)]} of {item.source} fell back to PyPDF2 or were skipped.")
+            elif cache_key and item.text:
+                self.extraction_cache.put(cache_key, item.text)
+        if not item.text.strip(PAGE_BREAK):
+            raise ValueError("No text could be extracted from the document.")
+        return item
+
+    def _split(self, item: IngestItem) -> Optional[IngestItem]:
+        metadata = {"source": item.source}
+        if self.group_id:
+            metadata["group_id"] = self.group_id
+        item.documents = self.document_parser.split_text_to_chunks(item.text, metadata=metadata)
+        item.text = ""  # Free the full text while the item waits in later queues
+        if not item.documents:
+            raise ValueError("Extracted text could not be split into documents.")
+        return item
+
+    def _embed(self, item: IngestItem) -> Optional[IngestItem]:
+        if self.indexer.embedding_model is not None:
+            item.vectors = self.indexer.embed_documents(item.documents)
+        return item
+
+    def _index(self, item: IngestItem) -> Optional[IngestItem]:
+        result = self.indexer.index_documents(item.documents, vectors=item.vectors)
+        if result.failed:
+            raise RuntimeError(f"{result.failed} chunks failed to index.")
+        self.state.mark_completed(item)
+        with self._report_lock:
+            self.report.files_indexed += 1
+            self.report.pages += item.pages
+            self.report.chunks += len(item.documents)
+        logger.info(f"Indexed {item.source}: {result}.")
+        return item
+
+    def _stage_worker(self, name: str, func: Callable[[IngestItem], Optional[IngestItem]], in_queue: queue.Queue, out_queue: Optional[queue.Queue]):
+        stats = self.report.stages[name]
+        while True:
+            item = in_queue.get()
+            if item is _DONE:
+                in_queue.put(_DONE)  # Let the other workers of this stage see it too
+                return
+            started = time.perf_counter()
+            try:
+                result = func(item)
+            except Exception as e:
+                logger.error(f"{name} failed for {item.source}: {e}", exc_info=True)
+                with self._report_lock:
+                    self.report.files_failed += 1
+                    self.report.failures[item.source] = str(e) or type(e).__name__
+                result = None
+            with self._report_lock:
+                stats.items += 1
+                stats.busy_seconds += time.perf_counter() - started
+            if result is not None and out_queue is not None:
+                out_queue.put(result)
+
+    def _iter_items(self, input_path: str, scratch_dir: str) -> Iterator[IngestItem]:
+        root = input_path
+        if is_zip_archive(input_path):
+            root = scratch_dir
+            extract_archive(input_path, root)
+        elif not os.path.isdir(input_path):
+            raise ValueError(f"{input_path} is neither a directory nor a ZIP archive.")
+        for path, source in find_documents(root):
+            yield IngestItem(path=path, source=source)
+
+    def run(self, input_path: str) -> IngestReport:
+        self.report = IngestReport()
+        started = time.perf_counter()
+        functions = {"extract": self._extract, "split": self._split, "embed": self._embed, "index": self._index}
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in STAGES]
+
+        threads: Dict[str, List[threading.Thread]] = {}
+        for position, name in enumerate(STAGES):
+            out_queue = queues[position + 1] if position + 1 < len(STAGES) else None
+            threads[name] = [
+                threading.Thread(target=self._stage_worker, args=(name, functions[name], queues[position], out_queue), name=f"ingest-{name}-{i}", daemon=True)
+                for i in range(max(1, self.workers[name]))
+            ]
+            for thread in threads[name]:
+                thread.start()
+
+        with tempfile.TemporaryDirectory(prefix="ingest_") as scratch_dir:
+            try:
+                for item in self._iter_items(input_path, scratch_dir):
+                    self.report.files_total += 1
+                    queues[0].put(item)  # Blocks while the extract stage is saturated
+            finally:
+                # Shut the stages down in order once each has drained its input
+                queues[0].put(_DONE)
+                for position, name in enumerate(STAGES):
+                    for thread in threads[name]:
+                        thread.join()
+                    if position + 1 < len(STAGES):
+                        queues[position + 1].put(_DONE)
+
+        self.report.elapsed_seconds = time.perf_counter() - started
+        return self.report
+
+
+def default_state_path(input_path: str) -> str:
+    name = os.path.basename(os.path.normpath(input_path)) or "input"
+    return os.path.join(settings.INGEST_STATE_DIR, f"{name}.jsonl")
+
+
+def main(argv: Optional[List[str]] = None):
+    from app.utils.logging_config import setup_logging
+    from app.vector_store.weaviate_connector import close_weaviate_connection, get_weaviate_indexer
+
+    parser = argparse.ArgumentParser(prog="python -m app.ingest", description="Bulk-ingest a directory or ZIP archive of PDF/DOCX/PPTX files.")
+    parser.add_argument("input", help="Directory or .zip archive")
+    parser.add_argument("--group-id", help="Study group the documents belong to")
+    parser.add_argument("--state-file", help="Progress file used to resume (default: INGEST_STATE_DIR/<input name>.jsonl)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the state file and process every file again")
+    parser.add_argument("--extract-workers", type=int, default=0, help="Extraction processes (default: EXTRACTION_POOL_WORKERS)")
+    parser.add_argument("--split-workers", type=int, default=1)
+    parser.add_argument("--embed-workers", type=int, default=2)
+    parser.add_argument("--index-workers", type=int, default=1)
+    parser.add_argument("--queue-size", type=int, default=8, help="Capacity of each queue between stages")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    state_path = args.state_file or default_state_path(args.input)
+    if args.restart and os.path.exists(state_path):
+        os.remove(state_path)
+
+    extraction_executor = ExtractionExecutor(
+        max_workers=args.extract_workers or settings.EXTRACTION_POOL_WORKERS,
+        max_tasks_per_child=settings.EXTRACTION_MAX_TASKS_PER_CHILD,
+        worker_memory_mb=settings.EXTRACTION_WORKER_MEMORY_MB,
+    )
+    ingestor = BulkIngestor(
+        indexer=get_weaviate_indexer(),
+        state_path=state_path,
+        extraction_executor=extraction_executor,
+        extraction_cache=get_extraction_cache(),
+        group_id=args.group_id,
+        workers={"split": args.split_workers, "embed": args.embed_workers, "index": args.index_workers},
+        queue_size=args.queue_size,
+    )
+    try:
+        report = ingestor.run(args.input)
+    finally:
+        extraction_executor.shutdown()
+        close_weaviate_connection()
+    print(report.format())
+    return 1 if report.files_failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
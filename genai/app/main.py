@@ -4,10 +4,13 @@ from contextlib import asynccontextmanager
 
 from app.api.api_router import api_router  # Corrected import
 from app.config import settings
+from app.document_handling.extraction_pool import shutdown_extraction_executor
+from app.services.ingestion_jobs import get_ingestion_job_queue
 from app.utils.logging_config import (
     setup_logging,
 )
 from app.vector_store.weaviate_connector import (
+    close_weaviate_async_connection,
     get_weaviate_client,
 )
 
@@ -23,8 +26,13 @@ async def lifespan(app: FastAPI):
         logger.info("Weaviate client initialized and schema checked.")
     except Exception as e:
         logger.error(f"Failed to initialize Weaviate during startup: {e}", exc_info=True)
+    job_queue = get_ingestion_job_queue()
+    job_queue.start()
     yield
     logger.info(f"Shutting down {settings.APP_NAME}...")
+    await job_queue.stop()
+    await close_weaviate_async_connection()
+    shutdown_extraction_executor()
 
 
 app = FastAPI(
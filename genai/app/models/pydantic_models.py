@@ -1,3 +1,6 @@
+from datetime import datetime
+from enum import Enum
+
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 
@@ -29,18 +32,31 @@ class DocumentUploadResponse(BaseModel):
     filename: str = Field(..., description="Original filename of the uploaded document.")
 
 
+class DocumentProcessingStatus(str, Enum):
+    PENDING = "PENDING"
+    PROCESSING = "PROCESSING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
+
 class DocumentStatus(BaseModel):
-    status: str = Field(
+    status: DocumentProcessingStatus = Field(
         ...,
         description="Processing status of the document (e.g., PENDING, PROCESSING, COMPLETED, FAILED).",
     )
     message: Optional[str] = Field(None, description="Additional details about the status.")
-    # num_chunks: Optional[int] = Field(None, description="Number of chunks generated if processing is complete.")
-    # indexed_at: Optional[str] = Field(None, description="Timestamp of when indexing was completed.")
+    stage: Optional[str] = Field(None, description="Current pipeline stage (e.g., queued, extracting, indexing, done).")
+    chunks_total: Optional[int] = Field(None, description="Number of chunks generated, once the whole document has been indexed.")
+    chunks_indexed: int = Field(0, description="Number of chunks handed to the vector store so far.")
+    failed_pages: List[int] = Field([], description="PDF pages (counted from 1) whose text could only be read with the fallback extractor, or not at all.")
+    submitted_at: datetime = Field(..., description="Timestamp of when the upload was accepted.")
+    started_at: Optional[datetime] = Field(None, description="Timestamp of when a worker picked up the document.")
+    finished_at: Optional[datetime] = Field(None, description="Timestamp of when processing completed or failed.")
 
 
 class DocumentStatusResponse(BaseModel):
     document_id: str = Field(..., description="Identifier of the document.")
+    filename: str = Field(..., description="Original filename of the uploaded document.")
     status_info: DocumentStatus = Field(..., description="Detailed status of the document.")
 
 
@@ -5,10 +5,30 @@ from typing import Optional, List, Dict, Any
 class DocumentUploadResponse(BaseModel):
     filename: str
     message: str
+    document_id: Optional[str] = None  # Ingestion job id, poll /documents/{document_id}/status
+    status: Optional[str] = None
     document_count: Optional[int] = None
     error: Optional[str] = None
 
 
+class BatchFileResult(BaseModel):
+    filename: str
+    status: str  # "indexed" or "failed"
+    document_count: int = 0
+    error: Optional[str] = None
+    failed_pages: List[int] = []  # PDF pages (counted from 1) that fell back to PyPDF2 or were skipped
+    extract_seconds: float = 0.0
+    split_seconds: float = 0.0
+
+
+class BatchUploadResponse(BaseModel):
+    message: str
+    files: List[BatchFileResult]
+    document_count: int = 0  # Chunks indexed across all files
+    index_seconds: float = 0.0  # Shared Weaviate batches for all files
+    total_seconds: float = 0.0
+
+
 class QueryRequest(BaseModel):
     question: str
     # session_id: Optional[str] = None # For chat history if needed later
@@ -33,3 +53,4 @@ class QueryResponse(BaseModel):
 
 class HealthCheckResponse(BaseModel):
     status: str = "OK"
+    query_embedding_cache: Optional[Dict[str, Any]] = None  # Hit/miss/eviction counters, if the cache is enabled
@@ -72,17 +72,14 @@ class ChatService:
             raise RuntimeError("RAG system not available. Cannot process chat query.")
 
         try:
-            answer_text = await self.rag_system.invoke_chain(query_text)
-
-            source_documents: List[Document] = []
-            if self.rag_system.retriever:
-                retriever_kwargs: Dict[str, Any] = {}
-                if group_id:
-                    retriever_kwargs["metadata"] = {"group_id": group_id}
-                    logger.debug(f"Attempting to retrieve documents with filter for group_id: {group_id}")
-
-                source_documents = await self.rag_system.retriever.aget_relevant_documents(query_text, **retriever_kwargs)
-                logger.debug(f"Retrieved {len(source_documents)} source documents for query '{query_text}'.")
+            retriever_metadata: Optional[Dict[str, Any]] = None
+            if group_id:
+                retriever_metadata = {"group_id": group_id}
+                logger.debug(f"Attempting to retrieve documents with filter for group_id: {group_id}")
+
+            # One retrieval: the sources are the chunks the answer was generated from
+            answer_text, source_documents = await self.rag_system.answer_with_sources(query_text, metadata=retriever_metadata)
+            logger.debug(f"Answered from {len(source_documents)} source documents for query '{query_text}'.")
 
             retrieved_sources_formatted: List[ChatResponseSource] = []
             for doc in source_documents:
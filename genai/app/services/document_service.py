@@ -1,62 +1,106 @@
+import asyncio
 import logging
-import io
-from typing import Tuple, Optional
+import time
+from typing import Callable, Iterator, List, Sequence, Tuple, Optional
 
-from app.document_handling.extractors import TextExtractor
+from app.document_handling.chunks import Chunk
+from app.document_handling.extraction_cache import ExtractionCache, get_extraction_cache
+from app.document_handling.extraction_pool import ExtractionExecutor, FileSource, get_extraction_executor
+from app.document_handling.extractors import PAGE_BREAK
 from app.document_handling.parsers import get_document_parser, DocumentParser
-from app.vector_store.weaviate_connector import get_weaviate_indexer, WeaviateIndexer
+from app.vector_store.weaviate_connector import chunk_uuids, get_weaviate_indexer, WeaviateIndexer
 from app.config import settings
+from app.models.schemas import BatchFileResult, BatchUploadResponse
 
 logger = logging.getLogger(__name__)
 
+# Characters read at a time when streaming a cached extraction
+_CACHED_TEXT_READ_SIZE = 64 * 1024
+
 
 class DocumentProcessingService:
-    def __init__(self):
-        self.text_extractor = TextExtractor()  # Assuming TextExtractor has no init args or gets them from settings
-        self.document_parser: DocumentParser = get_document_parser()  # Get pre-configured parser
-        self.weaviate_indexer: WeaviateIndexer = get_weaviate_indexer()  # Get pre-configured indexer
+    def __init__(
+        self,
+        extraction_executor: Optional[ExtractionExecutor] = None,
+        document_parser: Optional[DocumentParser] = None,
+        weaviate_indexer: Optional[WeaviateIndexer] = None,
+        extraction_cache: Optional[ExtractionCache] = None,
+    ):
+        # Extraction runs in worker processes so it never blocks the event loop
+        self.extraction_executor: ExtractionExecutor = extraction_executor or get_extraction_executor()
+        # Re-uploads of the same file reuse the text extracted the first time (None = no caching)
+        self.extraction_cache: Optional[ExtractionCache] = extraction_cache if extraction_cache is not None else get_extraction_cache()
+        self.document_parser: DocumentParser = document_parser or get_document_parser()  # Get pre-configured parser
+        self.weaviate_indexer: WeaviateIndexer = weaviate_indexer or get_weaviate_indexer()  # Get pre-configured indexer
         logger.info("DocumentProcessingService initialized.")
 
-    async def process_and_index_document(self, file_content: bytes, filename: str) -> Tuple[int, Optional[str]]:
+    async def process_and_index_document(
+        self,
+        file_source: FileSource,
+        filename: str,
+        progress_callback: Optional[Callable[..., None]] = None,
+        group_id: Optional[str] = None,
+    ) -> Tuple[int, Optional[str]]:
         """
         Processes a document file (extracts text, splits, and indexes into Weaviate).
+        file_source is the path of the (spooled) file on disk, or its raw bytes.
+        Re-uploading a file with the same name to the same group_id replaces the
+        previous version, touching only the chunks that changed.
+        Pages are split and indexed while later ones are still being extracted.
+        progress_callback, if given, is called as progress_callback(stage, chunks_total=..., chunks_indexed=...)
+        whenever the pipeline advances; chunks_total is known once the document is done, and so are
+        failed_pages (1-based numbers of the PDF pages that fell back to PyPDF2 or were skipped).
         Returns a tuple: (number_of_documents_indexed, error_message_if_any).
         """
+
+        def report(stage: str, **counters):
+            if progress_callback:
+                progress_callback(stage, **counters)
+
         try:
             logger.info(f"Starting processing for document: {filename}")
-            file_io = io.BytesIO(file_content)
-
-            # 1. Extract text
-            logger.debug(f"Extracting text from {filename}...")
-            extracted_text = self.text_extractor.extract_text(file_io, filename)
-            if not extracted_text:
-                logger.warning(f"No text extracted from {filename}. Skipping further processing.")
-                return 0, "No text could be extracted from the document."
-            logger.info(f"Successfully extracted text from {filename}. Length: {len(extracted_text)}")
 
-            # 2. Split text into documents
             # Pass filename in metadata for potential use in Weaviate
             doc_metadata = {"source": filename}
-            logger.debug(f"Splitting text from {filename} into documents...")
-            documents = self.document_parser.split_text_to_documents(extracted_text, metadata=doc_metadata)
-            if not documents:
+            if group_id:
+                doc_metadata["group_id"] = group_id
+            extracted = {"chars": 0}
+            failed_pages: List[int] = []
+
+            def text_pieces() -> Iterator[str]:
+                for piece in self._iter_extracted_text(file_source, filename, failed_pages):
+                    extracted["chars"] += len(piece) - piece.count(PAGE_BREAK)
+                    yield piece
+
+            # Extract, split and index as one stream: pages are split and indexed while
+            # later pages are still being extracted, and the full text and the full
+            # list of chunks never exist at the same time.
+            report("extracting")
+            documents = self.document_parser.iter_chunks(text_pieces(), metadata=doc_metadata)
+            # Splitting and Weaviate batching are blocking calls too; keep them off the event loop.
+            indexing_result = await asyncio.to_thread(
+                self.weaviate_indexer.index_document_stream,
+                documents,
+                progress_callback=lambda indexed: report("indexing", chunks_indexed=indexed),
+            )
+            docs_indexed = indexing_result.inserted + indexing_result.unchanged + indexing_result.failed
+            if not extracted["chars"]:
+                logger.warning(f"No text extracted from {filename}. Skipping further processing.")
+                return 0, "No text could be extracted from the document."
+            if not docs_indexed:
                 logger.warning(f"Text from {filename} resulted in zero documents after splitting.")
                 return 0, "Extracted text could not be split into documents."
-            logger.info(f"Split text from {filename} into {len(documents)} documents.")
+            logger.info(f"Extracted {extracted['chars']} characters from {filename} and indexed {docs_indexed} documents: {indexing_result}.")
+            if failed_pages:
+                logger.warning(f"Pages {[p + 1 for p in failed_pages]} of {filename} fell back to PyPDF2 or were skipped.")
+            report("indexing", chunks_total=docs_indexed, chunks_indexed=docs_indexed - indexing_result.failed, failed_pages=[p + 1 for p in sorted(failed_pages)])
 
-            # 3. Index documents into Weaviate
-            logger.debug(f"Indexing {len(documents)} documents from {filename} into Weaviate...")
-            # The WeaviateIndexer now handles the actual indexing call to
-            # Weaviate client
-            self.weaviate_indexer.index_documents(documents)
-            logger.info(f"Successfully initiated indexing for {len(documents)} documents from {filename}.")
-
-            return len(documents), None  # Success
+            return docs_indexed, None  # Success
         except ValueError as ve:
             logger.error(f"Unsupported file type for {filename}: {ve}", exc_info=True)
             return (
                 0,
-                f"Unsupported file type: {filename}. Only PDF, DOCX, PPTX are supported.",
+                f"Unsupported file type: {filename}. Only PDF, DOCX, PPTX, PNG, JPG are supported.",
             )
         except Exception as e:
             logger.error(f"Error processing document {filename}: {e}", exc_info=True)
@@ -64,6 +108,127 @@ class DocumentProcessingService:
             # error types
             return 0, f"An unexpected error occurred while processing {filename}."
 
+    async def process_and_index_batch(
+        self,
+        files: List[Tuple[FileSource, str]],
+        group_id: Optional[str] = None,
+        max_concurrency: int = 4,
+    ) -> BatchUploadResponse:
+        """
+        Processes several (file_source, filename) pairs in one go. Up to
+        max_concurrency files are extracted and split at the same time (on
+        the extraction pool), then the chunks of all files are indexed
+        together so they share Weaviate batches instead of one per file.
+        Returns per-file results and timings.
+        """
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def prepare(file_source: FileSource, filename: str) -> Tuple[BatchFileResult, Sequence[Chunk]]:
+            result = BatchFileResult(filename=filename, status="failed")
+            async with semaphore:
+                try:
+                    step_started = time.perf_counter()
+                    failed_pages: List[int] = []
+                    # Page by page like single uploads, so a page that ends a worker is retried alone in the sandbox
+                    extracted_text = await asyncio.to_thread("".join, self._iter_extracted_text(file_source, filename, failed_pages))
+                    result.extract_seconds = time.perf_counter() - step_started
+                    if failed_pages:
+                        logger.warning(f"Pages {[p + 1 for p in sorted(failed_pages)]} of {filename} fell back to PyPDF2 or were skipped.")
+                        result.failed_pages = [p + 1 for p in sorted(failed_pages)]
+                    if not extracted_text.strip(PAGE_BREAK):
+                        result.error = "No text could be extracted from the document."
+                        return result, []
+
+                    doc_metadata = {"source": filename}
+                    if group_id:
+                        doc_metadata["group_id"] = group_id
+                    step_started = time.perf_counter()
+                    documents = await asyncio.to_thread(self.document_parser.split_text_to_chunks, extracted_text, metadata=doc_metadata)
+                    result.split_seconds = time.perf_counter() - step_started
+                    if not documents:
+                        result.error = "Extracted text could not be split into documents."
+                        return result, []
+                    return result, documents
+                except ValueError as ve:
+                    logger.error(f"Unsupported file type for {filename}: {ve}", exc_info=True)
+                    result.error = f"Unsupported file type: {filename}. Only PDF, DOCX, PPTX, PNG, JPG are supported."
+                except Exception as e:
+                    logger.error(f"Error processing document {filename}: {e}", exc_info=True)
+                    result.error = f"An unexpected error occurred while processing {filename}."
+                return result, []
+
+        prepared = await asyncio.gather(*(prepare(file_source, filename) for file_source, filename in files))
+        all_documents = [doc for _, documents in prepared for doc in documents]
+
+        index_seconds = 0.0
+        index_error = None
+        failed_chunks = [0] * len(prepared)  # Per file: chunks that failed to insert
+        if all_documents:
+            logger.info(f"Indexing {len(all_documents)} documents from {sum(1 for _, documents in prepared if documents)} files in shared batches...")
+            step_started = time.perf_counter()
+            try:
+                failed_ids: List[str] = []
+                indexing_result = await asyncio.to_thread(self.weaviate_indexer.index_documents, all_documents, failed_ids=failed_ids)
+                logger.info(f"Batch indexing finished: {indexing_result}.")
+                if failed_ids:
+                    # Map the failed chunks back to their files through their deterministic UUIDs
+                    failed_id_set = set(failed_ids)
+                    file_of_chunk = [file_idx for file_idx, (_, documents) in enumerate(prepared) for _ in documents]
+                    for file_idx, chunk_id in zip(file_of_chunk, chunk_uuids(all_documents)):
+                        if chunk_id in failed_id_set:
+                            failed_chunks[file_idx] += 1
+            except Exception as e:
+                logger.error(f"Error indexing batch upload: {e}", exc_info=True)
+                index_error = "An unexpected error occurred while indexing the documents."
+            index_seconds = time.perf_counter() - step_started
+
+        results = []
+        for file_idx, (result, documents) in enumerate(prepared):
+            if documents:
+                if index_error:
+                    result.error = index_error
+                elif failed_chunks[file_idx]:
+                    result.error = f"{failed_chunks[file_idx]} of {len(documents)} chunks failed to index."
+                else:
+                    result.status = "indexed"
+                    result.document_count = len(documents)
+            results.append(result)
+
+        indexed = sum(1 for result in results if result.status == "indexed")
+        return BatchUploadResponse(
+            message=f"Processed {len(results)} files: {indexed} indexed, {len(results) - indexed} failed.",
+            files=results,
+            document_count=sum(result.document_count for result in results),
+            index_seconds=index_seconds,
+            total_seconds=time.perf_counter() - started,
+        )
+
+    def _iter_extracted_text(self, file_source: FileSource, filename: str, failed_pages: Optional[List[int]] = None) -> Iterator[str]:
+        """
+        Yields the paged text in pieces, from the cache or extracted (and cached); for a worker thread.
+        PDF pages that fell back to PyPDF2 or were skipped are appended to *failed_pages*; such
+        extractions are not cached, since the failure may have been a timeout under load.
+        """
+        failed_pages = failed_pages if failed_pages is not None else []
+        if self.extraction_cache is None:
+            logger.debug(f"Extracting text from {filename}...")
+            yield from self.extraction_executor.iter_text(file_source, filename, failed_pages)
+            return
+
+        cache_key = self.extraction_cache.compute_key(file_source)
+        cached_entry = self.extraction_cache.open_entry(cache_key)
+        if cached_entry is not None:
+            logger.info(f"Extraction cache hit for {filename} ({cache_key}). Stats: {self.extraction_cache.stats()}")
+            with cached_entry:
+                while piece := cached_entry.read(_CACHED_TEXT_READ_SIZE):
+                    yield piece
+            return
+
+        logger.debug(f"Extraction cache miss for {filename}. Extracting text...")
+        pieces = self.extraction_executor.iter_text(file_source, filename, failed_pages)
+        yield from self.extraction_cache.write_through(cache_key, pieces, should_store=lambda: not failed_pages)
+
 
 # Singleton instance (or use FastAPI dependency injection)
 _document_processing_service_instance: Optional[DocumentProcessingService] = None
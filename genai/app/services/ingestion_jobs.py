@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, List, Optional
+
+from app.config import settings
+from app.utils.uploads import remove_spooled_file
+from app.models.pydantic_models import (
+    DocumentProcessingStatus,
+    DocumentStatus,
+    DocumentStatusResponse,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionQueueFullError(RuntimeError):
+    """Raised when a document is submitted while the ingestion queue is at capacity."""
+
+
+class IngestionJob:
+    """Tracks a single uploaded document through the extract → split → index pipeline."""
+
+    def __init__(self, file_path: str, filename: str, doc_service: Any, group_id: Optional[str] = None):
+        self.job_id: str = uuid.uuid4().hex
+        self.filename = filename
+        self.group_id = group_id
+        self.file_path: Optional[str] = file_path  # Spooled upload, owned (and removed) by the job
+        self.doc_service = doc_service
+
+        self.status = DocumentProcessingStatus.PENDING
+        self.stage = "queued"
+        self.message: Optional[str] = None
+        self.chunks_total: Optional[int] = None
+        self.chunks_indexed = 0
+        self.failed_pages: List[int] = []
+        self.submitted_at = datetime.now(timezone.utc)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (DocumentProcessingStatus.COMPLETED, DocumentProcessingStatus.FAILED)
+
+    def update_progress(self, stage: str, chunks_total: Optional[int] = None, chunks_indexed: Optional[int] = None, failed_pages: Optional[List[int]] = None):
+        """Progress callback handed to the DocumentProcessingService."""
+        self.stage = stage
+        if chunks_total is not None:
+            self.chunks_total = chunks_total
+        if chunks_indexed is not None:
+            self.chunks_indexed = chunks_indexed
+        if failed_pages is not None:
+            self.failed_pages = failed_pages
+
+    def mark_processing(self):
+        self.status = DocumentProcessingStatus.PROCESSING
+        self.started_at = datetime.now(timezone.utc)
+
+    def mark_finished(self, status: DocumentProcessingStatus, message: Optional[str] = None):
+        self.status = status
+        self.stage = "done"
+        self.message = message
+        self.finished_at = datetime.now(timezone.utc)
+        # The spooled upload is no longer needed once the pipeline has run.
+        remove_spooled_file(self.file_path)
+        self.file_path = None
+
+    def to_status_response(self) -> DocumentStatusResponse:
+        return DocumentStatusResponse(
+            document_id=self.job_id,
+            filename=self.filename,
+            status_info=DocumentStatus(
+                status=self.status,
+                message=self.message,
+                stage=self.stage,
+                chunks_total=self.chunks_total,
+                chunks_indexed=self.chunks_indexed,
+                failed_pages=self.failed_pages,
+                submitted_at=self.submitted_at,
+                started_at=self.started_at,
+                finished_at=self.finished_at,
+            ),
+        )
+
+
+class IngestionJobQueue:
+    """
+    Bounded in-process job queue for document ingestion.
+    Uploads are enqueued and acknowledged immediately; a fixed number of worker
+    tasks on the event loop run the processing pipeline and record job status.
+    """
+
+    def __init__(self, max_size: int, worker_count: int, job_retention: int):
+        self.max_size = max_size
+        self.worker_count = max(1, worker_count)
+        self.job_retention = job_retention
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        logger.info(f"IngestionJobQueue initialized with max_size={max_size}, worker_count={self.worker_count}, job_retention={job_retention}")
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._workers) and not all(worker.done() for worker in self._workers)
+
+    def start(self):
+        """Starts the worker tasks on the running event loop (no-op if already running there)."""
+        loop = asyncio.get_running_loop()
+        if self.is_running and self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._workers = [loop.create_task(self._worker(i), name=f"ingestion-worker-{i}") for i in range(self.worker_count)]
+        logger.info(f"Started {self.worker_count} ingestion worker(s).")
+
+    async def stop(self):
+        """Cancels the workers. Jobs still waiting in the queue are marked as FAILED."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        if self._queue is not None:
+            while not self._queue.empty():
+                job = self._queue.get_nowait()
+                job.mark_finished(DocumentProcessingStatus.FAILED, "Service shut down before the document was processed.")
+        self._queue = None
+        self._loop = None
+        logger.info("Ingestion workers stopped.")
+
+    def submit(self, file_path: str, filename: str, doc_service: Any, group_id: Optional[str] = None) -> IngestionJob:
+        """
+        Enqueues the spooled upload at *file_path* for processing and returns its job.
+        The job takes ownership of the file and deletes it when processing ends.
+        Raises IngestionQueueFullError if the queue is at capacity.
+        """
+        self.start()
+        job = IngestionJob(file_path, filename, doc_service, group_id=group_id)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise IngestionQueueFullError(f"Ingestion queue is full ({self.max_size} documents pending). Please retry later.")
+
+        self._jobs[job.job_id] = job
+        self._prune_finished_jobs()
+        logger.info(f"Queued ingestion job {job.job_id} for {filename} ({self._queue.qsize()}/{self.max_size} pending).")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        return self._jobs.get(job_id)
+
+    def _prune_finished_jobs(self):
+        """Forgets the oldest finished jobs once more than job_retention are tracked."""
+        excess = len(self._jobs) - self.job_retention
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.is_finished][:excess]:
+            del self._jobs[job_id]
+
+    async def _worker(self, worker_index: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run_job(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: IngestionJob):
+        logger.info(f"Processing ingestion job {job.job_id} ({job.filename}).")
+        job.mark_processing()
+        try:
+            docs_indexed, error_message = await job.doc_service.process_and_index_document(
+                job.file_path,
+                job.filename,
+                progress_callback=job.update_progress,
+                group_id=job.group_id,
+            )
+        except Exception as e:
+            logger.error(f"Ingestion job {job.job_id} for {job.filename} crashed: {e}", exc_info=True)
+            job.mark_finished(DocumentProcessingStatus.FAILED, f"An unexpected error occurred while processing {job.filename}.")
+            return
+
+        if error_message:
+            logger.error(f"Ingestion job {job.job_id} for {job.filename} failed: {error_message}")
+            job.mark_finished(DocumentProcessingStatus.FAILED, error_message)
+        else:
+            job.chunks_total = docs_indexed
+            logger.info(f"Ingestion job {job.job_id} for {job.filename} completed. Documents indexed: {docs_indexed}")
+            job.mark_finished(DocumentProcessingStatus.COMPLETED, "Document processed and indexed successfully.")
+
+
+_ingestion_job_queue_instance: Optional[IngestionJobQueue] = None
+
+
+def get_ingestion_job_queue() -> IngestionJobQueue:
+    global _ingestion_job_queue_instance
+    if _ingestion_job_queue_instance is None:
+        _ingestion_job_queue_instance = IngestionJobQueue(
+            max_size=settings.INGESTION_QUEUE_MAX_SIZE,
+            worker_count=settings.INGESTION_WORKER_COUNT,
+            job_retention=settings.INGESTION_JOB_RETENTION,
+        )
+    return _ingestion_job_queue_instance
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import os
+import tempfile
+import zipfile
+from typing import BinaryIO, List, Optional, Tuple
+
+from fastapi import UploadFile
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SPOOL_CHUNK_SIZE = 1024 * 1024  # Copy uploads in 1 MiB chunks
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".pptx", ".png", ".jpg", ".jpeg"}
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured size limit."""
+
+
+def _copy_to_spool_file(source: BinaryIO, suffix: str, max_bytes: int, spool_dir: Optional[str]) -> str:
+    """Copies *source* chunk by chunk into a new temporary file and returns its path."""
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="upload_", dir=spool_dir)
+    written = 0
+    try:
+        with os.fdopen(fd, "wb") as spool_file:
+            while chunk := source.read(SPOOL_CHUNK_SIZE):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLargeError(f"File exceeds the maximum upload size of {max_bytes // (1024 * 1024)} MB.")
+                spool_file.write(chunk)
+    except BaseException:
+        remove_spooled_file(path)
+        raise
+    return path
+
+
+async def spool_upload(upload: UploadFile, max_bytes: Optional[int] = None) -> str:
+    """
+    Streams an UploadFile into a temporary file on disk and returns the path.
+    The whole upload is never held in memory, and uploads larger than
+    max_bytes (default: settings.MAX_UPLOAD_SIZE_BYTES) are rejected with
+    UploadTooLargeError. The caller owns the file and must remove it with
+    remove_spooled_file() once it has been processed.
+    """
+    max_bytes = max_bytes if max_bytes is not None else settings.MAX_UPLOAD_SIZE_BYTES
+    if upload.size is not None and upload.size > max_bytes:
+        raise UploadTooLargeError(f"File exceeds the maximum upload size of {max_bytes // (1024 * 1024)} MB.")
+
+    suffix = os.path.splitext(upload.filename or "")[1].lower()
+    await upload.seek(0)
+    path = await asyncio.to_thread(_copy_to_spool_file, upload.file, suffix, max_bytes, settings.UPLOAD_SPOOL_DIR)
+    logger.debug(f"Spooled upload {upload.filename} to {path}")
+    return path
+
+
+def remove_spooled_file(path: Optional[str]):
+    """Deletes a spooled upload, ignoring files that are already gone."""
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove spooled upload {path}: {e}")
+
+
+def is_supported_document(filename: str) -> bool:
+    return os.path.splitext(filename)[1].lower() in SUPPORTED_EXTENSIONS
+
+
+def is_zip_archive(path: str) -> bool:
+    return os.path.isfile(path) and zipfile.is_zipfile(path)
+
+
+def find_documents(root: str) -> List[Tuple[str, str]]:
+    """(path, source) of every supported file below *root*, in a stable order."""
+    found = []
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            if is_supported_document(filename) and not filename.startswith("~$"):
+                path = os.path.join(directory, filename)
+                found.append((path, os.path.relpath(path, root).replace(os.sep, "/")))
+    return found
+
+
+def extract_archive(archive_path: str, target_dir: str, max_bytes: Optional[int] = None):
+    """
+    Extracts the supported documents of a ZIP archive into *target_dir*
+    (zipfile sanitizes member paths). Raises UploadTooLargeError if they
+    would unpack to more than max_bytes.
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        members = [member for member in archive.infolist() if not member.is_dir() and is_supported_document(member.filename)]
+        if max_bytes is not None and sum(member.file_size for member in members) > max_bytes:
+            raise UploadTooLargeError(f"Archive contents exceed the maximum upload size of {max_bytes // (1024 * 1024)} MB.")
+        for member in members:
+            archive.extract(member, target_dir)
@@ -1,10 +1,16 @@
+import asyncio
+import hashlib
 import logging
-from typing import List, Optional, Any
+import uuid
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Any, Set, Tuple
 
 import weaviate
 import weaviate.classes as wvc
 from app.config import settings
 from app.core.embeddings import get_embedding_model_instance
+from app.core.tokenizer import TokenCounter, get_token_counter
 from langchain_core.documents import (
     Document as LangchainDocument,
 )
@@ -18,41 +24,84 @@ from weaviate.exceptions import (
 logger = logging.getLogger(__name__)
 
 _weaviate_client: Optional[weaviate.WeaviateClient] = None
+# The async client and its lock belong to the event loop they were created on
+_weaviate_async_client: Optional[weaviate.WeaviateAsyncClient] = None
+_weaviate_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_weaviate_async_client_lock: Optional[asyncio.Lock] = None
 DEFAULT_TOP_K = 5
 
+# Namespace for deterministic chunk UUIDs (see chunk_uuid)
+CHUNK_UUID_NAMESPACE = uuid.UUID("6f1c1f5e-4a2b-5c8d-9e0f-3b7a6d2c1e90")
+# Page size when listing the chunks already stored for a source
+_EXISTING_CHUNKS_PAGE_SIZE = 1000
+# Chunk UUIDs per delete_many call; Weaviate deletes at most QUERY_MAXIMUM_RESULTS objects per call
+_DELETE_BATCH_SIZE = 1000
+_UUID_HEX_DIGITS = "0123456789abcdef"
+# Where a chunk sits in its document; not part of its identity, so they are updated in place when the chunk moves
+_CHUNK_POSITION_PROPERTIES = ("chunk_index", "page_number", "last_page_number")
+# Lengths of a UUID prefix followed by a dash ("xxxxxxxx-xxxx-xxxx-xxxx-...")
+_UUID_DASH_POSITIONS = (8, 13, 18, 23)
+
+
+def _collection_properties() -> List[wvc.config.Property]:
+    return [
+        wvc.config.Property(name="text", data_type=wvc.config.DataType.TEXT),
+        wvc.config.Property(name="source", data_type=wvc.config.DataType.TEXT),  # Example: filename
+        wvc.config.Property(name="chunk_index", data_type=wvc.config.DataType.INT),  # Example
+        # Study group the document was uploaded to; matched exactly, never vectorized
+        wvc.config.Property(
+            name="group_id",
+            data_type=wvc.config.DataType.TEXT,
+            tokenization=wvc.config.Tokenization.FIELD,
+            skip_vectorization=True,
+        ),
+        # First and last page a chunk of a paged (PDF) document spans; cited
+        # with the chunk and usable in page range filters
+        wvc.config.Property(name="page_number", data_type=wvc.config.DataType.INT, index_range_filters=True, skip_vectorization=True),
+        wvc.config.Property(name="last_page_number", data_type=wvc.config.DataType.INT, index_range_filters=True, skip_vectorization=True),
+        # Tokens of the chunk text for the chat model, counted once at ingest to budget prompts
+        wvc.config.Property(name="token_count", data_type=wvc.config.DataType.INT, skip_vectorization=True),
+        # Add other metadata properties as needed. Ensure they are
+        # simple types.
+    ]
+
+
+def _connection_params() -> Dict[str, Any]:
+    """Connection arguments shared by the sync and the async client."""
+    headers = {}
+    if settings.OPENAI_API_KEY and settings.OPENAI_API_KEY not in [
+        "YOUR_DEFAULT_API_KEY_IF_NOT_SET",
+        "",
+    ]:
+        headers["X-OpenAI-Api-Key"] = settings.OPENAI_API_KEY
+
+    # Assuming local Weaviate instance defined by WEAVIATE_URL (e.g.,
+    # "http://localhost:8080")
+    http_host = settings.WEAVIATE_URL.split(":")[1].replace("//", "") if "://" in settings.WEAVIATE_URL else "localhost"
+    http_port = int(settings.WEAVIATE_URL.split(":")[2]) if len(settings.WEAVIATE_URL.split(":")) > 2 else 8080
+    grpc_port = 50051
+    return dict(
+        http_host=http_host,
+        http_port=http_port,
+        http_secure=settings.WEAVIATE_URL.startswith("https"),
+        grpc_host=http_host,
+        grpc_port=grpc_port,
+        grpc_secure=settings.WEAVIATE_URL.startswith("https"),
+        headers=headers,
+        # Timeout settings can be added via additional_config
+        # additional_config=wvc.init.AdditionalConfig(
+        #     timeout=wvc.init.Timeout(init=2, query=45, insert=60)
+        # )
+    )
+
 
 def get_weaviate_client() -> weaviate.WeaviateClient:
     """Initializes and returns a Weaviate v4 client instance."""
     global _weaviate_client
     if _weaviate_client is None or not _weaviate_client.is_connected():
         logger.info(f"Attempting to connect to Weaviate at {settings.WEAVIATE_URL}")
-        headers = {}
-        if settings.OPENAI_API_KEY and settings.OPENAI_API_KEY not in [
-            "YOUR_DEFAULT_API_KEY_IF_NOT_SET",
-            "",
-        ]:
-            headers["X-OpenAI-Api-Key"] = settings.OPENAI_API_KEY
-
-        # Assuming local Weaviate instance defined by WEAVIATE_URL (e.g.,
-        # "http://localhost:8080")
-        http_host = settings.WEAVIATE_URL.split(":")[1].replace("//", "") if "://" in settings.WEAVIATE_URL else "localhost"
-        http_port = int(settings.WEAVIATE_URL.split(":")[2]) if len(settings.WEAVIATE_URL.split(":")) > 2 else 8080
-        grpc_port = 50051
-
         try:
-            _weaviate_client = weaviate.connect_to_custom(
-                http_host=http_host,
-                http_port=http_port,
-                http_secure=settings.WEAVIATE_URL.startswith("https"),
-                grpc_host=http_host,
-                grpc_port=grpc_port,
-                grpc_secure=settings.WEAVIATE_URL.startswith("https"),
-                headers=headers,
-                # Timeout settings can be added via additional_config
-                # additional_config=wvc.init.AdditionalConfig(
-                #     timeout=wvc.init.Timeout(init=2, query=45, insert=60)
-                # )
-            )
+            _weaviate_client = weaviate.connect_to_custom(**_connection_params())
             _weaviate_client.connect()
 
             if not _weaviate_client.is_ready():
@@ -68,6 +117,41 @@ def get_weaviate_client() -> weaviate.WeaviateClient:
     return _weaviate_client
 
 
+async def get_weaviate_async_client() -> weaviate.WeaviateAsyncClient:
+    """
+    Returns the Weaviate v4 async client shared by all requests on the running
+    event loop, connecting it on first use. The schema is ensured by the sync
+    client at startup (see get_weaviate_client).
+    """
+    global _weaviate_async_client, _weaviate_async_client_loop, _weaviate_async_client_lock
+    loop = asyncio.get_running_loop()
+    if _weaviate_async_client_loop is not loop:
+        # A client connected on another (closed) loop cannot be used here
+        _weaviate_async_client, _weaviate_async_client_loop, _weaviate_async_client_lock = None, loop, asyncio.Lock()
+    async with _weaviate_async_client_lock:
+        if _weaviate_async_client is None or not _weaviate_async_client.is_connected():
+            logger.info(f"Attempting to connect the async client to Weaviate at {settings.WEAVIATE_URL}")
+            client = weaviate.use_async_with_custom(**_connection_params())
+            try:
+                await client.connect()
+                if not await client.is_ready():
+                    raise WeaviateConnectionError("Weaviate async client connected but instance is not ready.")
+            except Exception as e:
+                logger.error(f"Failed to connect the async client to Weaviate: {e}", exc_info=True)
+                raise RuntimeError(f"Could not initialize Weaviate async client: {e}") from e
+            _weaviate_async_client = client
+            logger.info(f"Successfully connected Weaviate v4 async client at {settings.WEAVIATE_URL}.")
+    return _weaviate_async_client
+
+
+async def reconnect_weaviate_async_client(stale_client: Any) -> weaviate.WeaviateAsyncClient:
+    """Replaces *stale_client* (closed under us) with a freshly connected shared async client."""
+    global _weaviate_async_client
+    if _weaviate_async_client is stale_client:
+        _weaviate_async_client = None
+    return await get_weaviate_async_client()
+
+
 def ensure_weaviate_schema(client: weaviate.WeaviateClient, index_name: str):
     """
     Ensures that the specified Weaviate collection (schema) exists, creating it if necessary.
@@ -79,16 +163,11 @@ def ensure_weaviate_schema(client: weaviate.WeaviateClient, index_name: str):
 
             # Define properties for the collection.
             # The 'text' property will store the document content.
-            properties = [
-                wvc.config.Property(name="text", data_type=wvc.config.DataType.TEXT),
-                wvc.config.Property(name="source", data_type=wvc.config.DataType.TEXT),  # Example: filename
-                wvc.config.Property(name="chunk_index", data_type=wvc.config.DataType.INT),  # Example
-                # Add other metadata properties as needed. Ensure they are
-                # simple types.
-            ]
+            properties = _collection_properties()
 
             vectorizer_config = wvc.config.Configure.Vectorizer.text2vec_openai(
                 model=settings.OPENAI_EMBEDDING_MODEL_NAME,  # type="text", # Usually default
+                dimensions=settings.OPENAI_EMBEDDING_DIMENSIONS,
             )
 
             client.collections.create(
@@ -101,78 +180,497 @@ def ensure_weaviate_schema(client: weaviate.WeaviateClient, index_name: str):
             logger.info(f"Successfully created collection '{index_name}'.")
         else:
             logger.info(f"Collection '{index_name}' already exists.")
+            # Collections created by older versions lack newer properties such as group_id
+            collection = client.collections.get(index_name)
+            existing = {prop.name for prop in collection.config.get().properties}
+            for prop in _collection_properties():
+                if prop.name not in existing:
+                    collection.config.add_property(prop)
+                    logger.info(f"Added missing property '{prop.name}' to collection '{index_name}'.")
     except Exception as e:
         logger.error(f"Error ensuring Weaviate schema for '{index_name}': {e}", exc_info=True)
         raise
 
 
+def _chunk_source_key(doc: LangchainDocument) -> Tuple[str, str]:
+    metadata = doc.metadata or {}
+    return str(metadata.get("group_id") or ""), str(metadata.get("source") or "")
+
+
+def chunk_uuid(group_id: str, source: str, content_hash: str, occurrence: int = 0) -> str:
+    """
+    Deterministic object UUID for a chunk: the same chunk text uploaded again
+    for the same source in the same group maps to the same object.
+    occurrence distinguishes identical chunks within one document.
+    """
+    return str(uuid.uuid5(CHUNK_UUID_NAMESPACE, "\x1f".join((group_id, source, content_hash, str(occurrence)))))
+
+
+def chunk_content_hash(doc: LangchainDocument) -> str:
+    """
+    Hash of a chunk's text. Its pages are left out, so a chunk that only moved
+    (e.g. behind an inserted slide) keeps its object and embedding; its
+    position properties are updated in place instead (see _moved_properties).
+    """
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+
+def _moved_properties(doc: LangchainDocument, stored: Dict[str, Any]) -> Dict[str, Any]:
+    """The position properties of *doc* that differ from those *stored* for its chunk."""
+    metadata = doc.metadata or {}
+    return {key: metadata[key] for key in _CHUNK_POSITION_PROPERTIES if key in metadata and metadata[key] != stored.get(key)}
+
+
+def chunk_uuids(documents: List[LangchainDocument]) -> List[str]:
+    occurrences: Counter = Counter()
+    uuids = []
+    for doc in documents:
+        group_id, source = _chunk_source_key(doc)
+        content_hash = chunk_content_hash(doc)
+        key = (group_id, source, content_hash)
+        uuids.append(chunk_uuid(group_id, source, content_hash, occurrences[key]))
+        occurrences[key] += 1
+    return uuids
+
+
+class IndexingResult(NamedTuple):
+    inserted: int
+    deleted: int
+    unchanged: int
+    failed: int
+
+
 class WeaviateIndexer:
-    """Handles indexing of Langchain Documents into Weaviate using v4 client."""
+    """
+    Handles indexing of Langchain Documents into Weaviate using v4 client.
+    Anything with page_content and metadata attributes can be indexed, such as
+    the Chunk views of a ChunkTable, which the ingestion paths pass instead.
+    """
 
-    def __init__(self, client: weaviate.WeaviateClient, index_name: str, batch_size: int = 100):
+    def __init__(
+        self,
+        client: weaviate.WeaviateClient,
+        index_name: str,
+        batch_size: int = 100,
+        embedding_model: Optional[Embeddings] = None,
+        embed_batch_size: int = 256,
+        embed_batch_max_tokens: int = 100_000,
+        embed_concurrency: int = 4,
+        token_counter: Optional[TokenCounter] = None,
+    ):
+        """
+        If embedding_model is given, chunks are embedded here (through the
+        embedding cache, so unchanged chunks cost no API call) and inserted
+        with their vectors. Embedding requests of up to embed_batch_size
+        chunks / embed_batch_max_tokens tokens (counted with token_counter,
+        by default the embedding model's) run embed_concurrency at a time,
+        overlapping with the Weaviate inserts of earlier batches.
+        Otherwise Weaviate's text2vec-openai module vectorizes them server-side.
+        """
         self.client = client
         self.index_name = index_name
         self.batch_size = batch_size
-        logger.info(f"WeaviateIndexer initialized for collection '{index_name}' with batch_size={batch_size}.")
+        self.embedding_model = embedding_model
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.embed_batch_max_tokens = embed_batch_max_tokens
+        self.embed_concurrency = max(1, embed_concurrency)
+        self.token_counter = token_counter or get_token_counter(settings.OPENAI_EMBEDDING_MODEL_NAME)
+        logger.info(
+            f"WeaviateIndexer initialized for collection '{index_name}' with batch_size={batch_size}, client-side vectors={embedding_model is not None}"
+            + (f" (embed_batch_size={self.embed_batch_size}, embed_batch_max_tokens={embed_batch_max_tokens}, embed_concurrency={self.embed_concurrency})." if embedding_model else ".")
+        )
+
+    def _embedding_batches(self, documents: List[LangchainDocument]) -> List[Tuple[int, int]]:
+        """Splits documents into [start, stop) ranges that fit one embedding request."""
+        ranges = []
+        start = 0
+        for batch in self._iter_document_batches(documents):
+            ranges.append((start, start + len(batch)))
+            start += len(batch)
+        return ranges
+
+    def _iter_document_batches(self, documents: Iterable[LangchainDocument]) -> Iterator[List[LangchainDocument]]:
+        """Groups documents lazily into lists that fit one embedding request."""
+        batch: List[LangchainDocument] = []
+        tokens = 0
+        for doc in documents:
+            doc_tokens = self.token_counter(doc.page_content)
+            if batch and (len(batch) >= self.embed_batch_size or tokens + doc_tokens > self.embed_batch_max_tokens):
+                yield batch
+                batch, tokens = [], 0
+            batch.append(doc)
+            tokens += doc_tokens
+        if batch:
+            yield batch
+
+    def _pipelined_embeddings(self, text_batches: Iterable[List[str]]) -> Iterator[List[List[float]]]:
+        """
+        Yields the vectors of each text batch in order. Batches are pulled lazily,
+        and up to embed_concurrency embedding requests are in flight while the
+        caller processes earlier results.
+        """
+        text_batches = iter(text_batches)
+        with ThreadPoolExecutor(max_workers=self.embed_concurrency, thread_name_prefix="embed") as executor:
+            pending: Deque[Future] = deque()
+            exhausted = False
+            try:
+                while True:
+                    while not exhausted and len(pending) < self.embed_concurrency:
+                        texts = next(text_batches, None)
+                        if texts is None:
+                            exhausted = True
+                        else:
+                            pending.append(executor.submit(self.embedding_model.embed_documents, texts))
+                    if not pending:
+                        return
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _iter_vectorized_ranges(self, documents: List[LangchainDocument]) -> Iterator[Tuple[int, int, List[List[float]]]]:
+        """
+        Yields (start, stop, vectors) in document order. Up to embed_concurrency
+        embedding requests are in flight while the caller inserts earlier ranges.
+        """
+        ranges = self._embedding_batches(documents)
+        text_batches = ([doc.page_content for doc in documents[start:stop]] for start, stop in ranges)
+        for (start, stop), vectors in zip(ranges, self._pipelined_embeddings(text_batches)):
+            yield start, stop, vectors
+
+    def embed_documents(self, documents: List[LangchainDocument]) -> List[List[float]]:
+        """Embeds the documents' text with concurrent, token-bounded requests. Requires an embedding_model."""
+        if self.embedding_model is None:
+            raise RuntimeError("WeaviateIndexer has no embedding model for client-side vectorization.")
+        vectors: List[List[float]] = []
+        for _, _, batch_vectors in self._iter_vectorized_ranges(documents):
+            vectors.extend(batch_vectors)
+        return vectors
+
+    @staticmethod
+    def _document_properties(doc: LangchainDocument) -> dict:
+        properties = {"text": doc.page_content}
+        # Add metadata from LangchainDocument to properties
+        if doc.metadata:
+            for key, value in doc.metadata.items():
+                # Ensure metadata keys are valid property names and
+                # values are compatible types
+                if isinstance(value, (str, int, float, bool, list)):  # Weaviate supports list of primitives
+                    properties[key.lower().replace(" ", "_")] = value  # else:  # logger.warning(f"Skipping metadata key '{key}' with unhandled type {type(value)}")
+        return properties
+
+    def _fetch_existing_chunks(self, collection: Any, group_id: str, source: str) -> Dict[str, Dict[str, Any]]:
+        """
+        The chunks already stored for *source* in *group_id*: UUID -> their
+        position properties (see _CHUNK_POSITION_PROPERTIES). The
+        group is filtered on when there is one; chunks uploaded without a group
+        have no group_id, and matching a missing value would need null-state
+        indexing. Chunks are listed by UUID range rather than by offset, which
+        Weaviate caps at QUERY_MAXIMUM_RESULTS (neither the cursor nor
+        collection.iterator can be combined with a filter): a range that fills
+        a page is listed again as the 16 ranges of its next hex digit.
+        """
+        source_filter = wvc.query.Filter.by_property("source").equal(source)
+        if group_id:
+            source_filter = source_filter & wvc.query.Filter.by_property("group_id").equal(group_id)
+        existing: Dict[str, Dict[str, Any]] = {}
+        ranges: Deque[Tuple[str, Optional[str]]] = deque([("", None)])  # [lower, upper) bounds; "" and None are open
+        while ranges:
+            lower, upper = ranges.popleft()
+            filters = source_filter
+            if lower:
+                filters = filters & wvc.query.Filter.by_property("_id").greater_or_equal(lower)
+            if upper:
+                filters = filters & wvc.query.Filter.by_property("_id").less_than(upper)
+            response = collection.query.fetch_objects(filters=filters, return_properties=["source", "group_id", *_CHUNK_POSITION_PROPERTIES], limit=_EXISTING_CHUNKS_PAGE_SIZE)
+            if len(response.objects) >= _EXISTING_CHUNKS_PAGE_SIZE:
+                ranges.extend(_split_uuid_range(lower, upper))
+                continue
+            for item in response.objects:
+                # "source" is word-tokenized, so the filter can match similar names; compare exactly here.
+                if item.properties.get("source") == source and (item.properties.get("group_id") or "") == group_id:
+                    existing[str(item.uuid)] = {key: item.properties.get(key) for key in _CHUNK_POSITION_PROPERTIES}
+        return existing
 
-    def index_documents(self, documents: List[LangchainDocument]):
+    def index_documents(
+        self,
+        documents: List[LangchainDocument],
+        progress_callback: Optional[Callable[[int], None]] = None,
+        vectors: Optional[List[List[float]]] = None,
+        failed_ids: Optional[List[str]] = None,
+    ) -> IndexingResult:
         """
         Indexes a list of Langchain Documents into the Weaviate collection.
-        Uses v4 batching.
+        Chunks get deterministic UUIDs from (group_id, source, content hash),
+        and the documents of each source replace what is stored for it: only
+        chunks not yet stored are embedded and inserted, stored chunks that
+        moved get their new pages in place, and stored chunks that no longer
+        occur are deleted afterwards. Documents without a "source" are always
+        inserted.
+        Uses v4 batching. Precomputed vectors (one per document) are inserted
+        as given; otherwise new documents are embedded client-side if the
+        indexer has an embedding model, or vectorized by Weaviate.
+        progress_callback, if given, receives the number of documents indexed
+        so far (unchanged ones count as indexed) after every added range, and
+        the number successfully indexed once the batch has been flushed.
+        The UUIDs of chunks that failed to insert are appended to *failed_ids*
+        (see chunk_uuids), e.g. to tell which files of a batch they came from.
         """
         if not documents:
             logger.info("No documents provided for indexing.")
-            return
+            return IndexingResult(0, 0, 0, 0)
+        if vectors is not None and len(vectors) != len(documents):
+            raise ValueError(f"Got {len(vectors)} vectors for {len(documents)} documents.")
 
         try:
             collection = self.client.collections.get(self.index_name)
-            # For v4, batching is typically done via the collection object
-            with collection.batch.fixed_size(batch_size=self.batch_size) as batch:
-                for i, doc in enumerate(documents):
-                    properties = {"text": doc.page_content}
-                    # Add metadata from LangchainDocument to properties
-                    if doc.metadata:
-                        for key, value in doc.metadata.items():
-                            # Ensure metadata keys are valid property names and
-                            # values are compatible types
-                            if isinstance(value, (str, int, float, bool, list)):  # Weaviate supports list of primitives
-                                properties[key.lower().replace(" ", "_")] = value  # else:  # logger.warning(f"Skipping metadata key '{key}' with unhandled type {type(value)}")
-
-                    # If embeddings are generated outside Weaviate (e.g., by Langchain)
-                    # and you want to provide them directly:
-                    # vector = get_embedding_model_instance().embed_query(doc.page_content)
-                    # batch.add_object(properties=properties, vector=vector)
-
-                    batch.add_object(properties=properties)
-
-                    if (i + 1) % self.batch_size == 0:
-                        logger.info(f"Added {(i + 1)}/{len(documents)} documents to current Weaviate batch.")
-
-            if collection.batch.failed_objects:
-                logger.error(f"Failed to index {len(collection.batch.failed_objects)} documents.")
-                for failed_obj in collection.batch.failed_objects:
+
+            uuids = chunk_uuids(documents)
+            existing_chunks: Dict[Tuple[str, str], Dict[str, Dict[str, Any]]] = {}
+            for doc in documents:
+                source_key = _chunk_source_key(doc)
+                if source_key[1] and source_key not in existing_chunks:
+                    existing_chunks[source_key] = self._fetch_existing_chunks(collection, *source_key)
+            stored_chunks = {chunk_id: stored for chunks in existing_chunks.values() for chunk_id, stored in chunks.items()}
+            stale_ids = set(stored_chunks) - set(uuids)
+            new_positions = [i for i, chunk_id in enumerate(uuids) if chunk_id not in stored_chunks]
+            moved = [(chunk_id, properties) for doc, chunk_id in zip(documents, uuids) if chunk_id in stored_chunks and (properties := _moved_properties(doc, stored_chunks[chunk_id]))]
+            unchanged = len(documents) - len(new_positions)
+            new_documents = [documents[i] for i in new_positions]
+            new_uuids = [uuids[i] for i in new_positions]
+            if existing_chunks:
+                logger.info(f"Re-indexing {len(existing_chunks)} source(s): {len(new_documents)} new, {unchanged} unchanged ({len(moved)} moved) and {len(stale_ids)} stale chunks.")
+            for chunk_id, properties in moved:
+                collection.data.update(uuid=chunk_id, properties=properties)
+
+            if vectors is not None:
+                vectorized_ranges = [(0, len(new_documents), [vectors[i] for i in new_positions])]
+            elif self.embedding_model is not None:
+                vectorized_ranges = self._iter_vectorized_ranges(new_documents)
+            else:
+                # With vector=None Weaviate vectorizes the objects itself
+                vectorized_ranges = ((start, min(start + self.batch_size, len(new_documents)), None) for start in range(0, len(new_documents), self.batch_size))
+
+            if progress_callback and unchanged:
+                progress_callback(unchanged)
+            failed_objects = []
+            if new_documents:
+                # For v4, batching is typically done via the collection object.
+                # The batch sends objects in the background, so inserting one range
+                # overlaps with embedding the next ones.
+                with collection.batch.fixed_size(batch_size=self.batch_size) as batch:
+                    for start, stop, range_vectors in vectorized_ranges:
+                        for i in range(start, stop):
+                            batch.add_object(
+                                properties=self._document_properties(new_documents[i]),
+                                uuid=new_uuids[i],
+                                vector=range_vectors[i - start] if range_vectors is not None else None,
+                            )
+                        logger.info(f"Added {stop}/{len(new_documents)} new documents to current Weaviate batch.")
+                        if progress_callback:
+                            progress_callback(unchanged + stop)
+                failed_objects = collection.batch.failed_objects
+                if failed_ids is not None:
+                    failed_ids.extend(str(failed_obj.original_uuid) for failed_obj in failed_objects)
+
+            if progress_callback:
+                progress_callback(len(documents) - len(failed_objects))
+
+            if failed_objects:
+                logger.error(f"Failed to index {len(failed_objects)} documents.")
+                for failed_obj in failed_objects:
                     logger.error(f"  Failed object: {failed_obj.message}, original: {failed_obj.original_uuid}, properties: {failed_obj.original_properties}")
             else:
                 logger.info(f"Successfully indexed {len(documents)} documents into '{self.index_name}'.")
 
+            # Delete vanished chunks only after the new version is completely in place
+            deleted = self._delete_stale_chunks(collection, stale_ids, failed_objects)
+            return IndexingResult(inserted=len(new_documents) - len(failed_objects), deleted=deleted, unchanged=unchanged, failed=len(failed_objects))
+
         except Exception as e:
             logger.error(f"Error indexing documents into '{self.index_name}': {e}", exc_info=True)
             raise
 
+    def index_document_stream(
+        self,
+        documents: Iterable[LangchainDocument],
+        progress_callback: Optional[Callable[[int], None]] = None,
+    ) -> IndexingResult:
+        """
+        Indexes documents as they arrive, e.g. lazily split from a document that
+        is still being extracted, with the same chunk identity and replacement
+        semantics as index_documents. Only the documents of the embedding
+        requests in flight and the current Weaviate batch are held in memory.
+        Stale chunks are deleted once the stream is exhausted. If the stream
+        fails, the chunks inserted from it are deleted again, so the previously
+        stored version stays intact.
+        progress_callback, if given, receives the number of documents indexed
+        so far (unchanged ones count as indexed).
+        """
+        collection = self.client.collections.get(self.index_name)
+        occurrences: Counter = Counter()
+        existing_chunks: Dict[Tuple[str, str], Dict[str, Dict[str, Any]]] = {}
+        seen_ids: Set[str] = set()
+        new_ids: Deque[str] = deque()  # UUIDs of the new documents not inserted yet, in order
+        inserted_ids: List[str] = []
+        counts = {"total": 0, "unchanged": 0}
+
+        def new_documents() -> Iterator[LangchainDocument]:
+            for doc in documents:
+                counts["total"] += 1
+                group_id, source = source_key = _chunk_source_key(doc)
+                content_hash = chunk_content_hash(doc)
+                chunk_id = chunk_uuid(group_id, source, content_hash, occurrences[(group_id, source, content_hash)])
+                occurrences[(group_id, source, content_hash)] += 1
+                seen_ids.add(chunk_id)
+                if source and source_key not in existing_chunks:
+                    existing_chunks[source_key] = self._fetch_existing_chunks(collection, group_id, source)
+                stored = existing_chunks.get(source_key, {}).get(chunk_id)
+                if stored is not None:
+                    counts["unchanged"] += 1
+                    moved_properties = _moved_properties(doc, stored)
+                    if moved_properties:
+                        collection.data.update(uuid=chunk_id, properties=moved_properties)
+                    continue
+                new_ids.append(chunk_id)
+                yield doc
+
+        if self.embedding_model is not None:
+            batches = self._iter_document_batches(new_documents())
+        else:
+            batches = _chunked(new_documents(), self.batch_size)
+
+        try:
+            with collection.batch.fixed_size(batch_size=self.batch_size) as batch:
+                for batch_documents, batch_vectors in self._iter_vectorized_batches(batches):
+                    for i, doc in enumerate(batch_documents):
+                        chunk_id = new_ids.popleft()
+                        batch.add_object(
+                            properties=self._document_properties(doc),
+                            uuid=chunk_id,
+                            vector=batch_vectors[i] if batch_vectors is not None else None,
+                        )
+                        inserted_ids.append(chunk_id)
+                    if progress_callback:
+                        progress_callback(counts["unchanged"] + len(inserted_ids))
+            failed_objects = collection.batch.failed_objects
+        except Exception as e:
+            logger.error(f"Error indexing document stream into '{self.index_name}': {e}", exc_info=True)
+            if inserted_ids:
+                removed = self._delete_chunks(collection, inserted_ids)
+                logger.info(f"Removed {removed} of the {len(inserted_ids)} chunks inserted before the failure from '{self.index_name}'.")
+            raise
+
+        if progress_callback:
+            progress_callback(counts["total"] - len(failed_objects))
+        if failed_objects:
+            logger.error(f"Failed to index {len(failed_objects)} documents.")
+            for failed_obj in failed_objects:
+                logger.error(f"  Failed object: {failed_obj.message}, original: {failed_obj.original_uuid}, properties: {failed_obj.original_properties}")
+        else:
+            logger.info(f"Successfully indexed {counts['total']} streamed documents into '{self.index_name}'.")
+
+        # Delete vanished chunks only after the new version is completely in place
+        deleted = self._delete_stale_chunks(collection, set().union(*existing_chunks.values()) - seen_ids, failed_objects)
+        return IndexingResult(inserted=len(inserted_ids) - len(failed_objects), deleted=deleted, unchanged=counts["unchanged"], failed=len(failed_objects))
+
+    def _delete_stale_chunks(self, collection: Any, stale_ids: Set[str], failed_objects: list) -> int:
+        """
+        Deletes the stored chunks that no longer occur and returns how many. If
+        any insert failed, the previous version is kept: its chunks are all
+        that is left of the parts that failed, and a retry replaces them.
+        """
+        if not stale_ids:
+            return 0
+        if failed_objects:
+            logger.warning(f"Keeping {len(stale_ids)} stale chunks in '{self.index_name}' because {len(failed_objects)} new chunks failed to insert.")
+            return 0
+        deleted = self._delete_chunks(collection, stale_ids)
+        logger.info(f"Deleted {deleted} of {len(stale_ids)} stale chunks from '{self.index_name}'.")
+        return deleted
+
+    def _delete_chunks(self, collection: Any, chunk_ids: Iterable[str]) -> int:
+        """
+        Deletes the chunks with *chunk_ids* in delete_many calls of up to
+        _DELETE_BATCH_SIZE UUIDs and returns how many were deleted. Failed
+        deletes are logged; the chunks are deleted again by the next upload
+        of their source.
+        """
+        deleted = 0
+        for batch_ids in _chunked(sorted(chunk_ids), _DELETE_BATCH_SIZE):
+            result = collection.data.delete_many(where=wvc.query.Filter.by_id().contains_any(batch_ids))
+            deleted += result.successful
+            if result.failed:
+                logger.error(f"Failed to delete {result.failed} of {result.matches} chunks from '{self.index_name}'.")
+        return deleted
+
+    def _iter_vectorized_batches(self, batches: Iterable[List[LangchainDocument]]) -> Iterator[Tuple[List[LangchainDocument], Optional[List[List[float]]]]]:
+        """Yields (documents, vectors) per batch; vectors are None if Weaviate vectorizes server-side."""
+        if self.embedding_model is None:
+            for batch_documents in batches:
+                yield batch_documents, None
+            return
+        in_flight: Deque[List[LangchainDocument]] = deque()
+
+        def text_batches() -> Iterator[List[str]]:
+            for batch_documents in batches:
+                in_flight.append(batch_documents)
+                yield [doc.page_content for doc in batch_documents]
+
+        for vectors in self._pipelined_embeddings(text_batches()):
+            yield in_flight.popleft(), vectors
+
+
+def _split_uuid_range(lower: str, upper: Optional[str]) -> List[Tuple[str, Optional[str]]]:
+    """Splits the UUIDs starting with *lower* (below *upper*) into 16 ranges by their next hex digit."""
+    prefix = lower + "-" if len(lower) in _UUID_DASH_POSITIONS else lower
+    bounds = [prefix + digit for digit in _UUID_HEX_DIGITS]
+    return list(zip(bounds, bounds[1:] + [upper]))
+
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
 
 def get_weaviate_indexer() -> WeaviateIndexer:
     """Provides a WeaviateIndexer instance."""
     client = get_weaviate_client()
-    return WeaviateIndexer(client, settings.WEAVIATE_INDEX_NAME)
+    embedding_model = None
+    if settings.CLIENT_SIDE_VECTORIZATION:
+        try:
+            # Embedding through the shared (cached) model lets re-ingested chunks skip the API
+            embedding_model = get_embedding_model_instance()
+        except RuntimeError:
+            logger.warning("Embedding model unavailable; falling back to server-side vectorization in Weaviate.")
+    return WeaviateIndexer(
+        client,
+        settings.WEAVIATE_INDEX_NAME,
+        embedding_model=embedding_model,
+        embed_batch_size=settings.EMBEDDING_BATCH_SIZE,
+        embed_batch_max_tokens=settings.EMBEDDING_BATCH_MAX_TOKENS,
+        embed_concurrency=settings.EMBEDDING_CONCURRENCY,
+    )
 
 
 class WeaviateLangchainRetriever(BaseRetriever):
-    """Custom Langchain compatible retriever using Weaviate direct client for v4."""
+    """
+    Custom Langchain compatible retriever using Weaviate direct client for v4.
+    Async retrieval (ainvoke) awaits the query embedding and the near_vector
+    search on the shared async client, so concurrent chat requests overlap.
+    """
 
     client: weaviate.WeaviateClient
     embedding_model: Embeddings
     index_name: str
     k: int
+    async_client: Optional[Any] = None  # WeaviateAsyncClient; the shared one (get_weaviate_async_client) if None
 
     def __init__(
         self,
@@ -180,46 +678,57 @@ class WeaviateLangchainRetriever(BaseRetriever):
         embedding_model: Embeddings,
         index_name: str,
         k: int = DEFAULT_TOP_K,
+        async_client: Optional[Any] = None,
     ):
-        super().__init__(client=client, embedding_model=embedding_model, index_name=index_name, k=k)
+        super().__init__(client=client, embedding_model=embedding_model, index_name=index_name, k=k, async_client=async_client)
         if not self.client.is_ready():
             logger.error("Weaviate client is not ready in WeaviateLangchainRetriever.")
 
+    def _near_vector_kwargs(self, query_vector: List[float]) -> Dict[str, Any]:
+        return dict(
+            near_vector=query_vector,
+            limit=self.k,
+            return_metadata=wvc.query.MetadataQuery(distance=True),
+            # Example metadata
+            return_properties=[
+                "text",
+                "source",
+                "chunk_index",
+                "page_number",
+                "last_page_number",
+                "token_count",
+            ],
+            # Specify properties to retrieve
+        )
+
+    def _documents_from_response(self, query: str, response: Any) -> List[LangchainDocument]:
+        documents = []
+        for item in response.objects:
+            content = item.properties.get("text", "")
+            metadata = {
+                "source": item.properties.get("source"),
+                "chunk_index": item.properties.get("chunk_index"),
+                "page_number": item.properties.get("page_number"),
+                "last_page_number": item.properties.get("last_page_number"),
+                "token_count": item.properties.get("token_count"),
+            }
+            # Filter out None metadata values
+            metadata = {k: v for k, v in metadata.items() if v is not None}
+            if item.metadata and item.metadata.distance is not None:
+                metadata["distance"] = item.metadata.distance
+
+            documents.append(LangchainDocument(page_content=content, metadata=metadata))
+
+        logger.info(f"Retrieved {len(documents)} documents from '{self.index_name}' for query: '{query}'")
+        return documents
+
     def _get_relevant_documents(self, query: str, **kwargs: Any) -> List[LangchainDocument]:
         """Retrieve relevant documents from Weaviate based on the query."""
         try:
             query_vector = self.embedding_model.embed_query(query)
             collection = self.client.collections.get(self.index_name)
-
-            response = collection.query.near_vector(
-                near_vector=query_vector,
-                limit=self.k,
-                return_metadata=wvc.query.MetadataQuery(distance=True),
-                # Example metadata
-                return_properties=[
-                    "text",
-                    "source",
-                    "chunk_index",
-                ],
-                # Specify properties to retrieve
-            )
-
-            documents = []
-            for item in response.objects:
-                content = item.properties.get("text", "")
-                metadata = {
-                    "source": item.properties.get("source"),
-                    "chunk_index": item.properties.get("chunk_index"),
-                }
-                # Filter out None metadata values
-                metadata = {k: v for k, v in metadata.items() if v is not None}
-                if item.metadata and item.metadata.distance is not None:
-                    metadata["distance"] = item.metadata.distance
-
-                documents.append(LangchainDocument(page_content=content, metadata=metadata))
-
-            logger.info(f"Retrieved {len(documents)} documents from '{self.index_name}' for query: '{query}'")
-            return documents
+            response = collection.query.near_vector(**self._near_vector_kwargs(query_vector))
+            return self._documents_from_response(query, response)
         except WeaviateClosedClientError:
             logger.error("Weaviate client is closed. Attempting to reconnect and retry.")
             # Attempt to re-initialize the global client and retry once.
@@ -234,8 +743,25 @@ class WeaviateLangchainRetriever(BaseRetriever):
             return []  # Return empty list on error
 
     async def _aget_relevant_documents(self, query: str, **kwargs: Any) -> List[LangchainDocument]:
-        logger.warning("Async retrieval called, using synchronous implementation as fallback.")
-        return self._get_relevant_documents(query, **kwargs)
+        """
+        Async counterpart of _get_relevant_documents. If the async client was closed, it
+        is reconnected and the search retried once, without embedding the query again.
+        """
+        try:
+            query_vector = await self.embedding_model.aembed_query(query)
+            client = self.async_client or await get_weaviate_async_client()
+            try:
+                response = await client.collections.get(self.index_name).query.near_vector(**self._near_vector_kwargs(query_vector))
+            except WeaviateClosedClientError:
+                logger.error("Weaviate async client is closed. Reconnecting and retrying once.")
+                client = await reconnect_weaviate_async_client(client)
+                if self.async_client is not None:
+                    self.async_client = client
+                response = await client.collections.get(self.index_name).query.near_vector(**self._near_vector_kwargs(query_vector))
+            return self._documents_from_response(query, response)
+        except Exception as e:
+            logger.error(f"Error retrieving documents from Weaviate: {e}", exc_info=True)
+            return []  # Return empty list on error
 
 
 def get_retriever(k: int = DEFAULT_TOP_K) -> BaseRetriever:
@@ -263,6 +789,18 @@ def close_weaviate_connection():
     _weaviate_client = None
 
 
+async def close_weaviate_async_connection():
+    """Closes the shared Weaviate async client if it's open."""
+    global _weaviate_async_client
+    if _weaviate_async_client and _weaviate_async_client.is_connected():
+        try:
+            await _weaviate_async_client.close()
+            logger.info("Weaviate async client connection closed.")
+        except Exception as e:
+            logger.error(f"Error closing Weaviate async client connection: {e}", exc_info=True)
+    _weaviate_async_client = None
+
+
 if __name__ == "__main__":
     # Example usage for testing the connector
     logging.basicConfig(
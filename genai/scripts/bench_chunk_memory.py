@@ -0,0 +1,59 @@
+"""Benchmark memory held by the chunks of a batch of documents.
+
+Compares one LangChain Document per chunk (``split_text_to_documents``) with
+the ChunkTables the ingestion paths keep (``split_text_to_chunks``) for a
+batch of paged lecture texts, as held between splitting and indexing in
+batch uploads and ``app.ingest``.  Memory is measured with tracemalloc after
+the extracted texts have been dropped.
+
+Run from the ``genai`` directory:
+
+    python -m scripts.bench_chunk_memory [--files 20] [--pages 100]
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from app.document_handling.extractors import PAGE_BREAK
+from app.document_handling.parsers import DocumentParser
+from scripts.bench_text_normalization import build_lecture_pages
+
+
+def build_texts(num_files: int, num_pages: int) -> list:
+    pages = build_lecture_pages(num_pages=num_pages)
+    # Vary the text per file so the batch does not share strings
+    return ["".join(PAGE_BREAK + f"File {file_idx}. " + page for page in pages) for file_idx in range(num_files)]
+
+
+def measure(split, texts: list):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    held = [split(text, metadata={"source": f"lecture-{i}.pdf", "group_id": "os-2024"}) for i, text in enumerate(texts)]
+    seconds = time.perf_counter() - started
+    texts.clear()  # The extracted texts are freed once split
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, current / 1e6, peak / 1e6, sum(len(chunks) for chunks in held)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20, help="Documents in the batch")
+    parser.add_argument("--pages", type=int, default=100, help="Pages per document")
+    args = parser.parse_args()
+
+    document_parser = DocumentParser()
+    text_mb = sum(len(text) for text in build_texts(args.files, args.pages)) / 1e6
+    print(f"{args.files} files, {text_mb:.1f} MB of text")
+    print(f"{'representation':>16}{'chunks':>8}{'split s':>9}{'held MB':>9}{'peak MB':>9}")
+    for name, split in (("Documents", document_parser.split_text_to_documents), ("ChunkTables", document_parser.split_text_to_chunks)):
+        seconds, held, peak, chunks = measure(split, build_texts(args.files, args.pages))
+        print(f"{name:>16}{chunks:>8}{seconds:>9.2f}{held:>9.1f}{peak:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark PDF header/footer detection on a long slide deck.
+
+Compares the previous detection — one scan over all blocks for every frequent
+block text — with the occurrence index that ``TextExtractor`` fills while
+pages are extracted.  The input is the block list of a synthetic slide deck
+in which every slide repeats the course title, logo text and footer lines.
+
+Run from the ``genai`` directory:
+
+    python -m scripts.bench_header_footer [--pages 2000]
+"""
+
+import argparse
+import time
+from collections import Counter
+
+from app.document_handling.extractors import TextExtractor, _HeaderFooterIndex
+
+PAGE_HEIGHT = 842.0
+
+
+def build_slide_deck_blocks(num_pages: int = 2000, boilerplate_blocks: int = 40) -> list:
+    """(page_idx, text, y0, y1, page_height) blocks as produced by TextExtractor._extract_pdf_page_blocks."""
+    blocks = []
+    for page_idx in range(num_pages):
+        blocks.append((page_idx, "Operating Systems - Winter Term", 20.0, 40.0, PAGE_HEIGHT))
+        blocks.append((page_idx, "TUM School of Computation", 20.0, 40.0, PAGE_HEIGHT))
+        for i in range(boilerplate_blocks):  # Logo alt texts, footer links, chapter markers, ...
+            y0 = 760.0 + (i % 4) * 10 if i % 5 else 400.0
+            blocks.append((page_idx, f"Footer element {i}", y0, y0 + 8, PAGE_HEIGHT))
+        for line_idx in range(10):
+            blocks.append((page_idx, f"Slide {page_idx} bullet {line_idx}: scheduling and synchronisation", 100.0 + line_idx * 40, 130.0 + line_idx * 40, PAGE_HEIGHT))
+        blocks.append((page_idx, str(page_idx + 1), 810.0, 820.0, PAGE_HEIGHT))
+    return blocks
+
+
+def legacy_common_hf_texts(all_blocks_info: list, num_pages: int) -> set:
+    """The previous detection: a full pass over all blocks per frequent candidate text."""
+    common_hf_texts = set()
+    if num_pages > 1:
+        block_text_counts = Counter(b_info[1] for b_info in all_blocks_info)
+        min_occurrences_for_hf = max(2, int(num_pages * 0.3))
+        for text, count in block_text_counts.items():
+            if count >= min_occurrences_for_hf and len(text) < 100:
+                in_hf_zone_count = 0
+                for p_idx, b_text, b_y0, b_y1, p_height in all_blocks_info:
+                    if b_text == text:
+                        if b_y1 < p_height * 0.15 or b_y0 > p_height * 0.85:
+                            in_hf_zone_count += 1
+                if in_hf_zone_count / count > 0.7:
+                    common_hf_texts.add(text)
+    return common_hf_texts
+
+
+def best_seconds(run, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=2000, help="Number of slides in the synthetic deck")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per variant; the best run is reported")
+    args = parser.parse_args()
+
+    blocks = build_slide_deck_blocks(args.pages)
+    index = _HeaderFooterIndex(blocks)
+    if index.common_texts(args.pages) != legacy_common_hf_texts(blocks, args.pages):
+        raise SystemExit("Header/footer detection differs from the previous implementation")
+
+    extractor = TextExtractor()
+    before = best_seconds(lambda: legacy_common_hf_texts(blocks, args.pages), args.repeat)
+    after = best_seconds(lambda: _HeaderFooterIndex(blocks).common_texts(args.pages), args.repeat)
+    assemble = best_seconds(lambda: extractor._assemble_pdf_text(blocks, args.pages), args.repeat)
+    print(f"{args.pages} pages, {len(blocks)} blocks, {len(index.common_texts(args.pages))} header/footer texts")
+    print(f"H/F detection before: {before * 1000:9.1f} ms")
+    print(f"H/F detection after:  {after * 1000:9.1f} ms ({before / after:.0f}x)")
+    print(f"Full page assembly:   {assemble * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
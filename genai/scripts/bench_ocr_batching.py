@@ -0,0 +1,88 @@
+"""Benchmark OCR throughput (images/s) against batch size on CPU.
+
+Runs ``HandwrittenTextRecognizer.recognize_batch`` on synthetic line images
+(a formula rendered with PIL's default font) for each batch size, after one
+warm-up batch that loads the model.  ``--concurrent`` additionally measures
+the micro-batched path, with that many threads calling ``recognize`` at once.
+Needs torch and transformers, and downloads the model on first use.
+
+Run from the ``genai`` directory:
+
+    python -m scripts.bench_ocr_batching [--batch-sizes 1 2 4 8 16] [--quantize] [--threads 4]
+"""
+
+import argparse
+import threading
+import time
+
+from PIL import Image, ImageDraw
+
+from app.config import settings
+from app.document_handling.handrwitten_text_recognition import HandwrittenTextRecognizer
+
+
+def build_line_images(count: int) -> list:
+    images = []
+    for i in range(count):
+        image = Image.new("RGB", (384, 64), color="white")
+        ImageDraw.Draw(image).text((10, 24), f"f(x) = {i % 9 + 1}x^2 + {i % 7}x - {i % 5}", fill="black")
+        images.append(image)
+    return images
+
+
+def images_per_second(recognizer: HandwrittenTextRecognizer, images: list, batch_size: int) -> float:
+    started = time.perf_counter()
+    for start in range(0, len(images), batch_size):
+        recognizer.recognize_batch(images[start : start + batch_size])
+    return len(images) / (time.perf_counter() - started)
+
+
+def concurrent_images_per_second(recognizer: HandwrittenTextRecognizer, images: list, num_threads: int) -> float:
+    remaining = list(images)
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not remaining:
+                    return
+                image = remaining.pop()
+            recognizer.recognize(image)
+
+    threads = [threading.Thread(target=worker) for _ in range(num_threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(images) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--images", type=int, default=32, help="Images per measurement")
+    parser.add_argument("--model", default=settings.OCR_MODEL_NAME)
+    parser.add_argument("--quantize", action="store_true", help="int8 dynamic quantization")
+    parser.add_argument("--threads", type=int, default=0, help="torch threads (0 = half of the cores)")
+    parser.add_argument("--concurrent", type=int, default=0, help="Also measure this many concurrent recognize() callers")
+    args = parser.parse_args()
+
+    recognizer = HandwrittenTextRecognizer(model_name=args.model, max_batch_size=max(args.batch_sizes), quantize=args.quantize, num_threads=args.threads)
+    images = build_line_images(args.images)
+    try:
+        recognizer.recognize_batch(images[:1])  # Load the model
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+
+    print(f"model={args.model} int8={args.quantize} threads={recognizer.num_threads} images={args.images}")
+    print(f"{'batch size':>11}{'images/s':>10}")
+    for batch_size in args.batch_sizes:
+        print(f"{batch_size:>11}{images_per_second(recognizer, images, batch_size):>10.2f}")
+    if args.concurrent:
+        throughput = concurrent_images_per_second(recognizer, images, args.concurrent)
+        print(f"{args.concurrent} concurrent callers: {throughput:.2f} images/s in {recognizer.batches} batches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark DOCX and PPTX text extraction.
+
+Compares the previous extraction through the python-docx / python-pptx object
+models with ``TextExtractor``, which iterparses the document and slide XML
+(see ``app.document_handling.ooxml``).  The inputs are a synthetic slide deck
+(title, bullet list, grouped shapes, a table and speaker notes per slide)
+and a Word document of headings, paragraphs and tables.  Peak memory is
+measured with tracemalloc in a separate run.
+
+Run from the ``genai`` directory:
+
+    python -m scripts.bench_office_extraction [--slides 300] [--paragraphs 20000]
+"""
+
+import argparse
+import io
+import time
+import tracemalloc
+
+from docx import Document
+from pptx import Presentation
+from pptx.util import Inches
+
+from app.document_handling.extractors import TextExtractor
+
+
+def build_pptx(num_slides: int = 300) -> bytes:
+    prs = Presentation()
+    layout = prs.slide_layouts[1]  # Title and content
+    for slide_idx in range(num_slides):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Lecture 4, slide {slide_idx}: scheduling"
+        body = slide.placeholders[1].text_frame
+        body.text = f"Round robin gives every thread a time slice (slide {slide_idx})"
+        for bullet in range(4):
+            body.add_paragraph().text = f"Bullet {bullet}: context switches save the registers"
+        group = slide.shapes.add_group_shape()
+        for box in range(2):
+            group.shapes.add_textbox(Inches(1 + 3 * box), Inches(5), Inches(2), Inches(1)).text_frame.text = f"Grouped label {box} of slide {slide_idx}"
+        table = slide.shapes.add_table(2, 3, Inches(1), Inches(6), Inches(6), Inches(1)).table
+        for row in range(2):
+            for col in range(3):
+                table.cell(row, col).text = f"cell {row}.{col}"
+        slide.notes_slide.notes_text_frame.text = f"Speaker notes for slide {slide_idx}: mention the convoy effect."
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    return buffer.getvalue()
+
+
+def build_docx(num_paragraphs: int = 20000) -> bytes:
+    doc = Document()
+    for i in range(num_paragraphs):
+        if i % 50 == 0:
+            doc.add_heading(f"Chapter {i // 50}: Memory management", level=1)
+        doc.add_paragraph(f"Paragraph {i}: the page table maps virtual pages to physical frames, and the TLB caches recent translations.")
+        if i % 200 == 199:
+            table = doc.add_table(rows=3, cols=3)
+            for row in range(3):
+                for col in range(3):
+                    table.cell(row, col).text = f"frame {i}.{row}.{col}"
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def legacy_pptx_text(data: bytes) -> str:
+    """The previous extraction: text of the top-level shapes of every slide."""
+    prs = Presentation(io.BytesIO(data))
+    return "\n".join(shape.text for slide in prs.slides for shape in slide.shapes if getattr(shape, "text", None)).strip()
+
+
+def legacy_docx_text(data: bytes) -> str:
+    """The previous extraction: text of the top-level paragraphs."""
+    doc = Document(io.BytesIO(data))
+    return "\n".join(p.text for p in doc.paragraphs if p.text).strip()
+
+
+def measure(extract, data: bytes):
+    started = time.perf_counter()
+    text = extract(data)
+    seconds = time.perf_counter() - started
+    # Memory in a second run: tracemalloc slows down allocation-heavy code unevenly
+    tracemalloc.start()
+    extract(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak / 1e6, len(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slides", type=int, default=300, help="Slides in the synthetic deck")
+    parser.add_argument("--paragraphs", type=int, default=20000, help="Paragraphs in the synthetic document")
+    args = parser.parse_args()
+
+    extractor = TextExtractor()
+    inputs = (
+        ("pptx", build_pptx(args.slides), legacy_pptx_text, lambda data: extractor.extract_from_pptx(io.BytesIO(data))),
+        ("docx", build_docx(args.paragraphs), legacy_docx_text, lambda data: extractor.extract_from_docx(io.BytesIO(data))),
+    )
+    print(f"{'input':>6}{'MB':>7}{'variant':>14}{'seconds':>9}{'peak MB':>9}{'chars':>10}")
+    for name, data, legacy, fast in inputs:
+        for variant, extract in (("object model", legacy), ("XML", fast)):
+            seconds, peak, chars = measure(extract, data)
+            print(f"{name:>6}{len(data) / 1e6:>7.1f}{variant:>14}{seconds:>9.2f}{peak:>9.1f}{chars:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Benchmark PDF extraction of a mixed document with a few scanned pages.
+
+The document has text pages like the lecture pages of the tests, and
+every ``--scan-every``-th page replaced by a scan: an image of a page of
+handwriting-like lines without a text layer.  Reports how many pages were
+rendered and how many lines went to OCR, and the time with and without OCR
+of scanned pages (``pdf_ocr_dpi=0``).  Without torch and transformers, or
+with ``--fake-ocr-ms``, OCR is simulated with a fixed cost per batch so the
+extraction side can be measured anywhere.
+
+Run from the ``genai`` directory:
+
+    python -m scripts.bench_scanned_pdf [--pages 200] [--scan-every 40] [--dpi 150] [--fake-ocr-ms 200]
+"""
+
+import argparse
+import importlib.util
+import io
+import time
+
+import fitz
+from PIL import Image, ImageDraw, ImageFont
+
+from app.config import settings
+from app.document_handling.extractors import TextExtractor
+from app.document_handling.handrwitten_text_recognition import HandwrittenTextRecognizer
+
+A4 = fitz.paper_rect("a4")
+
+
+def build_scan_image(num_lines: int = 12, dpi: int = 100) -> Image.Image:
+    """A grayscale page image with *num_lines* lines of text, as a scanner would produce it."""
+    width, height = int(A4.width * dpi / 72), int(A4.height * dpi / 72)
+    image = Image.new("L", (width, height), color=235)  # Off-white paper
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=max(10, dpi // 5))
+    for line_idx in range(num_lines):
+        draw.text((dpi, dpi + line_idx * dpi // 2), f"Note {line_idx}: det(A - lambda I) = 0 gives the eigenvalues", font=font, fill=20)
+    return image
+
+
+def build_mixed_pdf(num_pages: int = 200, scan_every: int = 40, scan_lines: int = 12) -> bytes:
+    """A PDF of lecture text pages where pages scan_every - 1, 2 * scan_every - 1, ... are scans."""
+    scan_png = io.BytesIO()
+    build_scan_image(scan_lines).save(scan_png, format="PNG")
+    scan_xref = 0  # All scans show the same image
+    doc = fitz.open()
+    for page_idx in range(num_pages):
+        page = doc.new_page(width=A4.width, height=A4.height)
+        if scan_every and page_idx % scan_every == scan_every - 1:
+            scan_xref = page.insert_image(page.rect, stream=scan_png.getvalue(), xref=scan_xref)
+            continue
+        page.insert_text((72, 40), "Linear Algebra - Lecture Notes", fontsize=10)
+        for para_idx in range(12):
+            page.insert_text((72, 100 + 50 * para_idx), f"Paragraph {para_idx} on page {page_idx}: a matrix is diagonalizable if", fontsize=11)
+            page.insert_text((72, 114 + 50 * para_idx), "its eigenvectors span the whole space.", fontsize=11)
+        page.insert_text((290, 820), str(page_idx + 1), fontsize=10)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+class SimulatedRecognizer(HandwrittenTextRecognizer):
+    """Stands in for the model: every batch costs *batch_seconds*, and each line reads as its size."""
+
+    def __init__(self, batch_seconds: float, **kwargs):
+        super().__init__(model_name="simulated", **kwargs)
+        self.batch_seconds = batch_seconds
+
+    def is_available(self):
+        return True
+
+    def recognize_batch(self, images):
+        time.sleep(self.batch_seconds)
+        return [f"line {image.width}x{image.height}" for image in images]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--scan-every", type=int, default=40, help="Every n-th page is a scan")
+    parser.add_argument("--dpi", type=int, default=settings.PDF_OCR_DPI, help="Resolution scanned pages are rendered at")
+    parser.add_argument("--fake-ocr-ms", type=float, default=0, help="Simulate OCR at this cost per batch")
+    args = parser.parse_args()
+
+    if args.fake_ocr_ms or importlib.util.find_spec("torch") is None:
+        recognizer = SimulatedRecognizer((args.fake_ocr_ms or 200) / 1000, max_batch_size=settings.OCR_MAX_BATCH_SIZE)
+    else:
+        recognizer = HandwrittenTextRecognizer(model_name=settings.OCR_MODEL_NAME, max_batch_size=settings.OCR_MAX_BATCH_SIZE)
+    data = build_mixed_pdf(args.pages, args.scan_every)
+    print(f"{args.pages} pages, {args.pages // args.scan_every if args.scan_every else 0} scanned, recognizer={recognizer.model_name}")
+
+    print(f"{'variant':>10}{'seconds':>9}{'OCR lines':>11}{'batches':>9}{'chars':>9}")
+    for variant, dpi in (("no OCR", 0), (f"OCR@{args.dpi}", args.dpi)):
+        extractor = TextExtractor(text_recognizer=recognizer, pdf_ocr_dpi=dpi)
+        images, batches = recognizer.images, recognizer.batches
+        started = time.perf_counter()
+        text = extractor.extract_from_pdf(io.BytesIO(data))
+        seconds = time.perf_counter() - started
+        print(f"{variant:>10}{seconds:>9.2f}{recognizer.images - images:>11}{recognizer.batches - batches:>9}{len(text):>9}")
+
+
+if __name__ == "__main__":
+    main()
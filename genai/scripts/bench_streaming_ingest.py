@@ -0,0 +1,103 @@
+"""Benchmark time to first insert and peak memory of a single-document upload.
+
+Compares the previous flow — extract the whole text, split it into the full
+list of chunks, then index — with the streaming pipeline of
+``DocumentProcessingService.process_and_index_document``, in which page
+ranges are extracted on the pool while earlier chunks are already indexed.
+Weaviate is replaced by a collection that only records insert times, and
+peak memory is measured with tracemalloc in the service process (the
+extraction workers are separate processes).
+
+Run from the ``genai`` directory:
+
+    python -m scripts.bench_streaming_ingest [--pages 400 800]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from app.document_handling.extraction_pool import ExtractionExecutor
+from app.document_handling.parsers import DocumentParser
+from app.services.document_service import DocumentProcessingService
+from app.vector_store.weaviate_connector import WeaviateIndexer
+from scripts.bench_pdf_extraction import build_lecture_pdf
+
+
+class TimingCollection:
+    """Accepts inserts without storing them and remembers when the first one arrived."""
+
+    def __init__(self):
+        self.first_insert_at = None
+        self.inserted = 0
+        self.batch = SimpleNamespace(fixed_size=lambda batch_size: self, failed_objects=[])
+        self.query = SimpleNamespace(fetch_objects=lambda **kwargs: SimpleNamespace(objects=[]))
+        self.data = SimpleNamespace(delete_many=lambda where: None)
+
+    def client(self):
+        return SimpleNamespace(collections=SimpleNamespace(get=lambda name: self))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_object(self, properties, uuid=None, vector=None):
+        if self.first_insert_at is None:
+            self.first_insert_at = time.perf_counter()
+        self.inserted += 1
+
+
+async def whole_text_upload(service: DocumentProcessingService, pdf_path: str):
+    """The previous flow: all text, then all chunks, then indexing."""
+    text = await service.extraction_executor.extract_text(pdf_path, "lecture.pdf")
+    documents = await asyncio.to_thread(service.document_parser.split_text_to_documents, text, metadata={"source": "lecture.pdf"})
+    await asyncio.to_thread(service.weaviate_indexer.index_documents, documents)
+
+
+async def streamed_upload(service: DocumentProcessingService, pdf_path: str):
+    await service.process_and_index_document(pdf_path, "lecture.pdf")
+
+
+def measure(upload, executor: ExtractionExecutor, pdf_path: str):
+    collection = TimingCollection()
+    indexer = WeaviateIndexer(collection.client(), "Bench")
+    service = DocumentProcessingService(extraction_executor=executor, document_parser=DocumentParser(), weaviate_indexer=indexer, extraction_cache=None)
+    tracemalloc.start()
+    started = time.perf_counter()
+    asyncio.run(upload(service, pdf_path))
+    total = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return collection.first_insert_at - started, total, peak / 1e6, collection.inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 400], help="Document lengths to benchmark")
+    parser.add_argument("--workers", type=int, default=2, help="Extraction worker processes")
+    args = parser.parse_args()
+
+    executor = ExtractionExecutor(max_workers=args.workers)
+    print(f"{'pages':>6}{'flow':>10}{'first insert s':>16}{'total s':>10}{'peak MB':>10}{'chunks':>8}")
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for num_pages in args.pages:
+                pdf_path = os.path.join(tmp_dir, f"lecture-{num_pages}.pdf")
+                with open(pdf_path, "wb") as f:
+                    f.write(build_lecture_pdf(num_pages))
+                executor.submit(pdf_path, "lecture.pdf").result()  # Warm up the pool
+                for name, upload in (("whole", whole_text_upload), ("streamed", streamed_upload)):
+                    first_insert, total, peak, chunks = measure(upload, executor, pdf_path)
+                    print(f"{num_pages:>6}{name:>10}{first_insert:>16.2f}{total:>10.2f}{peak:>10.1f}{chunks:>8}")
+    finally:
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Benchmark post-processing throughput of extracted text (MB/s).
+
+Compares the previous ``TextExtractor._post_process_text`` — which split the
+text twice and ran several passes over every paragraph — with the single-pass
+normalizer in ``app.document_handling.text_normalization``, both on whole
+texts and streamed page by page.
+
+Run from the ``genai`` directory:
+
+    python -m scripts.bench_text_normalization [file.txt ...]
+
+Without arguments it benchmarks the texts in ``data/processed`` and a
+synthetic extraction of a long lecture deck.
+"""
+
+import argparse
+import glob
+import os
+import re
+import time
+
+from app.document_handling.text_normalization import iter_normalized_text, normalize_text
+
+PROCESSED_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "processed")
+
+
+def legacy_post_process_text(text: str) -> str:
+    """The previous implementation, kept as the reference for output parity."""
+    if not text:
+        return ""
+
+    paragraphs = re.split(r"\n\s*\n", text)
+
+    reconstructed_paragraphs = []
+    for para_text in paragraphs:
+        if not para_text.strip():
+            continue
+
+        current_para_lines = para_text.splitlines()
+        if not current_para_lines:
+            continue
+
+        for i in range(len(current_para_lines) - 1):
+            if current_para_lines[i].endswith("-"):
+                merged_line_start = current_para_lines[i][:-1]
+                if current_para_lines[i + 1] and current_para_lines[i + 1][0].islower():
+                    current_para_lines[i] = merged_line_start + current_para_lines[i + 1]
+                    current_para_lines[i + 1] = ""
+
+        current_para_lines = [line for line in current_para_lines if line]
+
+        if not current_para_lines:
+            reconstructed_paragraphs.append("")
+            continue
+
+        new_paragraph_content = [current_para_lines[0]]
+        for i in range(1, len(current_para_lines)):
+            prev_line = new_paragraph_content[-1].strip()
+            curr_line = current_para_lines[i].strip()
+
+            if not curr_line:
+                continue
+
+            prev_ends_punct = prev_line.endswith((".", "!", "?", ":", ";", ")", "]"))
+            curr_starts_lower = curr_line and curr_line[0].islower()
+            prev_is_list_item = prev_line.startswith(("-", "*", "•")) or re.match(r"^\s*\d+\.\s+", prev_line)
+
+            if prev_line and not prev_ends_punct and curr_starts_lower and not prev_is_list_item:
+                new_paragraph_content[-1] = prev_line + " " + curr_line
+            else:
+                new_paragraph_content.append(curr_line)
+
+        reconstructed_paragraphs.append("\n".join(new_paragraph_content))
+
+    final_text = "\n\n".join(filter(None, reconstructed_paragraphs))
+    final_text = re.sub(r" +", " ", final_text)
+    return final_text.strip()
+
+
+def build_lecture_pages(num_pages: int = 400) -> list:
+    """Raw per-page text shaped like a PDF extraction: headers, wrapped lines, hyphenation and lists."""
+    pages = []
+    for page_idx in range(num_pages):
+        lines = ["Operating Systems - Lecture Notes", ""]
+        for para_idx in range(12):
+            lines.append(f"Paragraph {para_idx} on page {page_idx}: processes share memory through sema-")
+            lines.append("phores and  monitors, which the scheduler has to take")
+            lines.append("into account when it pre-empts a running thread.")
+            lines.append(f"- bullet {para_idx}: mutual exclusion")
+            lines.append("  continued bullet text")
+            lines.append("")
+        lines.append(str(page_idx + 1))
+        pages.append("\n".join(lines) + "\n\n")
+    return pages
+
+
+def megabytes_per_second(pages: list, normalize, repeat: int) -> float:
+    size = sum(len(page.encode("utf-8")) for page in pages)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        normalize(pages)
+        best = min(best, time.perf_counter() - started)
+    return size / best / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("texts", nargs="*", help="Raw text files to benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per variant; the best run is reported")
+    args = parser.parse_args()
+
+    inputs = []
+    for path in args.texts or sorted(glob.glob(os.path.join(PROCESSED_DIR, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            inputs.append((os.path.basename(path), [f.read()]))
+    if not args.texts:
+        inputs.append(("synthetic lecture deck", build_lecture_pages()))
+
+    variants = [
+        ("before", lambda pages: legacy_post_process_text("".join(pages))),
+        ("after", lambda pages: normalize_text("".join(pages))),
+        ("streamed", lambda pages: "".join(iter_normalized_text(pages))),
+    ]
+    print(f"{'text':<28}{'KiB':>8}" + "".join(f"{name + ' MB/s':>16}" for name, _ in variants) + f"{'speedup':>9}")
+    for name, pages in inputs:
+        expected = legacy_post_process_text("".join(pages))
+        for variant_name, normalize in variants[1:]:
+            if normalize(pages) != expected:
+                raise SystemExit(f"{variant_name} output differs from the previous implementation for {name}")
+        rates = [megabytes_per_second(pages, normalize, args.repeat) for _, normalize in variants]
+        size_kib = sum(len(page.encode("utf-8")) for page in pages) / 1024
+        print(f"{name:<28}{size_kib:>8.0f}" + "".join(f"{rate:>16.1f}" for rate in rates) + f"{rates[1] / rates[0]:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark splitting long texts into chunks.
+
+Compares LangChain's ``RecursiveCharacterTextSplitter``, which the parser
+used before, with ``FastTextSplitter`` at the parser's default chunk size and
+overlap, and checks that both produce the same chunks.  Inputs are lecture
+text (paragraphs of sentences, as extracted from slides) and a transcript
+(one line per utterance, no blank lines) repeated up to the given sizes.
+
+Run from the ``genai`` directory:
+
+    python -m scripts.bench_text_splitter [--sizes 0.01 1 10 50]
+"""
+
+import argparse
+import time
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.document_handling.parsers import FastTextSplitter
+from scripts.bench_text_normalization import build_lecture_pages
+
+
+def build_transcript(num_lines: int = 2000) -> str:
+    return "".join(f"[{i // 60:02d}:{i % 60:02d}] Speaker {i % 3}: so the kernel saves the registers of thread {i} and switches stacks\n" for i in range(num_lines))
+
+
+def repeat_to_size(text: str, size_bytes: int) -> str:
+    return (text * (size_bytes // len(text) + 1))[:size_bytes]
+
+
+def seconds(run) -> float:
+    started = time.perf_counter()
+    run()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[0.01, 1, 10, 50], help="Text sizes in MB")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    args = parser.parse_args()
+
+    recursive = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    fast = FastTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    sources = {"lecture": "".join(build_lecture_pages(num_pages=50)), "transcript": build_transcript()}
+
+    print(f"{'input':>11}{'MB':>8}{'chunks':>9}{'recursive s':>13}{'fast s':>9}{'recursive MB/s':>16}{'fast MB/s':>11}{'speedup':>9}")
+    for name, source in sources.items():
+        for size_mb in args.sizes:
+            text = repeat_to_size(source, int(size_mb * 1e6))
+            result = {}
+            before = seconds(lambda: result.setdefault("recursive", recursive.split_text(text)))
+            after = seconds(lambda: result.setdefault("fast", fast.split_text(text)))
+            if result["recursive"] != result["fast"]:
+                raise SystemExit(f"Chunks of the {size_mb} MB {name} text differ from RecursiveCharacterTextSplitter")
+            mb = len(text) / 1e6
+            print(f"{name:>11}{mb:>8.2f}{len(result['fast']):>9}{before:>13.3f}{after:>9.3f}{mb / before:>16.1f}{mb / after:>11.1f}{before / after:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
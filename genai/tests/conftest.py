@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+import fitz
+import pytest
+from weaviate.collections.classes.filters import _FilterAnd, _FilterOr, _Operator
+
+
+def build_lecture_pdf(num_pages: int = 20, paragraphs_per_page: int = 12) -> bytes:
+    """Builds an in-memory PDF that looks like lecture slides: a repeated header, body text and page numbers."""
+    doc = fitz.open()
+    for page_idx in range(num_pages):
+        page = doc.new_page()
+        page.insert_text((72, 40), "Operating Systems - Lecture Notes", fontsize=10)
+        y = 100
+        for para_idx in range(paragraphs_per_page):
+            page.insert_text((72, y), f"Paragraph {para_idx} on page {page_idx}: processes share memory through semaphores and", fontsize=11)
+            page.insert_text((72, y + 14), "monitors, which the scheduler has to take into account.", fontsize=11)
+            y += 50
+        page.insert_text((290, 820), str(page_idx + 1), fontsize=10)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def repeat_pdf(pdf_bytes: bytes, copies: int) -> bytes:
+    """Concatenates *copies* copies of a PDF; much faster than laying out that many pages."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as src:
+        doc = fitz.open()
+        for _ in range(copies):
+            doc.insert_pdf(src)
+        data = doc.tobytes()
+        doc.close()
+    return data
+
+
+# Weaviate's default cap on offset + limit of a query
+QUERY_MAXIMUM_RESULTS = 10_000
+
+
+def _matches(filters, object_id, properties) -> bool:
+    """Evaluates a weaviate.classes.query.Filter against a stored object, like a collection without null-state indexing."""
+    if isinstance(filters, _FilterAnd):
+        return all(_matches(f, object_id, properties) for f in filters.filters)
+    if isinstance(filters, _FilterOr):
+        return any(_matches(f, object_id, properties) for f in filters.filters)
+    value = object_id if filters.target == "_id" else properties.get(filters.target)
+    operator = filters.operator
+    if operator == _Operator.IS_NULL:
+        raise ValueError("Nullstate must be indexed to be filterable! Add `indexNullState: true` to the invertedIndexConfig")
+    if operator == _Operator.EQUAL:
+        return value == filters.value
+    if operator == _Operator.NOT_EQUAL:
+        return value != filters.value
+    if operator == _Operator.CONTAINS_ANY:
+        return value in filters.value
+    if operator == _Operator.CONTAINS_NONE:
+        return value not in filters.value
+    if operator == _Operator.GREATER_THAN_EQUAL:
+        return value is not None and value >= filters.value
+    if operator == _Operator.LESS_THAN:
+        return value is not None and value < filters.value
+    raise NotImplementedError(f"FakeWeaviateCollection does not evaluate {operator}")
+
+
+class FakeWeaviateCollection:
+    """In-memory stand-in for a Weaviate v4 collection: fixed_size batches, fetch_objects, update and delete_many."""
+
+    def __init__(self):
+        self.objects = {}  # uuid -> (properties, vector)
+        self.added = []  # (properties, vector) of every add_object call, in order
+        self.batch = SimpleNamespace(fixed_size=lambda batch_size: self, failed_objects=[])
+        self.query = SimpleNamespace(fetch_objects=self._fetch_objects)
+        self.data = SimpleNamespace(delete_many=self._delete_many, update=self._update)
+
+    def client(self):
+        return SimpleNamespace(collections=SimpleNamespace(get=lambda name: self))
+
+    # Used as the batch context manager
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_object(self, properties, uuid=None, vector=None):
+        self.added.append((properties, vector))
+        self.objects[uuid] = (properties, vector)
+
+    def _fetch_objects(self, filters=None, return_properties=None, limit=None, offset=0):
+        if offset + (limit or 0) > QUERY_MAXIMUM_RESULTS:
+            raise ValueError(f"query maximum results exceeded: offset {offset} + limit {limit} > {QUERY_MAXIMUM_RESULTS}")
+        items = [SimpleNamespace(uuid=object_id, properties=properties) for object_id, (properties, _) in self.objects.items() if filters is None or _matches(filters, object_id, properties)]
+        return SimpleNamespace(objects=items[offset : offset + limit])
+
+    def _update(self, uuid, properties):
+        stored_properties, vector = self.objects[uuid]
+        self.objects[uuid] = ({**stored_properties, **properties}, vector)
+
+    def _delete_many(self, where):
+        # Like Weaviate, a single call deletes at most QUERY_MAXIMUM_RESULTS objects
+        matching = [object_id for object_id, (properties, _) in self.objects.items() if _matches(where, object_id, properties)][:QUERY_MAXIMUM_RESULTS]
+        for object_id in matching:
+            del self.objects[object_id]
+        return SimpleNamespace(failed=0, matches=len(matching), objects=None, successful=len(matching))
+
+
+@pytest.fixture(scope="session")
+def lecture_pdf() -> bytes:
+    return build_lecture_pdf()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def isolated_extraction_cache(tmp_path_factory):
+    """Keeps the test run from reading or filling the real extraction cache under data/processed."""
+    from app.config import settings
+    import app.document_handling.extraction_cache as extraction_cache_module
+
+    settings.EXTRACTION_CACHE_DIR = str(tmp_path_factory.mktemp("extraction_cache"))
+    extraction_cache_module._extraction_cache_instance = None
+    yield
+    extraction_cache_module._extraction_cache_instance = None
@@ -33,28 +33,15 @@ class MockRAGSystem:
     def __init__(self):
         self.retriever = MockRetriever()
 
-        # Simplified mock for rag_chain and its steps for the purpose of testing the endpoint
-        # In a real scenario, this mock might need to be more sophisticated
-        # depending on how rag_chain.steps[0] is used in the endpoint.
-        # For the current endpoint code, steps[0] needs an invoke attribute if it exists.
-        # However, the endpoint logic checks `hasattr(rag_system.rag_chain.steps[0], "invoke")`
-        # which means rag_chain or rag_chain.steps might not exist or steps[0] might not have invoke.
-        # We'll simulate a case where it exists and has an invoke for completeness.
-        class MockStep:
-            async def invoke(self, *args, **kwargs):
-                return "Some result from a step"
-
-        class MockChain:
-            def __init__(self):
-                self.steps = [MockStep()]
-
-        self.rag_chain = MockChain()
-
     async def invoke_chain(self, query: str):
         if "error_query" in query:
             raise ValueError("Simulated RAG system error")
         return "This is a mocked answer to your question: " + query
 
+    async def answer_with_sources(self, question: str, metadata=None):
+        documents = await self.retriever.aget_relevant_documents(question)
+        return await self.invoke_chain(question), documents
+
 
 async def get_mock_rag_system_instance():
     return MockRAGSystem()
@@ -0,0 +1,178 @@
+import asyncio
+import io
+import threading
+import time
+
+from app.document_handling.extraction_cache import ExtractionCache
+from app.document_handling.extraction_pool import ExtractionExecutor
+from app.document_handling.extractors import TextExtractor
+from app.document_handling.parsers import DocumentParser
+from app.services.document_service import DocumentProcessingService
+from app.vector_store.weaviate_connector import IndexingResult, chunk_uuids
+from tests.conftest import repeat_pdf
+
+
+class RecordingIndexer:
+    def __init__(self):
+        self.documents = []
+
+    def index_documents(self, documents, progress_callback=None, failed_ids=None):
+        self.documents.extend(documents)
+        if progress_callback:
+            progress_callback(len(documents))
+
+    def index_document_stream(self, documents, progress_callback=None):
+        documents = list(documents)
+        self.index_documents(documents, progress_callback)
+        return IndexingResult(inserted=len(documents), deleted=0, unchanged=0, failed=0)
+
+
+def test_extraction_does_not_block_event_loop(lecture_pdf):
+    pdf_bytes = repeat_pdf(lecture_pdf, copies=25)
+    executor = ExtractionExecutor(max_workers=1)
+    indexer = RecordingIndexer()
+    service = DocumentProcessingService(extraction_executor=executor, document_parser=DocumentParser(), weaviate_indexer=indexer)
+
+    async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+        max_lag = 0.0
+        while not stop.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            max_lag = max(max_lag, time.perf_counter() - started - interval)
+        return max_lag
+
+    async def scenario():
+        stop = asyncio.Event()
+        lag_task = asyncio.create_task(measure_loop_lag(stop))
+        started = time.perf_counter()
+        result = await service.process_and_index_document(pdf_bytes, "lecture.pdf")
+        elapsed = time.perf_counter() - started
+        stop.set()
+        return result, elapsed, await lag_task
+
+    try:
+        (docs_indexed, error), elapsed, max_lag = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+    assert error is None
+    assert docs_indexed == len(indexer.documents) > 0
+    # Extracting 500 pages inline takes far longer than this; in a worker process
+    # the loop keeps ticking at its normal rate.
+    assert max_lag < 0.2, f"event loop stalled for {max_lag:.3f}s during a {elapsed:.3f}s upload"
+
+
+class FixedTextExecutor:
+    text = "Slide text about paging. " * 200
+
+    def iter_text(self, file_source, filename, failed_pages=None):
+        yield self.text
+
+
+def test_chunks_carry_source_and_group():
+    indexer = RecordingIndexer()
+    service = DocumentProcessingService(extraction_executor=FixedTextExecutor(), document_parser=DocumentParser(), weaviate_indexer=indexer)
+    docs_indexed, error = asyncio.run(service.process_and_index_document(b"slides", "slides.pdf", group_id="group123"))
+    assert error is None and docs_indexed == len(indexer.documents) > 1
+    assert all(doc.metadata["source"] == "slides.pdf" and doc.metadata["group_id"] == "group123" for doc in indexer.documents)
+
+
+class ConcurrencyTrackingExecutor:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def iter_text(self, file_source, filename, failed_pages=None):
+        if filename.endswith(".txt"):
+            raise ValueError("Unsupported file type: .txt")
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self._lock:
+            self.in_flight -= 1
+        yield f"Notes from {filename}. " * 100
+
+
+class CountingIndexer(RecordingIndexer):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def index_documents(self, documents, progress_callback=None, failed_ids=None):
+        self.calls += 1
+        super().index_documents(documents, progress_callback)
+
+
+def test_batch_processing_shares_one_indexing_pass():
+    executor = ConcurrencyTrackingExecutor()
+    indexer = CountingIndexer()
+    service = DocumentProcessingService(extraction_executor=executor, document_parser=DocumentParser(), weaviate_indexer=indexer)
+    files = [(f"week{i}".encode(), f"week{i}.pdf") for i in range(6)] + [(b"text", "notes.txt")]
+
+    response = asyncio.run(service.process_and_index_batch(files, group_id="group123", max_concurrency=2))
+
+    assert executor.max_in_flight == 2
+    assert indexer.calls == 1
+    assert {doc.metadata["source"] for doc in indexer.documents} == {f"week{i}.pdf" for i in range(6)}
+    assert [result.status for result in response.files] == ["indexed"] * 6 + ["failed"]
+    assert "Unsupported file type" in response.files[-1].error
+    assert response.document_count == len(indexer.documents)
+    assert all(result.extract_seconds > 0 for result in response.files[:6])
+
+
+class PartlyFailingIndexer(RecordingIndexer):
+    """Fails to insert every chunk of the given sources, like objects rejected by Weaviate."""
+
+    def __init__(self, failing_sources):
+        super().__init__()
+        self.failing_sources = failing_sources
+
+    def index_documents(self, documents, progress_callback=None, failed_ids=None):
+        super().index_documents(documents, progress_callback)
+        failed = [chunk_id for doc, chunk_id in zip(documents, chunk_uuids(documents)) if doc.metadata["source"] in self.failing_sources]
+        failed_ids.extend(failed)
+        return IndexingResult(inserted=len(documents) - len(failed), deleted=0, unchanged=0, failed=len(failed))
+
+
+def test_batch_files_with_failed_chunks_are_reported_failed():
+    indexer = PartlyFailingIndexer(failing_sources={"week2.pdf"})
+    service = DocumentProcessingService(extraction_executor=ConcurrencyTrackingExecutor(), document_parser=DocumentParser(), weaviate_indexer=indexer)
+    files = [(f"week{i}".encode(), f"week{i}.pdf") for i in range(4)]
+
+    response = asyncio.run(service.process_and_index_batch(files))
+    assert [result.status for result in response.files] == ["indexed", "indexed", "failed", "indexed"]
+    assert response.files[2].error.endswith("chunks failed to index.") and response.files[2].document_count == 0
+    assert "3 indexed, 1 failed" in response.message
+
+
+def test_pool_extraction_matches_inline_extraction(lecture_pdf):
+    executor = ExtractionExecutor(max_workers=1)
+    try:
+        pooled = executor.submit(lecture_pdf, "lecture.pdf").result()
+    finally:
+        executor.shutdown()
+    assert pooled == TextExtractor().extract_paged_text(io.BytesIO(lecture_pdf), "lecture.pdf")
+
+
+def test_streamed_upload_indexes_the_same_chunks_as_whole_text_splitting(lecture_pdf, tmp_path):
+    pdf_path = tmp_path / "lecture.pdf"
+    pdf_path.write_bytes(lecture_pdf)
+    parser = DocumentParser()
+    expected = [doc.page_content for doc in parser.split_text_to_documents(TextExtractor().extract_text(io.BytesIO(lecture_pdf), "lecture.pdf"))]
+
+    executor = ExtractionExecutor(max_workers=2, pdf_pages_per_shard=3)
+    cache = ExtractionCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    try:
+        # First upload streams page ranges from the pool (and fills the cache), the second streams from the cache
+        for _ in range(2):
+            indexer = RecordingIndexer()
+            service = DocumentProcessingService(extraction_executor=executor, document_parser=parser, weaviate_indexer=indexer, extraction_cache=cache)
+            docs_indexed, error = asyncio.run(service.process_and_index_document(str(pdf_path), "lecture.pdf"))
+            assert error is None and docs_indexed == len(expected)
+            assert [doc.page_content for doc in indexer.documents] == expected
+            assert indexer.documents[0].metadata["page_number"] == 1 and indexer.documents[-1].metadata["last_page_number"] == 20
+    finally:
+        executor.shutdown()
+    assert cache.stats()["hits"] == 1 and cache.stats()["entries"] == 1
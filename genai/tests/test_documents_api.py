@@ -7,8 +7,12 @@ from app.services.document_service import (
     get_document_processing_service,
 )
 import app.services.document_service as doc_service_module
-from app.models.schemas import DocumentUploadResponse
+from app.models.schemas import BatchFileResult, BatchUploadResponse, DocumentUploadResponse
+import asyncio
 import io
+import os
+import time
+import zipfile
 
 # Reset global states and overrides before defining tests for this module
 app.dependency_overrides.clear()
@@ -17,14 +21,37 @@ doc_service_module._document_processing_service_instance = None
 
 # Mock DocumentProcessingService
 class MockDocumentProcessingService:
-    async def process_and_index_document(self, contents: bytes, filename: str):
+    seen_files = {}  # filename -> (spooled path, its content at processing time)
+    seen_groups = {}  # filename -> group_id
+
+    async def process_and_index_document(self, file_path: str, filename: str, progress_callback=None, group_id=None):
+        with open(file_path, "rb") as f:
+            self.seen_files[filename] = (file_path, f.read())
+        self.seen_groups[filename] = group_id
         # Simulate processing
+        if progress_callback:
+            progress_callback("extracting")
         if "error" in filename:
             return 0, "Simulated processing error"
+        if "crash" in filename:
+            raise RuntimeError("Simulated crash")
         if "success" in filename:
+            if progress_callback:
+                progress_callback("indexing", chunks_total=3, chunks_indexed=3)
             return 3, None  # Simulate 3 documents indexed
         return 1, None  # Default simulation
 
+    seen_batches = []  # (filename -> content, group_id) per batch call
+
+    async def process_and_index_batch(self, files, group_id=None, max_concurrency=4):
+        contents = {}
+        for file_path, filename in files:
+            with open(file_path, "rb") as f:
+                contents[filename] = f.read()
+        self.seen_batches.append((contents, group_id))
+        results = [BatchFileResult(filename=filename, status="indexed", document_count=1) for _, filename in files]
+        return BatchUploadResponse(message=f"Processed {len(results)} files.", files=results, document_count=len(results))
+
 
 async def get_mock_document_processing_service():
     return MockDocumentProcessingService()
@@ -39,7 +66,9 @@ def doc_test_client():
     doc_service_module._document_processing_service_instance = None
     app.dependency_overrides[get_document_processing_service] = get_mock_document_processing_service
 
-    yield TestClient(app)
+    # Entering the client runs the app lifespan, which starts the ingestion workers
+    with TestClient(app) as client:
+        yield client
 
     # Teardown: Restore original state
     if original_override:
@@ -49,6 +78,17 @@ def doc_test_client():
     doc_service_module._document_processing_service_instance = original_singleton_instance
 
 
+def wait_for_job(client: TestClient, document_id: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        response = client.get(f"/api/v1/documents/{document_id}/status")
+        assert response.status_code == 200
+        data = response.json()
+        if data["status_info"]["status"] in ("COMPLETED", "FAILED") or time.monotonic() > deadline:
+            return data
+        time.sleep(0.01)
+
+
 # Update tests to use the client from the fixture
 def test_upload_document_success_pdf(doc_test_client: TestClient):
     file_content = b"dummy pdf content"
@@ -57,13 +97,19 @@ def test_upload_document_success_pdf(doc_test_client: TestClient):
         "/api/v1/documents/upload",
         files={"file": (file_name, io.BytesIO(file_content), "application/pdf")},
     )
-    assert response.status_code == 200
+    assert response.status_code == 202
     data = response.json()
     assert data["filename"] == file_name
-    assert data["message"] == "Document processed and sent for indexing successfully."
-    assert data["document_count"] == 3
+    assert data["message"] == "Document accepted for processing."
+    assert data["document_id"]
     assert data["error"] is None
 
+    status = wait_for_job(doc_test_client, data["document_id"])
+    assert status["filename"] == file_name
+    assert status["status_info"]["status"] == "COMPLETED"
+    assert status["status_info"]["chunks_total"] == 3
+    assert status["status_info"]["chunks_indexed"] == 3
+
 
 def test_upload_document_success_docx(doc_test_client: TestClient):
     file_content = b"dummy docx content"
@@ -78,13 +124,19 @@ def test_upload_document_success_docx(doc_test_client: TestClient):
             )
         },
     )
-    assert response.status_code == 200
+    assert response.status_code == 202
     data = response.json()
     assert data["filename"] == file_name
-    assert data["message"] == "Document processed and sent for indexing successfully."
-    assert data["document_count"] == 3
+    assert data["message"] == "Document accepted for processing."
+    assert data["document_id"]
     assert data["error"] is None
 
+    status = wait_for_job(doc_test_client, data["document_id"])
+    assert status["filename"] == file_name
+    assert status["status_info"]["status"] == "COMPLETED"
+    assert status["status_info"]["chunks_total"] == 3
+    assert status["status_info"]["chunks_indexed"] == 3
+
 
 def test_upload_document_success_pptx(doc_test_client: TestClient):
     file_content = b"dummy pptx content"
@@ -99,13 +151,19 @@ def test_upload_document_success_pptx(doc_test_client: TestClient):
             )
         },
     )
-    assert response.status_code == 200
+    assert response.status_code == 202
     data = response.json()
     assert data["filename"] == file_name
-    assert data["message"] == "Document processed and sent for indexing successfully."
-    assert data["document_count"] == 3
+    assert data["message"] == "Document accepted for processing."
+    assert data["document_id"]
     assert data["error"] is None
 
+    status = wait_for_job(doc_test_client, data["document_id"])
+    assert status["filename"] == file_name
+    assert status["status_info"]["status"] == "COMPLETED"
+    assert status["status_info"]["chunks_total"] == 3
+    assert status["status_info"]["chunks_indexed"] == 3
+
 
 def test_upload_document_unsupported_type(doc_test_client: TestClient):
     file_content = b"dummy text content"
@@ -138,12 +196,184 @@ def test_upload_document_processing_error(doc_test_client: TestClient):
         "/api/v1/documents/upload",
         files={"file": (file_name, io.BytesIO(file_content), "application/pdf")},
     )
-    assert response.status_code == 200
+    assert response.status_code == 202
     data = response.json()
     assert data["filename"] == file_name
-    assert data["message"] == "Failed to process document."
-    assert data["error"] == "Simulated processing error"
-    assert data.get("document_count") is None or data.get("document_count") == 0
+
+    status = wait_for_job(doc_test_client, data["document_id"])
+    assert status["status_info"]["status"] == "FAILED"
+    assert status["status_info"]["message"] == "Simulated processing error"
+    assert status["status_info"]["chunks_total"] is None
+
+
+def test_upload_document_processing_crash(doc_test_client: TestClient):
+    response = doc_test_client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("crash_test.pdf", io.BytesIO(b"dummy pdf content"), "application/pdf")},
+    )
+    assert response.status_code == 202
+
+    status = wait_for_job(doc_test_client, response.json()["document_id"])
+    assert status["status_info"]["status"] == "FAILED"
+    assert status["status_info"]["message"] == "An unexpected error occurred while processing crash_test.pdf."
+
+
+def test_document_status_unknown_id(doc_test_client: TestClient):
+    response = doc_test_client.get("/api/v1/documents/does-not-exist/status")
+    assert response.status_code == 404
+
+
+def test_upload_document_queue_full(doc_test_client: TestClient, monkeypatch, tmp_path):
+    from app.config import settings
+
+    from app.services.ingestion_jobs import IngestionQueueFullError, get_ingestion_job_queue
+
+    def reject(*args, **kwargs):
+        raise IngestionQueueFullError("Ingestion queue is full (32 documents pending). Please retry later.")
+
+    monkeypatch.setattr(get_ingestion_job_queue(), "submit", reject)
+    monkeypatch.setattr(settings, "UPLOAD_SPOOL_DIR", str(tmp_path))
+    response = doc_test_client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("success_test.pdf", io.BytesIO(b"dummy pdf content"), "application/pdf")},
+    )
+    assert response.status_code == 503
+    assert "Ingestion queue is full" in response.json()["detail"]
+    assert list(tmp_path.iterdir()) == []  # The rejected upload's spool file is removed
+
+
+def test_ingestion_job_queue_is_bounded(tmp_path):
+    from app.services.ingestion_jobs import IngestionJobQueue, IngestionQueueFullError
+
+    class BlockingService:
+        def __init__(self):
+            self.release = asyncio.Event()
+
+        async def process_and_index_document(self, file_path, filename, progress_callback=None, group_id=None):
+            await self.release.wait()
+            return 1, None
+
+    async def scenario():
+        job_queue = IngestionJobQueue(max_size=1, worker_count=1, job_retention=10)
+        service = BlockingService()
+        paths = []
+        for name in ("a", "b", "c"):
+            path = tmp_path / f"{name}.pdf"
+            path.write_bytes(name.encode())
+            paths.append(str(path))
+        running = job_queue.submit(paths[0], "a.pdf", service)
+        await asyncio.sleep(0)  # Let the worker pick up the first job
+        queued = job_queue.submit(paths[1], "b.pdf", service)
+        with pytest.raises(IngestionQueueFullError):
+            job_queue.submit(paths[2], "c.pdf", service)
+        assert running.status.value == "PROCESSING"
+        assert queued.status.value == "PENDING"
+
+        service.release.set()
+        while not queued.is_finished:
+            await asyncio.sleep(0.01)
+        await job_queue.stop()
+        return running, queued
+
+    running, queued = asyncio.run(scenario())
+    assert running.status.value == "COMPLETED"
+    assert queued.status.value == "COMPLETED"
+    # Finished jobs delete their spooled uploads
+    assert running.file_path is None
+    assert not (tmp_path / "a.pdf").exists()
+    assert not (tmp_path / "b.pdf").exists()
+
+
+def test_upload_is_spooled_to_disk_and_removed(doc_test_client: TestClient):
+    file_content = b"%PDF-1.4 spooled content" * 1000
+    file_name = "success_spooled.pdf"
+    response = doc_test_client.post(
+        "/api/v1/documents/upload",
+        files={"file": (file_name, io.BytesIO(file_content), "application/pdf")},
+    )
+    assert response.status_code == 202
+    assert wait_for_job(doc_test_client, response.json()["document_id"])["status_info"]["status"] == "COMPLETED"
+
+    spooled_path, seen_content = MockDocumentProcessingService.seen_files[file_name]
+    assert spooled_path.endswith(".pdf")
+    assert seen_content == file_content
+    assert not os.path.exists(spooled_path)
+
+
+def test_upload_document_passes_group_id(doc_test_client: TestClient):
+    response = doc_test_client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("success_group.pdf", io.BytesIO(b"dummy pdf content"), "application/pdf")},
+        data={"group_id": "group123"},
+    )
+    assert response.status_code == 202
+    wait_for_job(doc_test_client, response.json()["document_id"])
+    assert MockDocumentProcessingService.seen_groups["success_group.pdf"] == "group123"
+
+
+def test_upload_document_too_large(doc_test_client: TestClient, monkeypatch, tmp_path):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE_BYTES", 1024)
+    monkeypatch.setattr(settings, "UPLOAD_SPOOL_DIR", str(tmp_path))
+    response = doc_test_client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("success_big.pdf", io.BytesIO(b"x" * 4096), "application/pdf")},
+    )
+    assert response.status_code == 413
+    assert "maximum upload size" in response.json()["detail"]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_batch_upload_of_multiple_files(doc_test_client: TestClient):
+    response = doc_test_client.post(
+        "/api/v1/documents/upload/batch",
+        files=[
+            ("files", ("week1.pdf", io.BytesIO(b"pdf one"), "application/pdf")),
+            ("files", ("week2.pptx", io.BytesIO(b"pptx two"), "application/vnd.openxmlformats-officedocument.presentationml.presentation")),
+        ],
+        data={"group_id": "group123"},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [result["filename"] for result in data["files"]] == ["week1.pdf", "week2.pptx"]
+    assert data["document_count"] == 2
+    assert MockDocumentProcessingService.seen_batches[-1] == ({"week1.pdf": b"pdf one", "week2.pptx": b"pptx two"}, "group123")
+
+
+def test_batch_upload_of_zip_archive(doc_test_client: TestClient):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("week1/slides.pdf", b"pdf one")
+        zf.writestr("week2/notes.docx", b"docx two")
+        zf.writestr("readme.txt", b"ignored")
+    archive.seek(0)
+    response = doc_test_client.post("/api/v1/documents/upload/batch", files={"files": ("course.zip", archive, "application/zip")})
+    assert response.status_code == 200
+    assert MockDocumentProcessingService.seen_batches[-1] == ({"week1/slides.pdf": b"pdf one", "week2/notes.docx": b"docx two"}, None)
+
+
+def test_batch_upload_rejects_invalid_archive_and_too_many_files(doc_test_client: TestClient, monkeypatch):
+    response = doc_test_client.post("/api/v1/documents/upload/batch", files={"files": ("course.zip", io.BytesIO(b"not a zip"), "application/zip")})
+    assert response.status_code == 400
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("readme.txt", b"ignored")
+    archive.seek(0)
+    response = doc_test_client.post("/api/v1/documents/upload/batch", files={"files": ("course.zip", archive, "application/zip")})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "The archive contains no PDF, DOCX, PPTX, PNG or JPG files."
+
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "BATCH_UPLOAD_MAX_FILES", 1)
+    response = doc_test_client.post(
+        "/api/v1/documents/upload/batch",
+        files=[("files", (f"week{i}.pdf", io.BytesIO(b"pdf"), "application/pdf")) for i in range(2)],
+    )
+    assert response.status_code == 400
+    assert "Too many files" in response.json()["detail"]
 
 
 # Removed old module-level client, singleton resets at top of file, and teardown_module
@@ -0,0 +1,164 @@
+import asyncio
+
+from langchain_core.documents import Document as LangchainDocument
+from langchain_core.embeddings import Embeddings
+
+from app.core import embedding_cache
+from app.core.embedding_cache import CachedEmbeddings, EmbeddingCacheStore, QueryEmbeddingCache
+from app.vector_store.weaviate_connector import WeaviateIndexer
+from tests.conftest import FakeWeaviateCollection
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic fake embedding model that records every text sent to it."""
+
+    def __init__(self):
+        self.embedded_texts = []
+
+    def _vector(self, text: str):
+        return [len(text) / 3.0, text.count("e") / 7.0, 0.1]
+
+    def embed_documents(self, texts):
+        self.embedded_texts.extend(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.embedded_texts.append(text)
+        return self._vector(text)
+
+
+def make_cached(tmp_path, max_entries=100, model_name="text-embedding-3-small", dimensions=None):
+    underlying = CountingEmbeddings()
+    store = EmbeddingCacheStore(str(tmp_path / "embeddings.sqlite3"), max_entries=max_entries)
+    return CachedEmbeddings(underlying, store, model_name=model_name, dimensions=dimensions), underlying
+
+
+def test_repeated_texts_cost_no_api_calls(tmp_path):
+    cached, underlying = make_cached(tmp_path)
+    chunks = ["semaphores", "monitors", "semaphores", "deadlocks"]
+    first = cached.embed_documents(chunks)
+    assert underlying.embedded_texts == ["semaphores", "monitors", "deadlocks"]
+
+    assert cached.embed_documents(chunks) == first
+    assert cached.embed_query("monitors") == first[1]
+    assert len(underlying.embedded_texts) == 3
+    assert cached.stats()["hits"] == 5
+
+
+def test_cache_persists_and_is_keyed_by_model_and_dimensions(tmp_path):
+    cached, _ = make_cached(tmp_path)
+    vector = cached.embed_query("What is a semaphore?")
+    cached.store.close()
+
+    reopened, underlying = make_cached(tmp_path)
+    assert reopened.embed_query("What is a semaphore?") == vector
+    assert underlying.embedded_texts == []
+
+    other_dimensions, underlying = make_cached(tmp_path, dimensions=256)
+    other_dimensions.embed_query("What is a semaphore?")
+    other_model, underlying_other_model = make_cached(tmp_path, model_name="text-embedding-3-large")
+    other_model.embed_query("What is a semaphore?")
+    assert underlying.embedded_texts == ["What is a semaphore?"]
+    assert underlying_other_model.embedded_texts == ["What is a semaphore?"]
+
+
+def test_vectors_are_stored_as_float32(tmp_path):
+    cached, _ = make_cached(tmp_path)
+    cached.embed_query("abc")
+    (blob,) = cached.store._conn.execute("SELECT vector FROM embeddings").fetchone()
+    assert len(blob) == 3 * 4
+
+
+def test_least_recently_used_vectors_are_evicted(tmp_path):
+    cached, underlying = make_cached(tmp_path, max_entries=2)
+    cached.embed_documents(["a"])
+    cached.embed_documents(["b"])
+    cached.embed_query("a")  # "b" is now the least recently used
+    cached.embed_documents(["c"])
+    assert len(cached.store) == 2
+
+    underlying.embedded_texts.clear()
+    cached.embed_documents(["a", "c"])
+    assert underlying.embedded_texts == []
+    cached.embed_query("b")
+    assert underlying.embedded_texts == ["b"]
+
+
+def test_reindexing_uses_cached_chunk_vectors(tmp_path):
+    cached, underlying = make_cached(tmp_path)
+    documents = [LangchainDocument(page_content=f"chunk {i}", metadata={"source": "slides.pdf", "chunk_index": i}) for i in range(5)]
+
+    first_index = FakeWeaviateCollection()
+    WeaviateIndexer(first_index.client(), "TestIndex", batch_size=2, embedding_model=cached).index_documents(documents)
+    assert len(underlying.embedded_texts) == 5
+
+    # Indexing the same chunks into another (e.g. rebuilt) index costs no API call
+    second_index = FakeWeaviateCollection()
+    WeaviateIndexer(second_index.client(), "TestIndex", batch_size=2, embedding_model=cached).index_documents(documents)
+    assert len(underlying.embedded_texts) == 5
+    assert [vector for _, vector in second_index.added] == [vector for _, vector in first_index.added]
+    assert all(vector is not None for _, vector in second_index.added)
+    assert second_index.added[3][0] == {"text": "chunk 3", "source": "slides.pdf", "chunk_index": 3}
+
+
+def test_async_query_embeddings_share_the_cache(tmp_path):
+    cached, underlying = make_cached(tmp_path)
+    first = asyncio.run(cached.aembed_query("page replacement"))
+    assert asyncio.run(cached.aembed_query("page replacement")) == first == cached.embed_query("page replacement")
+    assert underlying.embedded_texts == ["page replacement"]
+    assert (cached.hits, cached.misses) == (2, 1)
+
+
+def test_query_cache_is_keyed_on_normalized_text():
+    underlying = CountingEmbeddings()
+    cache = QueryEmbeddingCache(underlying, model_name="text-embedding-3-small")
+    vector = cache.embed_query("What is a  semaphore?")
+    assert cache.embed_query("  what is a SEMAPHORE? ") == vector
+    assert asyncio.run(cache.aembed_query("What is a semaphore?")) == vector
+    assert underlying.embedded_texts == ["What is a  semaphore?"]
+    assert cache.embed_documents(["What is a semaphore?"]) and len(underlying.embedded_texts) == 2  # Documents pass through
+
+    other_model = QueryEmbeddingCache(underlying, model_name="text-embedding-3-large")
+    other_model.embed_query("What is a semaphore?")
+    assert len(underlying.embedded_texts) == 3
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_query_cache_is_bounded_in_bytes_and_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "monotonic", lambda: now[0])
+    underlying = CountingEmbeddings()
+    entry_bytes = 3 * 4 + len("q0")
+    cache = QueryEmbeddingCache(underlying, model_name="m", max_bytes=2 * entry_bytes, ttl_seconds=60)
+    cache.embed_query("q0")
+    cache.embed_query("q1")
+    cache.embed_query("q0")  # "q1" is now the least recently used
+    cache.embed_query("q2")
+    assert cache.stats()["evictions"] == 1 and cache.stats()["bytes"] == 2 * entry_bytes
+    underlying.embedded_texts.clear()
+    cache.embed_query("q0")
+    cache.embed_query("q1")
+    assert underlying.embedded_texts == ["q1"]
+
+    now[0] += 61
+    cache.embed_query("q1")
+    assert underlying.embedded_texts == ["q1", "q1"]
+    assert cache.stats()["expirations"] == 1
+
+
+def test_concurrent_async_misses_share_one_api_call():
+    class SlowAsyncEmbeddings(CountingEmbeddings):
+        async def aembed_query(self, text):
+            await asyncio.sleep(0.05)
+            return self.embed_query(text)
+
+    underlying = SlowAsyncEmbeddings()
+    cache = QueryEmbeddingCache(underlying, model_name="m")
+
+    async def scenario():
+        return await asyncio.gather(*(cache.aembed_query("what is a semaphore") for _ in range(8)))
+
+    vectors = asyncio.run(scenario())
+    assert underlying.embedded_texts == ["what is a semaphore"]
+    assert all(vector == vectors[0] for vector in vectors)
+    assert cache.stats()["coalesced"] == 7
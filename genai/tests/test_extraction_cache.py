@@ -0,0 +1,106 @@
+import asyncio
+import os
+
+from app.document_handling.extraction_cache import ExtractionCache
+from app.document_handling.parsers import DocumentParser
+from app.services.document_service import DocumentProcessingService
+from tests.test_document_service import RecordingIndexer
+
+
+class CountingExecutor:
+    def __init__(self, text: str = "Extracted lecture text about semaphores and monitors."):
+        self.text = text
+        self.calls = 0
+
+    def iter_text(self, file_source, filename, failed_pages=None):
+        self.calls += 1
+        yield self.text
+
+
+def test_reupload_skips_extraction(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    executor = CountingExecutor()
+    service = DocumentProcessingService(extraction_executor=executor, document_parser=DocumentParser(), weaviate_indexer=RecordingIndexer(), extraction_cache=cache)
+    upload = tmp_path / "slides.pdf"
+    upload.write_bytes(b"%PDF-1.4 the same slides")
+
+    for group_filename in ("slides.pdf", "slides-group-b.pdf", "slides-group-c.pdf"):
+        docs_indexed, error = asyncio.run(service.process_and_index_document(str(upload), group_filename))
+        assert error is None and docs_indexed == 1
+
+    assert executor.calls == 1
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+    # The same bytes handed over in memory map to the same entry
+    assert cache.compute_key(upload.read_bytes()) == cache.compute_key(str(upload))
+
+
+def test_key_includes_extractor_version(tmp_path):
+    old = ExtractionCache(str(tmp_path), max_bytes=1024, extractor_version="1")
+    new = ExtractionCache(str(tmp_path), max_bytes=1024, extractor_version="2")
+    old.put(old.compute_key(b"doc"), "old output")
+    assert new.get(new.compute_key(b"doc")) is None
+    assert old.get(old.compute_key(b"doc")) == "old output"
+
+
+def test_evicts_least_recently_used_by_size(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_bytes=250)
+    for key in ("a", "b", "c"):
+        cache.put(key, key * 100)
+    # Only two 100-byte entries fit; "a" was the least recently used
+    assert cache.get("a") is None
+    assert cache.get("b") == "b" * 100  # "b" is now more recent than "c"
+    cache.put("d", "d" * 100)
+    assert cache.get("c") is None
+    assert cache.get("b") is not None and cache.get("d") is not None
+    assert cache.stats()["evictions"] == 2
+    assert cache.stats()["size_bytes"] == 200
+    assert sorted(os.listdir(tmp_path)) == ["b.txt", "d.txt"]
+
+
+def test_entries_survive_restart(tmp_path):
+    ExtractionCache(str(tmp_path), max_bytes=1024).put("key", "persisted text")
+    reopened = ExtractionCache(str(tmp_path), max_bytes=1024)
+    assert reopened.get("key") == "persisted text"
+    assert reopened.stats()["entries"] == 1
+
+
+def test_failed_extractions_are_not_cached(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_bytes=1024)
+    executor = CountingExecutor(text="")
+    service = DocumentProcessingService(extraction_executor=executor, document_parser=DocumentParser(), weaviate_indexer=RecordingIndexer(), extraction_cache=cache)
+    for _ in range(2):
+        _, error = asyncio.run(service.process_and_index_document(b"empty", "empty.pdf"))
+        assert error == "No text could be extracted from the document."
+    assert executor.calls == 2
+    assert cache.stats()["entries"] == 0
+
+
+class PageFailingExecutor(CountingExecutor):
+    def iter_text(self, file_source, filename, failed_pages=None):
+        failed_pages.append(3)
+        yield from super().iter_text(file_source, filename)
+
+
+def test_extractions_with_failed_pages_are_reported_and_not_cached(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_bytes=1024)
+    executor = PageFailingExecutor()
+    service = DocumentProcessingService(extraction_executor=executor, document_parser=DocumentParser(), weaviate_indexer=RecordingIndexer(), extraction_cache=cache)
+    reported = {}
+    for _ in range(2):
+        _, error = asyncio.run(service.process_and_index_document(b"scan", "scan.pdf", progress_callback=lambda stage, **counters: reported.update(counters)))
+        assert error is None
+    assert reported["failed_pages"] == [4]  # Page numbers count from 1
+    assert executor.calls == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_batch_extractions_with_failed_pages_are_reported_and_not_cached(tmp_path):
+    cache = ExtractionCache(str(tmp_path), max_bytes=1024)
+    executor = PageFailingExecutor()
+    service = DocumentProcessingService(extraction_executor=executor, document_parser=DocumentParser(), weaviate_indexer=RecordingIndexer(), extraction_cache=cache)
+    for _ in range(2):
+        response = asyncio.run(service.process_and_index_batch([(b"scan", "scan.pdf")]))
+        assert [(result.status, result.failed_pages) for result in response.files] == [("indexed", [4])]
+    assert executor.calls == 2
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,415 @@
+import asyncio
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz
+import pytest
+
+from app.document_handling import extraction_pool, ooxml
+from app.document_handling.extraction_pool import ExtractionExecutor
+from app.document_handling.extractors import HEADER_FOOTER_WINDOW_PAGES, PAGE_BREAK, TextExtractor, _extract_pdf_shard, _HeaderFooterIndex, iter_paged_text
+from app.document_handling.text_normalization import normalize_text
+from scripts.bench_header_footer import PAGE_HEIGHT, build_slide_deck_blocks, legacy_common_hf_texts
+from scripts.bench_office_extraction import build_docx, build_pptx, legacy_docx_text, legacy_pptx_text
+from scripts.bench_scanned_pdf import SimulatedRecognizer, build_mixed_pdf, build_scan_image
+
+
+@pytest.fixture(scope="module")
+def page_pool():
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as pool:
+        yield pool
+
+
+def test_pdf_extraction_drops_headers_and_page_numbers(lecture_pdf):
+    text = TextExtractor().extract_text(io.BytesIO(lecture_pdf), "lecture.pdf")
+    assert "Paragraph 0 on page 0" in text
+    assert "Operating Systems - Lecture Notes" not in text
+    assert "\n20\n" not in text and not text.endswith("20")
+
+
+def test_paged_text_marks_every_page(lecture_pdf):
+    paged = TextExtractor().extract_paged_text(io.BytesIO(lecture_pdf), "lecture.pdf")
+    assert paged.replace(PAGE_BREAK, "") == TextExtractor().extract_text(io.BytesIO(lecture_pdf), "lecture.pdf")
+    pages = paged.split(PAGE_BREAK)
+    assert pages[0] == "" and len(pages) == 21
+    for page_idx, page in enumerate(pages[1:]):
+        assert page.startswith(f"Paragraph 0 on page {page_idx}:")
+        assert page.endswith("\n\n") == (page_idx < 19)
+
+
+def test_paged_text_post_processes_pages_like_the_joined_text():
+    # Pages without text still get a page break
+    page_texts = [(0, "Intro-\nduction"), (2, "1. first\nitem"), (3, "wrapped line\nof text.")]
+    paged = "".join(iter_paged_text(page_texts, num_pages=5))
+    assert paged == "\fIntroduction\n\n\f\f1. first\nitem\n\n\fwrapped line of text.\f"
+    assert paged.replace(PAGE_BREAK, "") == normalize_text("\n\n".join(text for _, text in page_texts))
+
+
+@pytest.mark.parametrize("pages_per_shard", [1, 7, 19])
+def test_page_parallel_pdf_extraction_matches_serial(lecture_pdf, page_pool, pages_per_shard):
+    serial = TextExtractor()._extract_pdf_pymupdf(lecture_pdf)
+    sharded = TextExtractor(page_executor=page_pool, pages_per_shard=pages_per_shard)._extract_pdf_pymupdf(lecture_pdf)
+    assert sharded.encode("utf-8") == serial.encode("utf-8")
+
+
+def test_extraction_executor_shards_long_pdfs(lecture_pdf):
+    executor = ExtractionExecutor(max_workers=2, pdf_pages_per_shard=5)
+    try:
+        sharded = asyncio.run(executor.extract_text(lecture_pdf, "lecture.pdf"))
+    finally:
+        executor.shutdown()
+    assert sharded == TextExtractor().extract_paged_text(io.BytesIO(lecture_pdf), "lecture.pdf")
+
+
+def test_extraction_from_file_path_matches_stream(lecture_pdf, tmp_path):
+    pdf_path = tmp_path / "lecture.pdf"
+    pdf_path.write_bytes(lecture_pdf)
+    expected = TextExtractor().extract_paged_text(io.BytesIO(lecture_pdf), "lecture.pdf")
+    assert TextExtractor().extract_paged_text(str(pdf_path), "lecture.pdf") == expected
+
+    executor = ExtractionExecutor(max_workers=2, pdf_pages_per_shard=5)
+    try:
+        # Shards open the spooled file themselves instead of receiving its bytes
+        assert asyncio.run(executor.extract_text(str(pdf_path), "lecture.pdf")) == expected
+    finally:
+        executor.shutdown()
+
+
+class PageSpy:
+    """Wraps a fitz.Page, counting get_text calls per mode and optionally corrupting block text."""
+
+    def __init__(self, page, corrupt_block_text: bool = False):
+        self._page = page
+        self.corrupt_block_text = corrupt_block_text
+        self.calls = {}
+
+    def __getattr__(self, name):
+        return getattr(self._page, name)
+
+    def get_text(self, mode="text", **kwargs):
+        self.calls[mode] = self.calls.get(mode, 0) + 1
+        result = self._page.get_text(mode, **kwargs)
+        if mode == "blocks" and self.corrupt_block_text:
+            result = [block[:4] + (block[4].replace("e", "\ufffd"),) + block[5:] for block in result]
+        return result
+
+
+def test_clean_pages_skip_rawdict(lecture_pdf):
+    with fitz.open(stream=lecture_pdf, filetype="pdf") as doc:
+        page = PageSpy(doc[0])
+        blocks = TextExtractor()._extract_pdf_page_blocks(page, 0)
+    assert page.calls == {"blocks": 1}
+    assert blocks[1][1] == "Paragraph 0 on page 0: processes share memory through semaphores and\nmonitors, which the scheduler has to take into account."
+
+
+def test_damaged_blocks_are_recovered_with_one_rawdict_pass(lecture_pdf):
+    with fitz.open(stream=lecture_pdf, filetype="pdf") as doc:
+        clean_blocks = TextExtractor()._extract_pdf_page_blocks(doc[0], 0)
+        page = PageSpy(doc[0], corrupt_block_text=True)
+        recovered_blocks = TextExtractor()._extract_pdf_page_blocks(page, 0)
+    assert page.calls == {"blocks": 1, "rawdict": 1}
+    assert recovered_blocks == clean_blocks
+
+
+class FailingRecognizer(SimulatedRecognizer):
+    def recognize_batch(self, images):
+        raise RuntimeError("no model")
+
+
+def test_only_scanned_pdf_pages_are_ocred():
+    mixed_pdf = build_mixed_pdf(num_pages=10, scan_every=4, scan_lines=3)  # Pages 3 and 7 are scans
+    recognizer = SimulatedRecognizer(batch_seconds=0)
+    pages = TextExtractor(text_recognizer=recognizer, pdf_ocr_dpi=100).extract_paged_text(io.BytesIO(mixed_pdf), "notes.pdf").split(PAGE_BREAK)[1:]
+    text_only_pages = TextExtractor(pdf_ocr_dpi=0).extract_paged_text(io.BytesIO(mixed_pdf), "notes.pdf").split(PAGE_BREAK)[1:]
+
+    assert recognizer.images == 6
+    for page_idx in (3, 7):
+        assert text_only_pages[page_idx] == ""
+        assert pages[page_idx].startswith("line ") and pages[page_idx].count("line ") == 3
+    assert [page for i, page in enumerate(pages) if i not in (3, 7)] == [page for i, page in enumerate(text_only_pages) if i not in (3, 7)]
+
+
+def test_scanned_pages_of_worker_extractions_are_recognized_in_this_process():
+    mixed_pdf = build_mixed_pdf(num_pages=10, scan_every=4, scan_lines=3)
+    expected = TextExtractor(text_recognizer=SimulatedRecognizer(batch_seconds=0)).extract_paged_text(io.BytesIO(mixed_pdf), "notes.pdf")
+    recognizer = SimulatedRecognizer(batch_seconds=0)
+    executor = ExtractionExecutor(max_workers=2, pdf_pages_per_shard=4)
+    executor._ocr_text_extractor.text_recognizer = recognizer
+    failed_pages = []
+    try:
+        assert "".join(executor.iter_text(mixed_pdf, "notes.pdf", failed_pages)) == expected
+    finally:
+        executor.shutdown()
+    assert recognizer.images == 6  # The workers only rendered the lines
+    assert failed_pages == []
+
+
+def test_failed_ocr_leaves_the_scanned_page_empty():
+    mixed_pdf = build_mixed_pdf(num_pages=4, scan_every=2, scan_lines=2)
+    pages = TextExtractor(text_recognizer=FailingRecognizer(batch_seconds=0), pdf_ocr_dpi=100).extract_paged_text(io.BytesIO(mixed_pdf), "notes.pdf").split(PAGE_BREAK)[1:]
+    assert [bool(page) for page in pages] == [True, False, True, False]
+
+
+def test_failed_ocr_marks_the_scanned_page_failed():
+    mixed_pdf = build_mixed_pdf(num_pages=4, scan_every=2, scan_lines=2)
+    failed_pages = []
+    TextExtractor(text_recognizer=FailingRecognizer(batch_seconds=0), pdf_ocr_dpi=100).extract_pdf_page_range(io.BytesIO(mixed_pdf), 0, 4, failed_pages)
+    assert failed_pages == [1, 3]
+
+
+class UnavailableRecognizer(SimulatedRecognizer):
+    def is_available(self):
+        return False
+
+    def submit(self, image):
+        raise AssertionError("scanned pages must not be rendered and queued without an OCR model")
+
+
+def test_scanned_pages_are_marked_failed_without_an_ocr_model():
+    mixed_pdf = build_mixed_pdf(num_pages=4, scan_every=2, scan_lines=2)
+    failed_pages = []
+    blocks = TextExtractor(text_recognizer=UnavailableRecognizer(batch_seconds=0), pdf_ocr_dpi=100).extract_pdf_page_range(io.BytesIO(mixed_pdf), 0, 4, failed_pages)
+    assert failed_pages == [1, 3]
+    assert {block[0] for block in blocks} == {0, 2}
+
+
+def test_text_pages_with_figures_are_not_ocred(lecture_pdf):
+    scan_png = io.BytesIO()
+    build_scan_image(num_lines=2).save(scan_png, format="PNG")
+    with fitz.open(stream=lecture_pdf, filetype="pdf") as doc:
+        doc[0].insert_image(doc[0].rect, stream=scan_png.getvalue())  # A full-page figure behind the text
+        extractor = TextExtractor(text_recognizer=FailingRecognizer(batch_seconds=0), pdf_ocr_dpi=100)
+        assert not extractor._pdf_page_needs_ocr(doc[0], extractor._extract_pdf_page_blocks(doc[0], 0))
+
+
+def fail_on_page(monkeypatch, failing_page: int, failure):
+    extract_page_blocks = TextExtractor._extract_pdf_page_blocks
+
+    def extract_or_fail(self, page, page_idx):
+        if page_idx == failing_page:
+            failure()
+        return extract_page_blocks(self, page, page_idx)
+
+    monkeypatch.setattr(TextExtractor, "_extract_pdf_page_blocks", extract_or_fail)
+
+
+def raise_malformed_page():
+    raise RuntimeError("malformed content stream")
+
+
+def test_a_failing_page_alone_falls_back_to_pypdf2(lecture_pdf, monkeypatch):
+    clean_blocks = TextExtractor().extract_pdf_page_range(lecture_pdf, 0, 20)
+    fail_on_page(monkeypatch, 3, raise_malformed_page)
+    failed_pages = []
+    blocks = TextExtractor().extract_pdf_page_range(lecture_pdf, 0, 20, failed_pages)
+
+    assert failed_pages == [3]
+    assert [block for block in blocks if block[0] != 3] == [block for block in clean_blocks if block[0] != 3]
+    (fallback_block,) = [block for block in blocks if block[0] == 3]
+    assert "Paragraph 0 on page 3" in fallback_block[1] and "Paragraph 11 on page 3" in fallback_block[1]
+    assert "Paragraph 0 on page 3" in TextExtractor().extract_paged_text(io.BytesIO(lecture_pdf), "lecture.pdf").split(PAGE_BREAK)[4]
+
+
+def test_a_slow_page_is_cut_off_at_its_time_budget(lecture_pdf, monkeypatch):
+    fail_on_page(monkeypatch, 2, lambda: time.sleep(10))
+    failed_pages = []
+    started = time.perf_counter()
+    blocks = TextExtractor(page_timeout=0.2).extract_pdf_page_range(lecture_pdf, 0, 5, failed_pages)
+    assert time.perf_counter() - started < 3
+    assert failed_pages == [2]
+    assert sorted({block[0] for block in blocks}) == [0, 1, 2, 3, 4]
+
+
+def crash_on_page_5(source, start, stop, collect_scanned_lines):
+    """A page-range task whose worker process dies on page 5, like one stuck past its hard time budget."""
+    if start <= 5 < stop:
+        os._exit(1)
+    return _extract_pdf_shard(source, start, stop, collect_scanned_lines)
+
+
+def test_pages_lost_with_a_dead_worker_are_retried_in_the_sandbox(lecture_pdf, monkeypatch):
+    monkeypatch.setattr(extraction_pool, "_extract_pdf_shard", crash_on_page_5)
+    expected_pages = TextExtractor().extract_paged_text(io.BytesIO(lecture_pdf), "lecture.pdf").split(PAGE_BREAK)
+    executor = ExtractionExecutor(max_workers=2, pdf_pages_per_shard=4)
+    failed_pages = []
+    try:
+        pages = "".join(executor.iter_text(lecture_pdf, "lecture.pdf", failed_pages)).split(PAGE_BREAK)
+        assert executor.submit(lecture_pdf, "lecture.pdf").result() == PAGE_BREAK.join(expected_pages)  # The pool was replaced
+    finally:
+        executor.shutdown()
+
+    assert failed_pages == [5]
+    assert pages[6] == ""
+    assert pages[:6] + pages[7:] == expected_pages[:6] + expected_pages[7:]
+
+
+def test_a_worker_death_does_not_fail_later_documents(lecture_pdf):
+    expected = TextExtractor().extract_paged_text(io.BytesIO(lecture_pdf), "lecture.pdf")
+    executor = ExtractionExecutor(max_workers=1)
+    try:
+        _, future = executor._submit_to_pool(os._exit, 1)  # Like the hang watchdog or the memory cap
+        with pytest.raises(BrokenProcessPool):
+            future.result()
+        assert executor.submit(lecture_pdf, "lecture.pdf").result() == expected
+    finally:
+        executor.shutdown()
+
+
+def test_a_worker_death_only_discards_its_own_pool(lecture_pdf):
+    expected = TextExtractor().extract_paged_text(io.BytesIO(lecture_pdf), "lecture.pdf")
+    executor = ExtractionExecutor(max_workers=1)
+    try:
+        broken_pool, crashed = executor._submit_to_pool(os._exit, 1)
+        with pytest.raises(BrokenProcessPool):
+            crashed.result()
+        # Another upload replaces the pool before the crashed one is handled
+        later = executor.submit(lecture_pdf, "lecture.pdf")
+        image_pool = executor._get_image_pool()
+        with pytest.raises(BrokenProcessPool):
+            executor._document_result(broken_pool, crashed, "crashed.pdf")
+        assert later.result() == expected
+        assert executor._pool is not None and executor._pool is not broken_pool
+        assert executor._image_pool is image_pool
+    finally:
+        executor.shutdown()
+
+
+def test_header_footer_index_matches_previous_detection():
+    blocks = build_slide_deck_blocks(num_pages=60, boilerplate_blocks=10)
+    blocks.append((3, "Footer element 1", 400.0, 410.0, PAGE_HEIGHT))  # Same text outside the zone stays in the page text
+    expected = legacy_common_hf_texts(blocks, 60)
+    assert "Operating Systems - Winter Term" in expected and "Footer element 0" not in expected
+
+    # Built incrementally, page by page, as during extraction
+    index = _HeaderFooterIndex()
+    for page_idx in range(60):
+        index.add_blocks([block for block in blocks if block[0] == page_idx])
+    assert index.common_texts(60) == expected
+
+    # Removing pages undoes adding them
+    for page_idx in range(30):
+        index.remove_blocks([block for block in blocks if block[0] == page_idx])
+    assert index.common_texts(30) == legacy_common_hf_texts([block for block in blocks if block[0] >= 30], 30)
+
+    text = TextExtractor()._assemble_pdf_text(blocks, 60)
+    assert "Operating Systems - Winter Term" not in text and "Footer element 1" in text
+
+
+def legacy_page_texts(blocks, num_pages):
+    """(page_idx, text) of every page with text, with headers/footers detected over the whole document."""
+    common_hf_texts = legacy_common_hf_texts(blocks, num_pages)
+    extractor = TextExtractor()
+    texts_by_page = {}
+    for block in blocks:
+        if extractor._keep_pdf_block(block, common_hf_texts):
+            texts_by_page.setdefault(block[0], []).append(block[1])
+    return [(page_idx, "\n".join(texts)) for page_idx, texts in sorted(texts_by_page.items())]
+
+
+def blocks_by_page(blocks, num_pages):
+    pages = [[] for _ in range(num_pages)]
+    for block in blocks:
+        pages[block[0]].append(block)
+    return pages
+
+
+@pytest.mark.parametrize("num_pages", [HEADER_FOOTER_WINDOW_PAGES - 1, HEADER_FOOTER_WINDOW_PAGES, HEADER_FOOTER_WINDOW_PAGES + 1])
+def test_streamed_header_footers_match_whole_document_detection_at_the_window_boundary(num_pages):
+    blocks = build_slide_deck_blocks(num_pages=num_pages, boilerplate_blocks=3)
+    # Just common enough on each deck: on the first slides and the last one
+    chapter_pages = list(range(int(HEADER_FOOTER_WINDOW_PAGES * 0.3) - 1)) + [num_pages - 1]
+    blocks += [(page_idx, "Chapter 1: Processes", 800.0, 810.0, PAGE_HEIGHT) for page_idx in chapter_pages]
+    blocks.sort(key=lambda block: block[0])
+    expected = legacy_page_texts(blocks, num_pages)
+    assert list(TextExtractor().iter_pdf_page_texts(blocks_by_page(blocks, num_pages), num_pages, window_pages=num_pages)) == expected
+    streamed = list(TextExtractor().iter_pdf_page_texts(blocks_by_page(blocks, num_pages), num_pages))
+    if num_pages <= HEADER_FOOTER_WINDOW_PAGES:
+        assert streamed == expected
+    else:
+        # The accepted divergence: no window holds all of its occurrences, so it stays in the streamed pages
+        assert streamed == [(page_idx, text + "\nChapter 1: Processes" if page_idx in chapter_pages else text) for page_idx, text in expected]
+
+
+def test_header_footers_of_long_documents_are_detected_within_a_window_of_pages():
+    num_pages = 4 * HEADER_FOOTER_WINDOW_PAGES
+    blocks = build_slide_deck_blocks(num_pages=num_pages, boilerplate_blocks=0)
+    # A chapter footer on the first window of slides only: too rare for the whole deck, common within the window
+    blocks += [(page_idx, "Chapter 1: Processes", 800.0, 810.0, PAGE_HEIGHT) for page_idx in range(HEADER_FOOTER_WINDOW_PAGES)]
+    blocks.sort(key=lambda block: block[0])
+    assert "Chapter 1: Processes" not in legacy_common_hf_texts(blocks, num_pages)
+
+    streamed = "\n\n".join(page_text for _, page_text in TextExtractor().iter_pdf_page_texts(blocks_by_page(blocks, num_pages), num_pages))
+    assert "Chapter 1: Processes" not in streamed and "Operating Systems - Winter Term" not in streamed
+    assert f"Slide {num_pages - 1} bullet 9" in streamed
+    # Whole-document extraction uses the same windows, so both produce the same (cached) text
+    assert TextExtractor()._assemble_pdf_text(blocks, num_pages) == streamed
+
+
+def test_pages_are_yielded_before_the_document_is_read():
+    num_pages = 4 * HEADER_FOOTER_WINDOW_PAGES
+    pages_by_idx = [[] for _ in range(num_pages)]
+    for block in build_slide_deck_blocks(num_pages=num_pages, boilerplate_blocks=2):
+        pages_by_idx[block[0]].append(block)
+    read_pages = []
+
+    def pages():
+        for page_idx, page_blocks in enumerate(pages_by_idx):
+            read_pages.append(page_idx)
+            yield page_blocks
+
+    page_texts = TextExtractor().iter_pdf_page_texts(pages(), num_pages)
+    page_idx, text = next(page_texts)
+    assert page_idx == 0 and "Slide 0 bullet 0" in text
+    assert len(read_pages) == HEADER_FOOTER_WINDOW_PAGES
+    assert len(list(page_texts)) == num_pages - 1 and len(read_pages) == num_pages
+
+
+def test_pptx_slides_are_pages_with_tables_groups_and_notes():
+    deck = build_pptx(num_slides=3)
+    paged = TextExtractor().extract_paged_text(io.BytesIO(deck), "lecture.pptx")
+    slides = paged.split(PAGE_BREAK)
+    assert slides[0] == "" and len(slides) == 4
+    for slide_idx, slide in enumerate(slides[1:]):
+        assert slide.startswith(f"Lecture 4, slide {slide_idx}: scheduling")
+        assert f"Grouped label 1 of slide {slide_idx}" in slide
+        assert "cell 1.0 | cell 1.1 | cell 1.2" in slide
+        assert f"Speaker notes for slide {slide_idx}" in slide
+    legacy_lines = legacy_pptx_text(deck).splitlines()
+    assert legacy_lines and all(line in paged for line in legacy_lines)
+
+
+def test_docx_text_includes_tables():
+    document = build_docx(num_paragraphs=400)
+    text = TextExtractor().extract_text(io.BytesIO(document), "notes.docx")
+    legacy_lines = legacy_docx_text(document).splitlines()
+    assert legacy_lines and all(line in text for line in legacy_lines)
+    assert "frame 199.2.0 | frame 199.2.1 | frame 199.2.2" in text
+    assert text.index("Paragraph 199:") < text.index("frame 199.0.0") < text.index("Paragraph 200:")
+
+
+def test_pptx_extraction_falls_back_to_python_pptx(monkeypatch):
+    deck = build_pptx(num_slides=3)
+
+    def fail_after_first_slide(source):
+        yield 0, "First slide from XML"
+        raise ValueError("broken slide XML")
+
+    monkeypatch.setattr(ooxml, "iter_pptx_slide_texts", fail_after_first_slide)
+    slide_texts = list(TextExtractor().iter_pptx_slide_texts(io.BytesIO(deck)))
+    assert [slide_idx for slide_idx, _ in slide_texts] == [0, 1, 2]
+    assert slide_texts[0][1] == "First slide from XML"
+    assert slide_texts[1][1].startswith("Lecture 4, slide 1: scheduling") and "Speaker notes" not in slide_texts[1][1]
+
+
+def test_docx_extraction_falls_back_to_python_docx(monkeypatch):
+    document = build_docx(num_paragraphs=20)
+
+    def fail(source):
+        raise KeyError("word/document.xml")
+
+    monkeypatch.setattr(ooxml, "iter_docx_lines", fail)
+    assert TextExtractor().extract_from_docx(io.BytesIO(document)) == legacy_docx_text(document)
@@ -0,0 +1,91 @@
+import importlib.util
+import io
+import threading
+
+import pytest
+from PIL import Image
+
+from app.document_handling.extraction_pool import ExtractionExecutor
+from app.document_handling.extractors import TextExtractor
+from app.document_handling.handrwitten_text_recognition import HandwrittenTextRecognizer, find_text_lines
+from scripts.bench_scanned_pdf import build_scan_image
+
+
+class FakeRecognizer(HandwrittenTextRecognizer):
+    """Reads the "text" of an image from its width and records the batches it gets."""
+
+    def __init__(self, **kwargs):
+        super().__init__(model_name="fake", **kwargs)
+        self.batch_sizes = []
+
+    def is_available(self):
+        return True
+
+    def recognize_batch(self, images):
+        self.batch_sizes.append(len(images))
+        if any(image.width == 13 for image in images):
+            raise ValueError("unreadable image")
+        return [f"x = {image.width}" for image in images]
+
+
+def png_bytes(width: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (width, 8), color=255).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_concurrent_requests_are_recognized_in_micro_batches():
+    recognizer = FakeRecognizer(max_batch_size=4, max_wait_seconds=0.2)
+    results = {}
+    start = threading.Barrier(10)
+
+    def request(width):
+        start.wait()
+        results[width] = recognizer.recognize(Image.new("RGB", (width, 8)))
+
+    threads = [threading.Thread(target=request, args=(width,)) for width in range(20, 30)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {width: f"x = {width}" for width in range(20, 30)}
+    assert sum(recognizer.batch_sizes) == 10 and max(recognizer.batch_sizes) <= 4
+    assert len(recognizer.batch_sizes) < 10
+    assert (recognizer.batches, recognizer.images) == (len(recognizer.batch_sizes), 10)
+
+
+def test_a_failed_batch_fails_its_requests_only():
+    recognizer = FakeRecognizer(max_batch_size=4, max_wait_seconds=0.2)
+    futures = [recognizer.submit(Image.new("RGB", (width, 8))) for width in (13, 14)]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+    assert recognizer.recognize(Image.new("RGB", (15, 8))) == "x = 15"
+
+
+def test_image_uploads_are_recognized_in_this_process():
+    recognizer = FakeRecognizer(max_batch_size=2, max_wait_seconds=0.01)
+    assert TextExtractor(text_recognizer=recognizer).extract_text(io.BytesIO(png_bytes(42)), "note.PNG") == "x = 42"
+
+    executor = ExtractionExecutor(max_workers=1, image_threads=2)
+    executor._ocr_text_extractor.text_recognizer = recognizer
+    try:
+        assert executor.submit(png_bytes(43), "note.jpg").result(timeout=10) == "x = 43"
+        assert executor._pool is None  # No worker processes were started
+    finally:
+        executor.shutdown()
+
+
+def test_page_images_are_cut_into_text_lines():
+    page_image = build_scan_image(num_lines=5, dpi=100)
+    lines = find_text_lines(page_image, dpi=100)
+    assert len(lines) == 5
+    assert all(top < bottom <= next_top for (_, top, _, bottom), (_, next_top, _, _) in zip(lines, lines[1:]))
+    assert all(90 <= left < right < page_image.width for left, _, right, _ in lines)
+
+
+@pytest.mark.skipif(importlib.util.find_spec("torch") is not None, reason="torch is installed")
+def test_missing_ocr_dependencies_are_reported():
+    with pytest.raises(RuntimeError, match="torch and transformers"):
+        HandwrittenTextRecognizer(model_name="fhswf/TrOCR_Math_handwritten").recognize(Image.new("RGB", (8, 8)))
@@ -0,0 +1,103 @@
+import zipfile
+
+import pytest
+
+from app.document_handling.extraction_pool import ExtractionExecutor
+from app.document_handling.parsers import DocumentParser
+from app.ingest import BulkIngestor, IngestState, _count_pages
+from app.vector_store.weaviate_connector import WeaviateIndexer
+from scripts.bench_office_extraction import build_pptx
+from tests.conftest import FakeWeaviateCollection, build_lecture_pdf
+from tests.test_weaviate_indexer import SlowEmbeddings
+
+
+class FlakyIndexer(WeaviateIndexer):
+    """Fails to index the given sources, like a crash half way through a bulk run."""
+
+    def __init__(self, *args, failing_sources=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failing_sources = set(failing_sources)
+
+    def index_documents(self, documents, progress_callback=None, vectors=None):
+        if documents[0].metadata["source"] in self.failing_sources:
+            raise RuntimeError("Weaviate went away")
+        return super().index_documents(documents, progress_callback=progress_callback, vectors=vectors)
+
+
+@pytest.fixture(scope="module")
+def extraction_executor():
+    executor = ExtractionExecutor(max_workers=2)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.fixture
+def course_dir(tmp_path):
+    course = tmp_path / "course"
+    (course / "week2").mkdir(parents=True)
+    (course / "week1.pdf").write_bytes(build_lecture_pdf(num_pages=3))
+    (course / "week2" / "slides.pdf").write_bytes(build_lecture_pdf(num_pages=4))
+    (course / "week2" / "notes.pdf").write_bytes(build_lecture_pdf(num_pages=2, paragraphs_per_page=3))
+    (course / "readme.txt").write_text("not a course document")
+    return course
+
+
+def make_ingestor(collection, state_path, extraction_executor, failing_sources=()):
+    indexer = FlakyIndexer(collection.client(), "TestIndex", embedding_model=SlowEmbeddings(0), failing_sources=failing_sources)
+    return BulkIngestor(
+        indexer=indexer,
+        state_path=str(state_path),
+        extraction_executor=extraction_executor,
+        document_parser=DocumentParser(),
+        group_id="group123",
+        workers={"extract": 2, "split": 1, "embed": 2, "index": 1},
+        queue_size=1,
+    )
+
+
+def test_bulk_ingestion_indexes_every_document(course_dir, tmp_path, extraction_executor):
+    collection = FakeWeaviateCollection()
+    report = make_ingestor(collection, tmp_path / "state.jsonl", extraction_executor).run(str(course_dir))
+
+    assert (report.files_total, report.files_indexed, report.files_failed) == (3, 3, 0)
+    assert report.pages == 9
+    assert report.chunks == len(collection.objects) > 0
+    assert {properties["source"] for properties, _ in collection.objects.values()} == {"week1.pdf", "week2/notes.pdf", "week2/slides.pdf"}
+    assert all(properties["group_id"] == "group123" and vector is not None for properties, vector in collection.objects.values())
+    assert all(report.stages[name].items == 3 for name in ("extract", "split", "embed", "index"))
+    assert "pages/s" in report.format() and "chunks/s" in report.format()
+
+
+def test_pages_are_counted_without_extracting_documents(tmp_path):
+    deck = tmp_path / "slides.pptx"
+    deck.write_bytes(build_pptx(num_slides=7))
+    lecture = tmp_path / "week1.pdf"
+    lecture.write_bytes(build_lecture_pdf(num_pages=3))
+    assert (_count_pages(str(deck)), _count_pages(str(lecture))) == (7, 3)
+
+
+def test_bulk_ingestion_resumes_after_a_failure(course_dir, tmp_path, extraction_executor):
+    collection = FakeWeaviateCollection()
+    state_path = tmp_path / "state.jsonl"
+    first = make_ingestor(collection, state_path, extraction_executor, failing_sources={"week2/slides.pdf"}).run(str(course_dir))
+    assert (first.files_indexed, first.files_failed) == (2, 1)
+    assert "Weaviate went away" in first.failures["week2/slides.pdf"]
+    assert {source for source, _ in IngestState(str(state_path)).completed} == {"week1.pdf", "week2/notes.pdf"}
+
+    second = make_ingestor(collection, state_path, extraction_executor).run(str(course_dir))
+    assert (second.files_indexed, second.files_skipped, second.files_failed) == (1, 2, 0)
+    assert second.stages["split"].items == 1
+    assert {properties["source"] for properties, _ in collection.objects.values()} == {"week1.pdf", "week2/notes.pdf", "week2/slides.pdf"}
+
+
+def test_bulk_ingestion_from_zip(course_dir, tmp_path, extraction_executor):
+    archive_path = tmp_path / "course.zip"
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        for path in course_dir.rglob("*"):
+            if path.is_file():
+                archive.write(path, path.relative_to(course_dir).as_posix())
+
+    collection = FakeWeaviateCollection()
+    report = make_ingestor(collection, tmp_path / "state.jsonl", extraction_executor).run(str(archive_path))
+    assert report.files_indexed == 3
+    assert {properties["source"] for properties, _ in collection.objects.values()} == {"week1.pdf", "week2/notes.pdf", "week2/slides.pdf"}
@@ -16,3 +16,12 @@ def test_health_check():
     response = client.get("/api/v1/health")
     assert response.status_code == 200
     assert response.json() == {"status": "OK"}
+
+
+def test_health_check_reports_query_embedding_cache(monkeypatch):
+    import app.api.api_router as api_router_module
+
+    stats = {"hits": 3, "misses": 1, "evictions": 0, "expirations": 0, "coalesced": 0, "entries": 1, "bytes": 6200, "max_bytes": 1024, "ttl_seconds": 60.0}
+    monkeypatch.setattr(api_router_module, "get_query_embedding_cache_stats", lambda: stats)
+    response = client.get("/api/v1/health")
+    assert response.json() == {"status": "OK", "query_embedding_cache": stats}
@@ -0,0 +1,129 @@
+import random
+
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.document_handling.extractors import PAGE_BREAK
+from app.document_handling.parsers import DocumentParser
+from scripts.bench_text_normalization import build_lecture_pages
+from tests.test_text_splitter import estimate, random_text
+
+
+def test_chunks_do_not_depend_on_how_the_text_is_streamed():
+    parser = DocumentParser(chunk_size=500, chunk_overlap=100)
+    pages = build_lecture_pages(num_pages=12)
+    text = "".join(pages)
+    expected = [(doc.page_content, doc.metadata) for doc in parser.split_text_to_documents(text, metadata={"source": "os.pdf"})]
+    assert len(expected) > 50
+
+    for pieces in (pages, [text[i : i + 7] for i in range(0, len(text), 7)]):
+        streamed = [(doc.page_content, doc.metadata) for doc in parser.iter_documents(iter(pieces), metadata={"source": "os.pdf"})]
+        assert streamed == expected
+    assert [metadata["chunk_index"] for _, metadata in expected] == list(range(len(expected)))
+
+
+def test_streamed_chunks_overlap_across_windows():
+    parser = DocumentParser(chunk_size=200, chunk_overlap=50)
+    sentences = [f"Sentence {i} explains how the scheduler picks the next thread." for i in range(200)]
+    chunks = [doc.page_content for doc in parser.iter_documents(sentence + " " for sentence in sentences)]
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current[:20] in previous  # Each chunk starts inside the one before
+    assert all(any(f"Sentence {i} " in chunk for chunk in chunks) for i in range(200))
+
+
+def test_chunks_spanning_windows_match_the_recursive_splitter():
+    parser = DocumentParser(chunk_size=1000, chunk_overlap=200)
+    pages = build_lecture_pages(num_pages=40)
+    text = "".join(pages)
+    expected = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_text(text)
+    assert len(text) > 10 * parser.window_size
+    assert [chunk.page_content for chunk in parser.split_text_to_chunks(text)] == expected
+    assert [chunk.page_content for chunk in parser.iter_chunks(iter(pages))] == expected
+
+    # Without paragraph breaks, the text is only split once it has arrived in full
+    lines = text.replace("\n\n", "\n")
+    expected = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_text(lines)
+    assert [chunk.page_content for chunk in parser.iter_chunks(lines[i : i + 997] for i in range(0, len(lines), 997))] == expected
+
+
+@pytest.mark.parametrize("size_in_tokens", [False, True])
+def test_streamed_chunks_match_the_recursive_splitter_at_window_boundaries(size_in_tokens):
+    rng = random.Random(5)
+    for _ in range(60):
+        chunk_size = rng.choice([3, 7, 16, 64])
+        chunk_overlap = rng.randint(0, chunk_size)
+        # Page breaks are not part of the text that is split
+        text = random_text(rng, 1500).replace(PAGE_BREAK, "")
+        length_function = estimate if size_in_tokens else len
+        expected = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=length_function).split_text(text)
+        parser = DocumentParser(chunk_size=chunk_size, chunk_overlap=chunk_overlap, token_counter=estimate if size_in_tokens else None, size_in_tokens=size_in_tokens)
+        step = rng.randint(1, 4 * parser.window_size)
+        streamed = [chunk.page_content for chunk in parser.iter_chunks(text[i : i + step] for i in range(0, len(text), step))]
+        assert streamed == expected, (chunk_size, chunk_overlap, step, text)
+
+
+def test_chunks_are_mapped_to_the_pages_they_span():
+    parser = DocumentParser(chunk_size=200, chunk_overlap=50)
+    # Page 2 has no text; its page break directly precedes the one of page 3
+    page_texts = {1: "Alpha text on the first page. " * 12, 3: "Gamma text on the third page. " * 12, 4: "Delta. " * 3, 5: "Epsilon. " * 3}
+    paged = "\f" + page_texts[1].strip() + "\n\n\f\f" + page_texts[3].strip() + "\n\n\f" + page_texts[4].strip() + "\n\n\f" + page_texts[5].strip()
+    documents = parser.split_text_to_documents(paged, metadata={"source": "os.pdf"})
+    assert [doc.page_content for doc in documents] == [doc.page_content for doc in parser.split_text_to_documents(paged.replace(PAGE_BREAK, ""))]
+
+    for doc in documents:
+        pages = {page for page, text in page_texts.items() if text.split(".")[0] in doc.page_content}
+        assert (doc.metadata["page_number"], doc.metadata["last_page_number"]) == (min(pages), max(pages))
+    assert (documents[-1].metadata["page_number"], documents[-1].metadata["last_page_number"]) == (4, 5)  # Short pages share a chunk
+
+    streamed = list(parser.iter_documents((paged[i : i + 13] for i in range(0, len(paged), 13)), metadata={"source": "os.pdf"}))
+    assert [doc.metadata for doc in streamed] == [doc.metadata for doc in documents]
+
+
+def test_text_without_page_breaks_has_no_page_metadata():
+    documents = DocumentParser(chunk_size=200, chunk_overlap=50).split_text_to_documents("Plain DOCX text. " * 40)
+    assert documents and all("page_number" not in doc.metadata for doc in documents)
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def test_chunks_can_be_sized_in_tokens():
+    parser = DocumentParser(chunk_size=50, chunk_overlap=10, token_counter=count_words, size_in_tokens=True)
+    text = " ".join(f"Sentence {i} explains how the scheduler picks the next thread." for i in range(300))
+    documents = list(parser.iter_documents(text[i : i + 100] for i in range(0, len(text), 100)))
+    assert [doc.page_content for doc in documents] == [doc.page_content for doc in parser.split_text_to_documents(text)]
+    assert all(doc.metadata["token_count"] == count_words(doc.page_content) for doc in documents)
+    assert all(40 <= doc.metadata["token_count"] <= 50 for doc in documents[:-1])
+    assert all(any(f"Sentence {i} " in doc.page_content for doc in documents) for i in range(300))
+
+
+def test_windows_widen_for_chunks_longer_than_the_window():
+    # Tokens of many characters: a window of 4 * chunk_size * 3 characters holds less than one chunk
+    parser = DocumentParser(chunk_size=20, chunk_overlap=0, token_counter=count_words, size_in_tokens=True)
+    text = " ".join(["x" * 30] * 200)
+    documents = parser.split_text_to_documents(text)
+    assert len(documents) == 10 and all(doc.metadata["token_count"] == 20 for doc in documents)
+
+
+def test_chunk_tables_hold_offsets_into_one_copy_of_the_text():
+    parser = DocumentParser(chunk_size=200, chunk_overlap=50, token_counter=count_words)
+    pages = build_lecture_pages(num_pages=4)
+    paged = "".join(PAGE_BREAK + page for page in pages)
+    table = parser.split_text_to_chunks(paged, metadata={"source": "os.pdf"})
+    assert table.text == "".join(pages)
+    assert len(table) > 10 and len(table.page_numbers) == len(table.token_counts) == len(table)
+
+    documents = parser.split_text_to_documents(paged, metadata={"source": "os.pdf"})
+    assert [(chunk.page_content, chunk.metadata) for chunk in table] == [(doc.page_content, doc.metadata) for doc in documents]
+    assert [chunk.page_content for chunk in table[-3:]] == [doc.page_content for doc in documents[-3:]]
+    assert table[-1].metadata["chunk_index"] == len(table) - 1
+
+    streamed = list(parser.iter_chunks((PAGE_BREAK + page for page in pages), metadata={"source": "os.pdf"}))
+    assert [(chunk.page_content, chunk.metadata) for chunk in streamed] == [(doc.page_content, doc.metadata) for doc in documents]
+
+
+def test_empty_text_gives_an_empty_chunk_table():
+    table = DocumentParser().split_text_to_chunks(PAGE_BREAK * 3, metadata={"source": "empty.pdf"})
+    assert len(table) == 0 and list(table) == [] and table.to_documents() == []
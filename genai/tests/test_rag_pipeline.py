@@ -0,0 +1,93 @@
+import asyncio
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import RunnableLambda
+
+from app.core import tokenizer
+from app.core.rag_pipeline import RAGSystem, fit_context
+from app.services.chat_service import ChatService
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def test_context_is_cut_to_the_token_budget_using_stored_counts():
+    def never_called(text):
+        raise AssertionError("Stored token counts must not be recomputed")
+
+    documents = [Document(page_content=f"chunk {i}", metadata={"token_count": 40}) for i in range(5)]
+    assert fit_context(documents, max_tokens=100, token_counter=never_called) == documents[:2]
+    assert fit_context(documents, max_tokens=200, token_counter=never_called) == documents
+
+
+def test_chunks_indexed_without_a_count_are_counted_at_query_time():
+    documents = [Document(page_content="one two three", metadata={}), Document(page_content="four five", metadata={"token_count": 2})]
+    assert fit_context(documents, max_tokens=5, token_counter=count_words) == documents
+    assert fit_context(documents, max_tokens=4, token_counter=count_words) == documents[:1]
+
+
+def test_chunks_over_the_remaining_budget_are_skipped():
+    documents = [Document(page_content=f"chunk {i}", metadata={"token_count": count}) for i, count in enumerate([500, 40, 80, 30])]
+    # The top chunk alone is over budget; the ones after it still fill the context
+    assert fit_context(documents, max_tokens=100, token_counter=count_words) == [documents[1], documents[3]]
+    assert fit_context(documents[:1], max_tokens=100, token_counter=count_words) == []
+
+
+class FixedRetriever(BaseRetriever):
+    documents: List[Document]
+    calls: int = 0
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        self.calls += 1
+        return self.documents
+
+
+def test_counts_without_tiktoken_never_undercount(monkeypatch):
+    monkeypatch.setattr(tokenizer, "_load_encoding", lambda model_name: None)
+    text = "特征值" * 100 + "🙂" * 50  # At least one token per character in any encoding
+    assert tokenizer.get_token_counter("gpt-4o")(text) >= len(text)
+    assert tokenizer.estimate_tokens(text) < len(text)  # Only an estimate
+
+
+def test_prompt_context_holds_the_chunks_that_fit():
+    prompts = []
+
+    def llm(prompt_value):
+        prompts.append(prompt_value.to_string())
+        return "answer"
+
+    documents = [
+        Document(page_content="alpha beta", metadata={"token_count": 2}),
+        Document(page_content="gamma", metadata={"token_count": 1}),
+        Document(page_content="delta", metadata={"token_count": 1}),
+    ]
+    rag_system = RAGSystem(llm=RunnableLambda(llm), retriever=FixedRetriever(documents=documents), context_max_tokens=3)
+    assert asyncio.run(rag_system.invoke_chain("What is alpha?")) == "answer"
+    assert "alpha beta\n\ngamma" in prompts[0] and "delta" not in prompts[0]
+
+
+def test_answer_and_sources_come_from_one_retrieval():
+    prompts = []
+
+    def llm(prompt_value):
+        prompts.append(prompt_value.to_string())
+        return "answer"
+
+    documents = [
+        Document(page_content="alpha beta", metadata={"token_count": 2, "source": "a.pdf", "page_number": 3}),
+        Document(page_content="gamma", metadata={"token_count": 1, "source": "b.pdf"}),
+        Document(page_content="delta", metadata={"token_count": 1, "source": "c.pdf"}),
+    ]
+    retriever = FixedRetriever(documents=documents)
+    rag_system = RAGSystem(llm=RunnableLambda(llm), retriever=retriever, context_max_tokens=3)
+
+    answer, sources = asyncio.run(rag_system.answer_with_sources("What is alpha?"))
+    assert (answer, sources, retriever.calls) == ("answer", documents[:2], 1)
+    assert "alpha beta\n\ngamma" in prompts[0] and "Question: What is alpha?" in prompts[0]
+
+    response = asyncio.run(ChatService(rag_system_instance=rag_system).process_chat_query("What is alpha?", group_id="group123"))
+    assert retriever.calls == 2
+    assert [(source.source_name, source.page_number) for source in response.sources] == [("a.pdf", 3), ("b.pdf", None)]
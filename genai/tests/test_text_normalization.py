@@ -0,0 +1,62 @@
+import glob
+import os
+import random
+
+import pytest
+
+from app.document_handling.extractors import TextExtractor
+from app.document_handling.text_normalization import iter_normalized_text, normalize_text
+from scripts.bench_text_normalization import build_lecture_pages, legacy_post_process_text
+
+GENAI_DIR = os.path.join(os.path.dirname(__file__), "..")
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), "golden")
+PROCESSED_TEXTS = sorted(glob.glob(os.path.join(GENAI_DIR, "data", "processed", "*.txt")))
+
+
+@pytest.mark.parametrize("path", PROCESSED_TEXTS, ids=os.path.basename)
+def test_normalized_text_matches_golden_output(path):
+    with open(path, encoding="utf-8") as f:
+        raw = f.read()
+    # Golden outputs were produced by the previous _post_process_text implementation.
+    with open(os.path.join(GOLDEN_DIR, os.path.basename(path)), encoding="utf-8") as f:
+        expected = f.read()
+    assert TextExtractor()._post_process_text(raw) == expected
+    assert "".join(iter_normalized_text(raw.splitlines(keepends=True))) == expected
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("", ""),
+        ("  \n\t\n ", ""),
+        ("exam-\nple text", "example text"),
+        ("exam-\nple-\nmore", "example- more"),  # A joined line is not re-checked for a hyphen
+        ("Exam-\nPle", "Exam-\nPle"),
+        ("wrapped line\nof text.\nNext", "wrapped line of text.\nNext"),
+        ("- item one\ncontinues", "- item one\ncontinues"),
+        ("1. first\nsecond", "1. first\nsecond"),
+        ("   padded   first\n\nsecond  para  ", "padded first\n\nsecond para"),
+        ("a\n \n\n b\r\n\r\nc", "a\n\n b\n\nc"),
+    ],
+)
+def test_normalization_rules(raw, expected):
+    assert normalize_text(raw) == expected
+
+
+def test_streamed_pages_match_whole_text():
+    pages = build_lecture_pages(num_pages=20)
+    expected = legacy_post_process_text("".join(pages))
+    assert normalize_text("".join(pages)) == expected
+    assert "".join(iter_normalized_text(iter(pages))) == expected
+
+
+def test_randomized_inputs_match_previous_implementation():
+    fragments = ["word", "Word", "é", "-", "1.", "•", "*", ".", ")", " ", "  ", "\t", "\n", "\n", "\n\n", "\n \n", "\r\n", "\r", "\x0c", "\x85"]
+    rng = random.Random(12)
+    for _ in range(3000):
+        text = "".join(rng.choice(fragments) for _ in range(rng.randint(0, 40)))
+        expected = legacy_post_process_text(text)
+        assert normalize_text(text) == expected, repr(text)
+        cuts = sorted(rng.sample(range(len(text) + 1), min(len(text) + 1, 4)))
+        pieces = [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+        assert "".join(iter_normalized_text(pieces)) == expected, repr(pieces)
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.document_handling.parsers import FastTextSplitter
+from scripts.bench_text_normalization import build_lecture_pages
+
+# Pieces that exercise every separator level: runs of newlines (overlapping "\n\n" matches),
+# whitespace that strip() removes but is not a separator, and words longer than any chunk
+FRAGMENTS = ["w", "word ", "Wort", " ", "\xa0", "　", "\n", "\n\n", "\n \n", "\n\n\n\n\n", "\r\n", "\f", "é", "z" * 17, "q" * 120, ". "]
+
+
+def random_text(rng: random.Random, max_fragments: int) -> str:
+    return "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, max_fragments)))
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def estimate(text: str) -> int:
+    return len(text) // 4 + 1  # Counts one for the empty separator, like some tokenizers' overhead
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_chunks_match_the_recursive_splitter(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        chunk_size = rng.choice([1, 3, 7, 16, 64, 200, 1000])
+        chunk_overlap = rng.randint(0, chunk_size)
+        text = random_text(rng, 1000)
+        expected = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap).split_text(text)
+        assert FastTextSplitter(chunk_size, chunk_overlap).split_text(text) == expected, (chunk_size, chunk_overlap, text)
+
+
+@pytest.mark.parametrize("length_function", [count_words, estimate])
+def test_chunks_match_the_recursive_splitter_with_other_length_functions(length_function):
+    rng = random.Random(42)
+    for _ in range(150):
+        chunk_size = rng.choice([3, 7, 16, 64])
+        chunk_overlap = rng.randint(0, chunk_size)
+        text = random_text(rng, 600)
+        expected = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=length_function).split_text(text)
+        splitter = FastTextSplitter(chunk_size, chunk_overlap, length_function=length_function)
+        assert splitter.split_text(text) == expected, (chunk_size, chunk_overlap, text)
+
+
+def test_chunks_match_the_recursive_splitter_on_lecture_text():
+    text = "".join(build_lecture_pages(num_pages=20))
+    expected = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_text(text)
+    assert len(expected) > 50
+    assert FastTextSplitter(1000, 200).split_text(text) == expected
+
+
+def test_spans_are_ordered_offsets_into_the_text():
+    rng = random.Random(3)
+    for _ in range(100):
+        text = random_text(rng, 800)
+        spans = FastTextSplitter(64, 16).split_spans(text)
+        assert spans == sorted(spans)
+        for start, end in spans:
+            assert text[start:end] and text[start:end] == text[start:end].strip()
+
+
+def test_spans_of_a_prefix_are_offsets_into_the_whole_text():
+    text = "".join(build_lecture_pages(num_pages=3))
+    splitter = FastTextSplitter(300, 60)
+    assert splitter.split_spans(text, 0, 2000) == splitter.split_spans(text[:2000])
+    assert splitter.split_spans(text, 500) == [(start + 500, end + 500) for start, end in splitter.split_spans(text[500:])]
+
+
+def test_chunk_overlap_larger_than_chunk_size_is_rejected():
+    with pytest.raises(ValueError):
+        FastTextSplitter(chunk_size=100, chunk_overlap=200)
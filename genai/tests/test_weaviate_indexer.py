@@ -0,0 +1,294 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.documents import Document as LangchainDocument
+from langchain_core.embeddings import Embeddings
+
+from app.vector_store import weaviate_connector
+from app.vector_store.weaviate_connector import WeaviateIndexer, chunk_uuids
+from tests import conftest
+from tests.conftest import FakeWeaviateCollection
+
+
+def fake_vector(text: str):
+    return [float(len(text)), float(sum(map(ord, text)))]
+
+
+class SlowEmbeddings(Embeddings):
+    """Fake embedding API with fixed latency per request that records request sizes and concurrency."""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.request_sizes = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.request_sizes.append(len(texts))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        return [fake_vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def make_documents(count: int, words_per_chunk: int = 1):
+    return [LangchainDocument(page_content="word " * words_per_chunk + str(i), metadata={"chunk_index": i}) for i in range(count)]
+
+
+def test_embedding_batches_respect_size_and_token_limits():
+    indexer = WeaviateIndexer(FakeWeaviateCollection().client(), "TestIndex", embedding_model=SlowEmbeddings(0), embed_batch_size=4)
+    assert indexer._embedding_batches(make_documents(10)) == [(0, 4), (4, 8), (8, 10)]
+
+    documents = make_documents(6, words_per_chunk=100)
+    indexer.embed_batch_max_tokens = 2 * indexer.token_counter(documents[0].page_content)
+    assert indexer._embedding_batches(documents) == [(0, 2), (2, 4), (4, 6)]
+
+    # A single chunk above the token budget still gets its own request
+    indexer.embed_batch_max_tokens = 1
+    assert indexer._embedding_batches(documents[:2]) == [(0, 1), (1, 2)]
+
+
+def test_client_side_vectors_are_embedded_concurrently_and_inserted_in_order():
+    embeddings = SlowEmbeddings(latency=0.05)
+    collection = FakeWeaviateCollection()
+    indexer = WeaviateIndexer(collection.client(), "TestIndex", embedding_model=embeddings, embed_batch_size=10, embed_concurrency=4)
+    progress = []
+
+    started = time.perf_counter()
+    documents = make_documents(160)
+    indexer.index_documents(documents, progress_callback=progress.append)
+    elapsed = time.perf_counter() - started
+
+    assert embeddings.request_sizes == [10] * 16
+    assert embeddings.max_in_flight == 4
+    # 16 requests of 50 ms each take 0.8 s one after another; 4 at a time take ~0.2 s
+    assert elapsed < 0.6
+    assert [vector for _, vector in collection.added] == [fake_vector(doc.page_content) for doc in documents]
+    assert progress[:2] == [10, 20] and progress[-1] == 160
+
+
+def test_precomputed_vectors_skip_embedding():
+    embeddings = SlowEmbeddings(0)
+    collection = FakeWeaviateCollection()
+    indexer = WeaviateIndexer(collection.client(), "TestIndex", embedding_model=embeddings)
+    documents = make_documents(3)
+    indexer.index_documents(documents, vectors=[[1.0], [2.0], [3.0]])
+    assert embeddings.request_sizes == []
+    assert [vector for _, vector in collection.added] == [[1.0], [2.0], [3.0]]
+
+    with pytest.raises(ValueError):
+        indexer.index_documents(documents, vectors=[[1.0]])
+
+
+def test_server_side_vectorization_without_embedding_model():
+    collection = FakeWeaviateCollection()
+    WeaviateIndexer(collection.client(), "TestIndex", batch_size=2).index_documents(make_documents(5))
+    assert len(collection.added) == 5
+    assert all(vector is None for _, vector in collection.added)
+
+
+def slide_deck(changed: dict = None, group_id: str = "group-a", source: str = "os-lecture.pdf"):
+    changed = changed or {}
+    return [LangchainDocument(page_content=changed.get(i, f"Slide {i}: scheduling, paging and file systems"), metadata={"source": source, "group_id": group_id, "chunk_index": i}) for i in range(100)]
+
+
+def test_reuploading_a_corrected_deck_touches_only_changed_chunks():
+    embeddings = SlowEmbeddings(0)
+    collection = FakeWeaviateCollection()
+    indexer = WeaviateIndexer(collection.client(), "TestIndex", embedding_model=embeddings)
+    first = indexer.index_documents(slide_deck())
+    assert first == (100, 0, 0, 0)
+    original_ids = set(collection.objects)
+
+    progress = []
+    embeddings.request_sizes.clear()
+    collection.added.clear()
+    corrected = indexer.index_documents(slide_deck(changed={17: "Slide 17: fixed typo 1", 42: "Slide 42: fixed typo 2"}), progress_callback=progress.append)
+
+    assert corrected == (2, 2, 98, 0)
+    assert sum(embeddings.request_sizes) == 2
+    assert [properties["text"] for properties, _ in collection.added] == ["Slide 17: fixed typo 1", "Slide 42: fixed typo 2"]
+    assert len(collection.objects) == 100
+    assert len(original_ids - set(collection.objects)) == 2
+    assert progress[0] == 98 and progress[-1] == 100
+
+    # Uploading the identical deck again is a no-op
+    assert indexer.index_documents(slide_deck(changed={17: "Slide 17: fixed typo 1", 42: "Slide 42: fixed typo 2"})) == (0, 0, 100, 0)
+
+
+def test_chunks_that_moved_to_other_pages_get_their_new_pages_in_place():
+    def paged_deck(first_page: int):
+        return [LangchainDocument(page_content=f"Slide {i}", metadata={"source": "deck.pdf", "chunk_index": i, "page_number": first_page + i, "last_page_number": first_page + i}) for i in range(10)]
+
+    embeddings = SlowEmbeddings(0)
+    collection = FakeWeaviateCollection()
+    indexer = WeaviateIndexer(collection.client(), "TestIndex", embedding_model=embeddings)
+    assert indexer.index_documents(paged_deck(first_page=1)) == (10, 0, 0, 0)
+    original_ids = set(collection.objects)
+    embeddings.request_sizes.clear()
+    # A title slide was added in front: same text, new citations, nothing to embed again
+    assert indexer.index_documents(paged_deck(first_page=2)) == (0, 0, 10, 0)
+    assert indexer.index_document_stream(iter(paged_deck(first_page=3))) == (0, 0, 10, 0)
+    assert embeddings.request_sizes == []
+    assert set(collection.objects) == original_ids
+    assert sorted(properties["page_number"] for properties, _ in collection.objects.values()) == list(range(3, 13))
+    assert sorted(properties["last_page_number"] for properties, _ in collection.objects.values()) == list(range(3, 13))
+
+
+def test_chunk_ids_are_scoped_to_group_and_source():
+    collection = FakeWeaviateCollection()
+    indexer = WeaviateIndexer(collection.client(), "TestIndex", embedding_model=SlowEmbeddings(0))
+    indexer.index_documents(slide_deck(group_id="group-a"))
+    # The same deck in another group, or under another name, is stored separately and leaves the first copy alone
+    assert indexer.index_documents(slide_deck(group_id="group-b")) == (100, 0, 0, 0)
+    assert indexer.index_documents(slide_deck(source="os-lecture-copy.pdf")[:10]) == (10, 0, 0, 0)
+    assert len(collection.objects) == 210
+
+
+def test_documents_without_a_group_are_replaced_like_grouped_ones(monkeypatch):
+    # Listing more chunks than one page and than Weaviate returns for offset pagination
+    monkeypatch.setattr(weaviate_connector, "_EXISTING_CHUNKS_PAGE_SIZE", 20)
+    monkeypatch.setattr(conftest, "QUERY_MAXIMUM_RESULTS", 50)
+    collection = FakeWeaviateCollection()
+    indexer = WeaviateIndexer(collection.client(), "TestIndex", embedding_model=SlowEmbeddings(0))
+    indexer.index_documents(slide_deck(group_id="group-a"))
+    assert indexer.index_documents(slide_deck(group_id=None)) == (100, 0, 0, 0)
+    assert all("group_id" not in properties for properties, _ in collection.added[100:])
+
+    corrected = indexer.index_documents(slide_deck(changed={3: "Slide 3: fixed typo"}, group_id=None))
+    assert corrected == (1, 1, 99, 0)
+    assert indexer.index_document_stream(iter(slide_deck(group_id=None))) == (1, 1, 99, 0)
+    assert len(collection.objects) == 200  # The grouped copy is untouched
+
+
+def test_stored_chunks_are_listed_by_uuid_range_within_their_group(monkeypatch):
+    monkeypatch.setattr(weaviate_connector, "_EXISTING_CHUNKS_PAGE_SIZE", 20)
+    monkeypatch.setattr(conftest, "QUERY_MAXIMUM_RESULTS", 50)
+    collection = FakeWeaviateCollection()
+    indexer = WeaviateIndexer(collection.client(), "TestIndex", embedding_model=SlowEmbeddings(0))
+    indexer.index_documents(slide_deck(group_id="group-a"))
+    indexer.index_documents(slide_deck(group_id="group-b"))
+    fetch_objects = collection.query.fetch_objects
+    responses = []
+
+    def recording_fetch_objects(**kwargs):
+        response = fetch_objects(**kwargs)
+        responses.append(response.objects)
+        return response
+
+    collection.query.fetch_objects = recording_fetch_objects
+    existing = indexer._fetch_existing_chunks(collection, "group-a", "os-lecture.pdf")
+
+    assert set(existing) == set(chunk_uuids(slide_deck(group_id="group-a")))
+    assert all(item.properties["group_id"] == "group-a" for objects in responses for item in objects)
+    assert len(responses) <= 1 + 16 + 16  # The 100 chunks spread over the 16 ranges of the first hex digit
+
+
+def test_stale_chunks_are_deleted_in_bounded_batches(monkeypatch):
+    monkeypatch.setattr(weaviate_connector, "_DELETE_BATCH_SIZE", 20)
+    monkeypatch.setattr(weaviate_connector, "_EXISTING_CHUNKS_PAGE_SIZE", 20)
+    monkeypatch.setattr(conftest, "QUERY_MAXIMUM_RESULTS", 50)
+    collection = FakeWeaviateCollection()
+    indexer = WeaviateIndexer(collection.client(), "TestIndex", embedding_model=SlowEmbeddings(0))
+    indexer.index_documents(slide_deck())
+    delete_batches = []
+    delete_many = collection.data.delete_many
+
+    def recording_delete_many(where):
+        delete_batches.append(len(where.value))
+        return delete_many(where)
+
+    collection.data.delete_many = recording_delete_many
+    revised = slide_deck(changed={i: f"Slide {i}: revised" for i in range(100)})
+    assert indexer.index_documents(revised) == (100, 100, 0, 0)
+    assert delete_batches == [20] * 5
+    assert set(collection.objects) == set(chunk_uuids(revised))
+
+
+def test_repeated_chunks_within_a_document_are_kept():
+    collection = FakeWeaviateCollection()
+    indexer = WeaviateIndexer(collection.client(), "TestIndex", embedding_model=SlowEmbeddings(0))
+    documents = [LangchainDocument(page_content="Questions?", metadata={"source": "deck.pdf"}) for _ in range(3)]
+    assert indexer.index_documents(documents) == (3, 0, 0, 0)
+    assert indexer.index_documents(documents[:2]) == (0, 1, 2, 0)
+    assert len(collection.objects) == 2
+
+
+def test_streamed_indexing_starts_before_the_stream_ends():
+    collection = FakeWeaviateCollection()
+    indexer = WeaviateIndexer(collection.client(), "TestIndex", embedding_model=SlowEmbeddings(0), embed_batch_size=10, embed_concurrency=2)
+    inserted_when_pulled = []
+
+    def deck_stream():
+        for doc in slide_deck():
+            inserted_when_pulled.append(len(collection.added))
+            yield doc
+
+    progress = []
+    assert indexer.index_document_stream(deck_stream(), progress_callback=progress.append) == (100, 0, 0, 0)
+    # Only the embedding requests in flight lag behind the stream
+    assert inserted_when_pulled[-1] >= 70
+    assert progress[0] == 10 and progress[-1] == 100
+    assert [properties["text"] for properties, _ in collection.added] == [doc.page_content for doc in slide_deck()]
+
+
+def test_streamed_indexing_replaces_chunks_like_list_indexing():
+    collection = FakeWeaviateCollection()
+    indexer = WeaviateIndexer(collection.client(), "TestIndex", embedding_model=SlowEmbeddings(0))
+    indexer.index_documents(slide_deck())
+    original_ids = set(collection.objects)
+    collection.added.clear()
+
+    corrected_deck = slide_deck(changed={17: "Slide 17: fixed typo 1", 95: "Slide 95: fixed typo 2"})
+    assert indexer.index_document_stream(iter(corrected_deck)) == (2, 2, 98, 0)
+    assert [properties["text"] for properties, _ in collection.added] == ["Slide 17: fixed typo 1", "Slide 95: fixed typo 2"]
+    assert len(original_ids - set(collection.objects)) == 2 and len(collection.objects) == 100
+    # Identical chunks map to the same objects whichever way they are indexed
+    assert indexer.index_documents(corrected_deck) == (0, 0, 100, 0)
+
+
+def test_failed_stream_leaves_the_previous_version_in_place():
+    collection = FakeWeaviateCollection()
+    indexer = WeaviateIndexer(collection.client(), "TestIndex", batch_size=10)
+    indexer.index_documents(slide_deck())
+    stored = dict(collection.objects)
+
+    def broken_stream():
+        for i, doc in enumerate(slide_deck(changed={i: f"Slide {i}: revised" for i in range(100)})):
+            if i == 50:
+                raise RuntimeError("extraction worker died")
+            yield doc
+
+    with pytest.raises(RuntimeError):
+        indexer.index_document_stream(broken_stream())
+    assert len(collection.added) > 100  # Revised slides were inserted before the failure ...
+    assert collection.objects == stored  # ... and removed again
+
+
+def test_partially_failed_reindexing_keeps_the_previous_version():
+    collection = FakeWeaviateCollection()
+    indexer = WeaviateIndexer(collection.client(), "TestIndex", embedding_model=SlowEmbeddings(0))
+    indexer.index_documents(slide_deck())
+    original_ids = set(collection.objects)
+
+    revised = slide_deck(changed={i: f"Slide {i}: revised" for i in range(10)})
+    collection.batch.failed_objects = [SimpleNamespace(message="vectorizer timeout", original_uuid=chunk_uuids(revised)[4], original_properties={})]
+    failed_ids = []
+    assert indexer.index_documents(revised, failed_ids=failed_ids) == (9, 0, 90, 1)
+    assert failed_ids == [chunk_uuids(revised)[4]]
+    assert indexer.index_document_stream(iter(slide_deck(changed={i: f"Slide {i}: revised again" for i in range(10)}))) == (9, 0, 90, 1)
+    assert original_ids <= set(collection.objects)
+
+    # Once the inserts succeed, the old chunks go
+    collection.batch.failed_objects = []
+    assert indexer.index_documents(slide_deck(changed={i: f"Slide {i}: revised" for i in range(10)})).deleted == 20
+    assert len(collection.objects) == 100
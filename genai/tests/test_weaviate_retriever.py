@@ -0,0 +1,92 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import weaviate
+from langchain_core.embeddings import Embeddings
+from weaviate.exceptions import WeaviateClosedClientError
+
+from app.vector_store import weaviate_connector
+from app.vector_store.weaviate_connector import WeaviateLangchainRetriever
+
+
+class AsyncEmbeddings(Embeddings):
+    """Fake embedding API whose async query embedding awaits a fixed latency."""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.queries = []
+
+    def embed_documents(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        raise AssertionError("The async path must not call the blocking embed_query")
+
+    async def aembed_query(self, text):
+        self.queries.append(text)
+        await asyncio.sleep(self.latency)
+        return self.embed_documents([text])[0]
+
+
+class FakeAsyncClient:
+    """Stand-in for a WeaviateAsyncClient whose near_vector queries take *latency* and record their overlap."""
+
+    def __init__(self, latency: float = 0.05, closed: bool = False):
+        self.latency = latency
+        self.closed = closed
+        self.queries = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.collections = SimpleNamespace(get=lambda name: SimpleNamespace(query=SimpleNamespace(near_vector=self.near_vector)))
+
+    async def near_vector(self, near_vector, limit, **kwargs):
+        if self.closed:
+            raise WeaviateClosedClientError()
+        self.queries += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.latency)
+        self.in_flight -= 1
+        item = SimpleNamespace(properties={"text": f"chunk near {near_vector[0]:.0f}", "source": "lecture.pdf", "page_number": 2}, metadata=SimpleNamespace(distance=0.25))
+        return SimpleNamespace(objects=[item] * limit)
+
+
+def make_retriever(embeddings, async_client, k=2):
+    return WeaviateLangchainRetriever(MagicMock(spec=weaviate.WeaviateClient), embeddings, "TestIndex", k=k, async_client=async_client)
+
+
+def test_concurrent_async_retrievals_overlap():
+    async_client = FakeAsyncClient(latency=0.05)
+    retriever = make_retriever(AsyncEmbeddings(latency=0.05), async_client)
+    queries = [f"what is a semaphore, take {i}" for i in range(10)]
+
+    async def scenario():
+        started = time.perf_counter()
+        results = await asyncio.gather(*(retriever.ainvoke(query) for query in queries))
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(scenario())
+    assert async_client.max_in_flight == len(queries)
+    assert elapsed < 0.5  # Serial: 10 x (50 ms embedding + 50 ms search)
+    assert [len(documents) for documents in results] == [2] * len(queries)
+    assert results[0][0].metadata == {"source": "lecture.pdf", "page_number": 2, "distance": 0.25}
+
+
+def test_closed_async_client_is_reconnected_once(monkeypatch):
+    stale, fresh = FakeAsyncClient(latency=0, closed=True), FakeAsyncClient(latency=0)
+    reconnected = []
+
+    async def fake_reconnect(client):
+        reconnected.append(client)
+        return fresh
+
+    monkeypatch.setattr(weaviate_connector, "reconnect_weaviate_async_client", fake_reconnect)
+    embeddings = AsyncEmbeddings(latency=0)
+    retriever = make_retriever(embeddings, stale)
+
+    documents = asyncio.run(retriever.ainvoke("deadlock conditions"))
+    assert len(documents) == 2
+    assert reconnected == [stale] and retriever.async_client is fresh
+    assert embeddings.queries == ["deadlock conditions"]  # Not embedded again for the retry